@@ -63,7 +63,11 @@ from module.urban_grid import UrbanGrid
 from vehicle import Vehicle
 from algorithm.agent import QLearningAgent
 from algorithm.reward_config import RewardConfig
-import pickle
+from algorithm.checkpoint import save_agent as save_agent_file, load_agent as load_agent_file
+from module.grid_snapshot import GridSnapshot
+from UI.simulation_worker import SimulationWorker
+import contextlib
+import os
 import json
 
 class SimulationController:
@@ -87,6 +91,11 @@ class SimulationController:
         self.current_step = 0
         self.max_steps = 100
         
+        # Steps run in a background worker; the Tk loop renders its snapshots at up to max_fps
+        self.worker = None
+        self.max_fps = 30
+        self._render_job = None
+        
         # Store default Q-learning values but create StringVars after Tk initialization
         self.default_learning_rate = "0.2"
         self.default_discount_factor = "0.95"
@@ -101,6 +110,8 @@ class SimulationController:
         
         # Reward configuration
         self.reward_config = RewardConfig()
+        # Keep the reward fields in sync with every configuration change (presets, resets)
+        self.reward_config.add_listener(lambda config: self.update_reward_gui_from_config())
         
         # Create GUI window
         self.setup_gui()
@@ -211,7 +222,7 @@ class SimulationController:
         
         ttk.Label(veh_frame, text="Vehicles:").pack(side=tk.LEFT, padx=5)
         self.num_vehicles_var = tk.IntVar(value=5)
-        ttk.Spinbox(veh_frame, from_=1, to=20, width=5, 
+        ttk.Spinbox(veh_frame, from_=1, to=1000, width=5, 
                    textvariable=self.num_vehicles_var).pack(side=tk.LEFT, padx=5)
         
         # Q-learning parameters
@@ -346,21 +357,11 @@ class SimulationController:
         try:
             filename = filedialog.askopenfilename(
                 title="Load Trained Agent",
-                filetypes=[("Pickle files", "*.pkl"), ("All files", "*.*")]
+                filetypes=[("Q-table checkpoints", "*.vqt"), ("Pickle files", "*.pkl"), ("All files", "*.*")]
             )
             
             if filename:
-                with open(filename, 'rb') as f:
-                    self.agent = pickle.load(f)
-                
-                # Make sure urban_grid is properly initialized
-                if not hasattr(self.agent, 'urban_grid') or self.agent.urban_grid is None:
-                    from module.urban_grid import UrbanGrid
-                    self.agent.urban_grid = UrbanGrid(
-                        size=self.agent.grid_size,
-                        congestion_update_rate=self.agent.grid_congestion_update_rate,
-                        traffic_light_cycle=self.agent.grid_traffic_light_cycle
-                    )
+                self.agent = load_agent_file(filename)
                 
                 self.urban_grid = self.agent.urban_grid
                 self.update_status(f"Agent loaded from {filename}")
@@ -377,20 +378,13 @@ class SimulationController:
         try:
             filename = filedialog.asksaveasfilename(
                 title="Save Agent",
-                defaultextension=".pkl",
-                filetypes=[("Pickle files", "*.pkl"), ("All files", "*.*")]
+                defaultextension=".vqt",
+                filetypes=[("Q-table checkpoints", "*.vqt"), ("Pickle files", "*.pkl"), ("All files", "*.*")]
             )
             
             if filename:
-                # Prepare agent for saving (remove tkinter objects)
-                visualizer_backup = self.agent.prepare_for_save()
-                
-                # Save to file
-                with open(filename, 'wb') as f:
-                    pickle.dump(self.agent, f)
-                
-                # Restore agent after saving
-                self.agent.restore_after_save(visualizer_backup)
+                # Saved as a pickle for .pkl files, as a Q-table checkpoint otherwise
+                save_agent_file(self.agent, filename)
                 self.update_status(f"Agent saved to {filename}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save agent: {str(e)}")
@@ -477,6 +471,21 @@ class SimulationController:
         # Start simulation loop
         self.run_simulation_step()
     
+    def simulation_lock(self):
+        """Lock held by the worker while it steps; hold it to change the grid or vehicles"""
+        return self.worker.lock if self.worker is not None else contextlib.nullcontext()
+    
+    def stop_worker(self):
+        """Stop the background simulation worker and the render loop"""
+        if self._render_job is not None:
+            self.root.after_cancel(self._render_job)
+            self._render_job = None
+        if self.worker is not None:
+            self.worker.stop()
+            # Keep the worker (and its lock for simulation_lock) while its thread runs
+            if not self.worker.is_alive():
+                self.worker = None
+    
     def toggle_pause(self):
         """Toggle the paused state of the simulation"""
         if not self.running:
@@ -485,6 +494,8 @@ class SimulationController:
         self.paused = not self.paused
         
         if self.paused:
+            if self.worker is not None:
+                self.worker.pause()
             self.pause_btn.config(text="Resume")
             self.update_status("Simulation paused")
         else:
@@ -500,9 +511,10 @@ class SimulationController:
             self.update_status("Simulation resumed")
             
             # Update optimal paths for all vehicles since obstacles may have been modified
-            for vehicle in self.vehicles:
-                if not vehicle.reached:
-                    vehicle.update_optimal_path()
+            with self.simulation_lock():
+                for vehicle in self.vehicles:
+                    if not vehicle.reached:
+                        vehicle.update_optimal_path()
                     
             self.run_simulation_step()
     
@@ -518,6 +530,10 @@ class SimulationController:
             self.initialize_vehicles()
             self.running = True
             self.paused = True
+        elif self.worker is not None and not self.worker.paused:
+            # Single steps run on the main thread, so stop the worker first
+            self.worker.pause()
+            self.paused = True
         
         # Single step logic
         if self.current_step < self.max_steps:
@@ -529,6 +545,7 @@ class SimulationController:
     
     def reset_simulation(self):
         """Reset the simulation to initial state"""
+        self.stop_worker()
         self.running = False
         self.paused = False
         self.current_step = 0
@@ -593,7 +610,8 @@ class SimulationController:
             self.update_status("No grid available")
             return
             
-        self.urban_grid.congestion = np.zeros((self.urban_grid.size, self.urban_grid.size))
+        with self.simulation_lock():
+            self.urban_grid.congestion = np.zeros((self.urban_grid.size, self.urban_grid.size))
         self.update_status("Cleared all area congestion")
         
         # Update visualization
@@ -660,24 +678,27 @@ class SimulationController:
             radius = self.congestion_radius_var.get()
             congestion_level = self.congestion_level
             
-            for dx in range(-radius, radius + 1):
-                for dy in range(-radius, radius + 1):
-                    new_x = x_pos + dx
-                    new_y = y_pos + dy
-                    
-                    # Check bounds
-                    if 0 <= new_x < self.urban_grid.size and 0 <= new_y < self.urban_grid.size:
-                        # Calculate distance from center for smooth falloff
-                        distance = np.sqrt(dx*dx + dy*dy)
-                        if distance <= radius:
-                            # Apply smooth falloff
-                            falloff = max(0, 1 - distance / radius)
-                            self.urban_grid.congestion[new_x, new_y] = congestion_level * falloff
+            with self.simulation_lock():
+                for dx in range(-radius, radius + 1):
+                    for dy in range(-radius, radius + 1):
+                        new_x = x_pos + dx
+                        new_y = y_pos + dy
+                        
+                        # Check bounds
+                        if 0 <= new_x < self.urban_grid.size and 0 <= new_y < self.urban_grid.size:
+                            # Calculate distance from center for smooth falloff
+                            distance = np.sqrt(dx*dx + dy*dy)
+                            if distance <= radius:
+                                # Apply smooth falloff
+                                falloff = max(0, 1 - distance / radius)
+                                self.urban_grid.congestion[new_x, new_y] = congestion_level * falloff
+                self.urban_grid.mark_congestion_changed()
+                snapshot = self.capture_snapshot()
             
             self.update_status(f"Added obstacle at position ({x_pos}, {y_pos}) with surrounding congestion level {congestion_level:.2f}")
             
             # Update visualization
-            self.urban_grid.visualize(self.vehicles, show_plot=True, congestion_mode=True)
+            self.render_snapshot(snapshot)
 
     def toggle_obstacle_mode(self):
         """Toggle the obstacle placement mode"""
@@ -731,21 +752,23 @@ class SimulationController:
         
         # Ensure coordinates are within grid bounds
         if 0 <= x_pos < self.urban_grid.size and 0 <= y_pos < self.urban_grid.size:
-            # Toggle obstacle at this position
-            if self.urban_grid.obstacles[x_pos, y_pos]:
-                self.urban_grid.remove_obstacle(x_pos, y_pos)
-                self.update_status(f"Removed obstacle at position ({x_pos}, {y_pos}) ")
-            else:
-                self.urban_grid.add_obstacle(x_pos, y_pos)
-                self.update_status(f"Added obstacle at position ({x_pos}, {y_pos}) ")
-            
-            # Update vehicles' optimal paths if needed
-            for vehicle in self.vehicles:
-                if not vehicle.reached:
-                    vehicle.update_optimal_path()
+            with self.simulation_lock():
+                # Toggle obstacle at this position
+                if self.urban_grid.obstacles[x_pos, y_pos]:
+                    self.urban_grid.remove_obstacle(x_pos, y_pos)
+                    self.update_status(f"Removed obstacle at position ({x_pos}, {y_pos}) ")
+                else:
+                    self.urban_grid.add_obstacle(x_pos, y_pos)
+                    self.update_status(f"Added obstacle at position ({x_pos}, {y_pos}) ")
+                
+                # Update vehicles' optimal paths if needed
+                for vehicle in self.vehicles:
+                    if not vehicle.reached:
+                        vehicle.update_optimal_path()
+                snapshot = self.capture_snapshot()
             
             # Update visualization
-            self.urban_grid.visualize(self.vehicles, show_plot=True)
+            self.render_snapshot(snapshot)
         """Toggle the obstacle placement mode"""
         if not self.urban_grid:
             self.update_status("No grid available")
@@ -797,21 +820,23 @@ class SimulationController:
         
         # Ensure coordinates are within grid bounds
         if 0 <= x_pos < self.urban_grid.size and 0 <= y_pos < self.urban_grid.size:
-            # Toggle obstacle at this position
-            if self.urban_grid.obstacles[x_pos, y_pos]:
-                self.urban_grid.remove_obstacle(x_pos, y_pos)
-                self.update_status(f"removed ({x_pos}, {y_pos}) 's obstacle")
-            else:
-                self.urban_grid.add_obstacle(x_pos, y_pos)
-                self.update_status(f"added ({x_pos}, {y_pos}) 's obstacle")
-            
-            # Update vehicles' optimal paths if needed
-            for vehicle in self.vehicles:
-                if not vehicle.reached:
-                    vehicle.update_optimal_path()
+            with self.simulation_lock():
+                # Toggle obstacle at this position
+                if self.urban_grid.obstacles[x_pos, y_pos]:
+                    self.urban_grid.remove_obstacle(x_pos, y_pos)
+                    self.update_status(f"removed ({x_pos}, {y_pos}) 's obstacle")
+                else:
+                    self.urban_grid.add_obstacle(x_pos, y_pos)
+                    self.update_status(f"added ({x_pos}, {y_pos}) 's obstacle")
+                
+                # Update vehicles' optimal paths if needed
+                for vehicle in self.vehicles:
+                    if not vehicle.reached:
+                        vehicle.update_optimal_path()
+                snapshot = self.capture_snapshot()
             
             # Update visualization
-            self.urban_grid.visualize(self.vehicles, show_plot=True)
+            self.render_snapshot(snapshot)
 
     def add_random_obstacles(self):
         """Add random obstacles to the grid"""
@@ -819,19 +844,19 @@ class SimulationController:
             self.update_status("No grid available")
             return
             
-        # Clear existing obstacles
-        self.urban_grid.obstacles = np.zeros((self.urban_grid.size, self.urban_grid.size), dtype=bool)
-        
-        # Add new random obstacles (5% of grid)
-        num_obstacles = int(0.05 * self.urban_grid.size * self.urban_grid.size)
-        for _ in range(num_obstacles):
-            x, y = np.random.randint(0, self.urban_grid.size-1), np.random.randint(0, self.urban_grid.size-1)
-            self.urban_grid.add_obstacle(x, y)
-        
-        # Add one specific obstacle "incident" in the middle of the map
-        mid = self.urban_grid.size // 2
-        for i in range(-1, 2):
-            self.urban_grid.add_obstacle(mid + i, mid)
+        with self.simulation_lock():
+            # Clear existing obstacles
+            self.urban_grid.obstacles = np.zeros((self.urban_grid.size, self.urban_grid.size), dtype=bool)
+            
+            # Add new random obstacles (5% of grid)
+            num_obstacles = int(0.05 * self.urban_grid.size * self.urban_grid.size)
+            for x, y in self.urban_grid.random_positions(num_obstacles):
+                self.urban_grid.add_obstacle(x, y)
+            
+            # Add one specific obstacle "incident" in the middle of the map
+            mid = self.urban_grid.size // 2
+            for i in range(-1, 2):
+                self.urban_grid.add_obstacle(mid + i, mid)
         
         self.update_status(f"Added {num_obstacles} random obstacles and a middle incident")
         
@@ -839,11 +864,12 @@ class SimulationController:
         if hasattr(self.urban_grid, 'visualizer') and self.urban_grid.visualizer is not None and not self.urban_grid.visualizer.is_closed:
             self.urban_grid.visualize(self.vehicles, show_plot=True)
     
-    def perform_simulation_step(self):
-        """Perform one step of the simulation"""
-        if not self.urban_grid or not self.vehicles:
-            return
+    def advance_simulation(self):
+        """Advance the model by one step without drawing it
         
+        Returns:
+            True when the simulation is finished (max steps or all vehicles arrived)
+        """
         # Update environment
         positions = [v.position for v in self.vehicles if not v.reached]
         self.urban_grid.update_congestion(positions)
@@ -854,44 +880,95 @@ class SimulationController:
             if not vehicle.reached:
                 vehicle.move()
         
-        # Visualize
-        self.urban_grid.visualize(self.vehicles, show_plot=True)
-        
-        # Update status
-        completed = sum(1 for v in self.vehicles if v.reached)
-        total = len(self.vehicles)
-        self.completed_label.config(text=f"{completed}/{total}")
-        
         # Update step counter
         self.current_step += 1
-        self.step_label.config(text=str(self.current_step))
+        self.urban_grid.current_step = self.current_step
+        return self.current_step >= self.max_steps or all(v.reached for v in self.vehicles)
+    
+    def capture_snapshot(self):
+        """Copy the state to draw, so it can be rendered while the worker keeps stepping"""
+        return GridSnapshot(self.urban_grid, self.vehicles, self.current_step)
+    
+    def render_snapshot(self, snapshot):
+        """Draw a snapshot and update the step counters"""
+        visualizer = getattr(self.urban_grid, 'visualizer', None)
+        if visualizer is None or visualizer.is_closed:
+            visualizer = self.urban_grid.visualizer = self.urban_grid.create_visualizer()
+        visualizer.update_display(snapshot, obstacle_mode=self.obstacle_mode,
+                                  congestion_mode=self.congestion_mode)
+        
+        self.completed_label.config(text=f"{snapshot.completed}/{len(snapshot.vehicles)}")
+        self.step_label.config(text=str(snapshot.current_step))
+    
+    def perform_simulation_step(self):
+        """Perform and draw one step of the simulation on the main thread"""
+        if not self.urban_grid or not self.vehicles:
+            return
+        
+        with self.simulation_lock():
+            self.advance_simulation()
+            snapshot = self.capture_snapshot()
+        self.render_snapshot(snapshot)
     
     def run_simulation_step(self):
-        """Run simulation steps with delay until paused or complete"""
-        if self.running and not self.paused:
-            all_reached = all(v.reached for v in self.vehicles)
-            
-            if self.current_step < self.max_steps and not all_reached:
-                self.perform_simulation_step()
-                
-                # Schedule next step
-                self.root.after(self.step_delay, self.run_simulation_step)
-            else:
-                # Simulation ended
-                completed = sum(1 for v in self.vehicles if v.reached)
-                total = len(self.vehicles)
-                
-                if all_reached:
-                    self.update_status(f"Simulation complete! All vehicles reached destination in {self.current_step} steps.")
-                else:
-                    self.update_status(f"Simulation reached max steps ({self.max_steps}). {completed}/{total} vehicles reached destination.")
-                
-                self.running = False
-                self.start_btn.config(state="normal")
-                self.pause_btn.config(state="disabled")
+        """Run the simulation in the background worker until paused or complete"""
+        if not self.running or self.paused:
+            return
+        
+        if self.worker is None:
+            if self.current_step >= self.max_steps or all(v.reached for v in self.vehicles):
+                self.finish_simulation()
+                return
+            self.worker = SimulationWorker(self.advance_simulation, self.capture_snapshot,
+                                           step_delay=lambda: self.step_delay / 1000,
+                                           max_fps=self.max_fps)
+            self.worker.start()
+        else:
+            self.worker.resume()
+        
+        if self._render_job is None:
+            self.render_frames()
+    
+    def render_frames(self):
+        """Tk loop drawing the newest worker snapshot at up to max_fps, dropping older ones"""
+        self._render_job = None
+        worker = self.worker
+        if worker is None:
+            return
+        
+        frame = worker.latest_frame()
+        if frame is not None:
+            self.render_snapshot(frame)
+        
+        if worker.finished and worker.frames.empty():
+            self.finish_simulation()
+            return
+        if self.running:
+            self._render_job = self.root.after(max(1, int(1000 / self.max_fps)), self.render_frames)
+    
+    def finish_simulation(self):
+        """Report the end of the simulation and re-enable the controls"""
+        error = self.worker.error if self.worker is not None else None
+        self.stop_worker()
+        
+        completed = sum(1 for v in self.vehicles if v.reached)
+        total = len(self.vehicles)
+        all_reached = completed == total
+        
+        if error is not None:
+            self.update_status(f"Simulation stopped by an error: {error}")
+        elif all_reached:
+            self.update_status(f"Simulation complete! All vehicles reached destination in {self.current_step} steps.")
+        else:
+            self.update_status(f"Simulation reached max steps ({self.max_steps}). {completed}/{total} vehicles reached destination.")
+        
+        self.running = False
+        self.start_btn.config(state="normal")
+        self.pause_btn.config(state="disabled")
     
     def on_close(self):
         """Handle window closing"""
+        self.stop_worker()
         if hasattr(self.urban_grid, 'visualizer') and self.urban_grid.visualizer is not None and not self.urban_grid.visualizer.is_closed:
             self.urban_grid.visualizer.close()
         
@@ -1201,32 +1278,7 @@ class SimulationController:
     
     def reset_reward_config(self):
         """Reset reward configuration to defaults"""
-        self.reward_config.reset_to_defaults()
-        
-        # Update GUI values
-        self.step_penalty_var.set(str(self.reward_config.step_penalty))
-        self.destination_reward_var.set(str(self.reward_config.destination_reached_reward))
-        self.astar_follow_var.set(str(self.reward_config.astar_follow_reward))
-        self.astar_path_var.set(str(self.reward_config.astar_on_path_reward))
-        self.distance_reward_var.set(str(self.reward_config.closer_to_destination_reward))
-        
-        self.congestion_threshold_var.set(str(self.reward_config.high_congestion_threshold))
-        self.congestion_penalty_var.set(str(self.reward_config.congestion_penalty_multiplier))
-        self.backtrack_penalty_var.set(str(self.reward_config.immediate_backtrack_penalty))
-        self.oscillation_penalty_var.set(str(self.reward_config.oscillation_penalty))
-        self.red_light_penalty_var.set(str(self.reward_config.red_light_wait_penalty))
-        
-        self.loop_threshold_base_var.set(str(self.reward_config.loop_threshold_base))
-        self.loop_penalty_base_var.set(str(self.reward_config.loop_penalty_base))
-        self.proximity_base_var.set(str(self.reward_config.proximity_base_multiplier))
-        self.proximity_max_var.set(str(self.reward_config.proximity_max_multiplier))
-        
-        # Reset algorithm and exponential distance parameters
-        self.algorithm_var.set(self.reward_config.algorithm)
-        self.exp_base_reward_var.set(str(self.reward_config.exp_base_reward))
-        self.exp_amplitude_var.set(str(self.reward_config.exp_amplitude))
-        self.exp_x_scale_var.set(str(self.reward_config.exp_x_scale))
-        self.exp_y_scale_var.set(str(self.reward_config.exp_y_scale))
+        self.reward_config.reset_to_defaults()  # The listener refreshes the GUI values
         
         self.update_status("Reward configuration reset to defaults")
     
@@ -1249,7 +1301,6 @@ class SimulationController:
                 congestion_penalty_multiplier=15,
                 algorithm="proximity_based"  # Use proximity based for aggressive
             )
-            self.update_reward_gui_from_config()
             self.update_status("Loaded aggressive configuration")
             preset_window.destroy()
         
@@ -1262,7 +1313,6 @@ class SimulationController:
                 congestion_penalty_multiplier=2,
                 algorithm="proximity_based"  # Use proximity based for cautious
             )
-            self.update_reward_gui_from_config()
             self.update_status("Loaded cautious configuration")
             preset_window.destroy()
         
@@ -1277,13 +1327,11 @@ class SimulationController:
                 astar_follow_reward=10,
                 destination_reached_reward=100
             )
-            self.update_reward_gui_from_config()
             self.update_status("Loaded exponential distance configuration")
             preset_window.destroy()
         
         def load_balanced():
             self.reward_config.reset_to_defaults()
-            self.update_reward_gui_from_config()
             self.update_status("Loaded balanced configuration")
             preset_window.destroy()
         
@@ -1329,11 +1377,11 @@ class SimulationController:
     
 def main():
     """Main function to launch the simulation controller"""
-    # Try to load a recent trained agent from pickle file
+    # Try to load a recent trained agent, preferring the checkpoint over the legacy pickle
     agent = None
     try:
-        with open("trained_agent.pkl", "rb") as f:
-            agent = pickle.load(f)
+        path = "trained_agent.vqt" if os.path.exists("trained_agent.vqt") else "trained_agent.pkl"
+        agent = load_agent_file(path)
         print("Loaded existing trained agent")
     except FileNotFoundError:
         print("No saved agent found. Please train an agent or create a new one")
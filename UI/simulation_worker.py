@@ -0,0 +1,132 @@
+"""
+Simulation Worker for Q-Learning Urban Traffic Simulation
+
+Advances a simulation in a background thread so that its speed is not bound to the
+rendering speed of the Tk main loop. After each step the worker may publish a
+snapshot of the state to a small bounded queue; the GUI takes the newest snapshot
+whenever it is ready to draw and older ones are dropped. The worker never touches Tk.
+"""
+import queue
+import threading
+import time
+
+
+class SimulationWorker:
+    """Run simulation steps in a background thread and publish snapshots
+
+    Every step runs while holding `lock`, so the GUI thread can hold the same lock to
+    change the grid or vehicles safely between steps.
+    """
+
+    def __init__(self, step, snapshot, step_delay=None, max_fps=30, max_frames=2):
+        """Create a paused worker
+
+        Args:
+            step: Callable that advances the simulation by one step and returns True
+                  when the simulation is finished
+            snapshot: Callable returning a snapshot of the current state
+            step_delay: Optional callable returning the pause between steps in seconds
+            max_fps: Maximum number of snapshots published per second
+            max_frames: Capacity of the frame queue; the oldest frame is dropped when full
+        """
+        self._step = step
+        self._snapshot = snapshot
+        self._step_delay = step_delay
+        self.min_publish_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.lock = threading.Lock()
+        self.frames = queue.Queue(maxsize=max_frames)
+        self.steps = 0
+        self.dropped_frames = 0
+        self.finished = False
+        self.error = None  # Exception raised by a step, if any
+        self._last_publish = 0.0
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def start(self):
+        """Start stepping in a new daemon thread"""
+        self._thread = threading.Thread(target=self._run, name="simulation-worker", daemon=True)
+        self._running.set()
+        self._thread.start()
+
+    def pause(self):
+        """Stop stepping after the current step and publish the state it left"""
+        self._running.clear()
+        with self.lock:
+            if not self.finished:
+                self.publish(self._snapshot())
+
+    def resume(self):
+        """Continue stepping"""
+        self._running.set()
+
+    def stop(self):
+        """Stop the thread and wait for it to exit
+
+        A step in progress is always finished first, however long it takes, so the
+        caller can change the simulation as soon as this returns.
+        """
+        self._stopped.set()
+        self._running.set()  # Wake a paused thread so that it can exit
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def publish(self, frame):
+        """Put a frame in the queue, dropping the oldest frame if it is full"""
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def latest_frame(self):
+        """Take every queued frame and return the newest one (None if there is none)"""
+        frame = None
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+            except queue.Empty:
+                return frame
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._running.wait()
+            if self._stopped.is_set():
+                break
+
+            with self.lock:
+                if not self._running.is_set() or self._stopped.is_set():
+                    continue  # Paused or stopped while waiting for the lock
+                try:
+                    finished = self._step()
+                except Exception as e:
+                    self.error = e
+                    finished = True
+                self.steps += 1
+
+                # Snapshots cost a copy of the state, so only take as many as can be shown
+                now = time.monotonic()
+                if finished or now - self._last_publish >= self.min_publish_interval:
+                    self.publish(self._snapshot())
+                    self._last_publish = now
+
+            if finished:
+                self.finished = True
+                break
+
+            delay = self._step_delay() if self._step_delay is not None else 0
+            if delay > 0:
+                self._stopped.wait(delay)
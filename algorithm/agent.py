@@ -1,16 +1,40 @@
 import numpy as np
-import random
 from collections import defaultdict
+from algorithm.q_table import DenseQTable, SharedDenseQTable, decode_state, direction_table
+from module.actions import AGENT_ACTIONS_BY_MASK, MASK_BITS
 
 class QLearningAgent:
-    def __init__(self, urban_grid, learning_rate=0.2, discount_factor=0.95, epsilon=0.2):
+    def __init__(self, urban_grid, learning_rate=0.2, discount_factor=0.95, epsilon=0.2, q_table_backend="dict"):
+        """Create a Q-learning agent
+        
+        Args:
+            urban_grid: The urban grid the agent navigates
+            learning_rate: Q-learning step size
+            discount_factor: Discount applied to future rewards
+            epsilon: Exploration rate for the epsilon-greedy policy
+            q_table_backend: "dict" for a defaultdict keyed by state tuples, "dense"
+                             for a contiguous float32 array indexed by encoded states, or
+                             "shared" for a dense table in shared memory that worker
+                             processes can train concurrently
+        """
         self.urban_grid = urban_grid
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.epsilon = epsilon  # Increased exploration rate
-        self.q_table = defaultdict(lambda: np.zeros(4))  # Up, Right, Down, Left
+        self.q_table_backend = q_table_backend
+        self.q_table = self.create_q_table()  # Up, Right, Down, Left
         self.actions = [(0, 1), (1, 0), (0, -1), (-1, 0)]  # Up, Right, Down, Left
     
+    def create_q_table(self):
+        """Create an empty Q-table for the configured backend"""
+        if self.q_table_backend == "dense":
+            return DenseQTable(self.urban_grid.size)
+        if self.q_table_backend == "shared":
+            return SharedDenseQTable(self.urban_grid.size)
+        if self.q_table_backend == "dict":
+            return defaultdict(lambda: np.zeros(4))
+        raise ValueError(f"Unknown Q-table backend '{self.q_table_backend}'. Use 'dict', 'dense' or 'shared'.")
+    
     def prepare_for_save(self):
         """Prepare agent for pickling by removing unpicklable parts"""
         # Store the grid parameters we need to recreate the urban_grid
@@ -34,28 +58,43 @@ class QLearningAgent:
         if self.visualizer_existed and visualizer_backup is not None:
             self.urban_grid.visualizer = visualizer_backup
         
-    def get_state_key(self, position, congestion_level):
-        """Convert state to a hashable key"""
+    def get_state_key(self, position, congestion_level, destination=None):
+        """Convert state to a hashable key
+        
+        Args:
+            position: Current (x, y) position
+            congestion_level: Congestion level around the position
+            destination: The vehicle's destination (defaults to current_destination)
+        """
         # Discretize congestion level to 5 levels
         congestion_discrete = min(4, int(congestion_level * 5))
         
-        # Get direction to destination (discretized to 8 directions)
-        if hasattr(self, 'current_destination'):
-            dx = self.current_destination[0] - position[0]
-            dy = self.current_destination[1] - position[1]
-            angle = np.arctan2(dy, dx)
-            direction = int(((angle + np.pi) * 4 / np.pi + 0.5) % 8)
+        # Get direction to destination (discretized to 8 directions) from the lookup table
+        if destination is None:
+            destination = getattr(self, 'current_destination', None)
+        if destination is not None:
+            offset = self.urban_grid.size - 1
+            direction = int(direction_table(self.urban_grid.size)[destination[0] - position[0] + offset,
+                                                                  destination[1] - position[1] + offset])
         else:
             direction = 0
         
         return (position[0], position[1], congestion_discrete, direction)
     
-    def choose_action(self, state, position):
-        """Choose an action using epsilon-greedy policy"""
-        if random.random() < self.epsilon:
+    def choose_action(self, state, position, rng=None):
+        """Choose an action using epsilon-greedy policy
+        
+        Args:
+            state: State key
+            position: Current (x, y) position
+            rng: numpy Generator for the random decisions (defaults to the grid's generator)
+        """
+        if rng is None:
+            rng = self.urban_grid.rng
+        if rng.random() < self.epsilon:
             # Exploration: random action
             valid_actions = self.get_valid_actions(position)
-            return random.choice(valid_actions)
+            return valid_actions[rng.integers(len(valid_actions))]
         else:
             # Exploitation: choose best action from Q-table
             valid_actions = self.get_valid_actions(position)
@@ -63,10 +102,89 @@ class QLearningAgent:
             max_q = max(q_values)
             # Handle multiple actions with the same max value
             best_actions = [valid_actions[i] for i in range(len(valid_actions)) if q_values[i] == max_q]
-            return random.choice(best_actions)
+            return best_actions[rng.integers(len(best_actions))]
+    
+    def encode_states(self, positions, congestion_levels, destinations):
+        """Vectorized get_state_key returning dense Q-table row indices
+        
+        Args:
+            positions: (N, 2) integer array of vehicle positions
+            congestion_levels: (N,) array of congestion levels in [0, 1]
+            destinations: (N, 2) integer array of destinations
+        
+        Returns:
+            (N,) integer array of encoded states (see DenseQTable.encode)
+        """
+        positions = np.asarray(positions)
+        destinations = np.asarray(destinations)
+        congestion_discrete = np.minimum(4, (np.asarray(congestion_levels) * 5).astype(int))
+        offset = self.urban_grid.size - 1
+        delta = destinations - positions + offset
+        direction = direction_table(self.urban_grid.size)[delta[:, 0], delta[:, 1]]
+        return ((positions[:, 0] * self.urban_grid.size + positions[:, 1]) * DenseQTable.NUM_CONGESTION_LEVELS
+                + congestion_discrete) * DenseQTable.NUM_DIRECTIONS + direction
+    
+    def get_q_values(self, states):
+        """Get the Q-value rows of a batch of states as an (N, 4) array
+        
+        Args:
+            states: Encoded states (dense backends) or a sequence of state keys
+        """
+        if isinstance(self.q_table, DenseQTable) and not isinstance(states, list):
+            states = np.asarray(states)
+            self.q_table.visited[states] = True
+            return self.q_table.q_values[states]
+        return np.array([self.q_table[state] for state in states], dtype=float).reshape(-1, 4)
+    
+    def choose_actions(self, states, positions=None, valid_masks=None, rng=None):
+        """Choose epsilon-greedy actions for a batch of states in one call
+        
+        Equivalent to calling choose_action for every state: invalid actions are masked
+        out of the argmax and ties (and exploration) are broken uniformly at random.
+        
+        Args:
+            states: Encoded states (dense backends) or a sequence of state keys
+            positions: Optional (N, 2) positions used to look up valid actions on the grid
+            valid_masks: Optional valid actions, either (N, 4) booleans or 4-bit masks;
+                         overrides positions (if both are None, every action is valid)
+            rng: numpy Generator for the random decisions (defaults to the grid's generator)
+        
+        Returns:
+            (N,) integer array of action indices
+        """
+        if rng is None:
+            rng = self.urban_grid.rng
+        q_values = self.get_q_values(states)
+        batch = len(q_values)
+        
+        if valid_masks is None and positions is not None:
+            positions = np.asarray(positions)
+            valid_masks = self.urban_grid.valid_action_mask[positions[:, 0], positions[:, 1]]
+        if valid_masks is None:
+            valid = np.ones((batch, 4), dtype=bool)
+        else:
+            valid = np.asarray(valid_masks)
+            if valid.dtype != bool:
+                valid = MASK_BITS[valid]
+        # Failsafe from get_valid_actions: with no valid move, every direction is allowed
+        valid = valid | ~valid.any(axis=1, keepdims=True)
+        
+        masked = np.where(valid, q_values, -np.inf)
+        best = valid & (masked == masked.max(axis=1, keepdims=True))
+        
+        explore = rng.random(batch) < self.epsilon
+        candidates = np.where(explore[:, None], valid, best)
+        # Uniform choice among candidates: the largest random key wins
+        keys = np.where(candidates, rng.random((batch, 4)) + 1e-12, 0)
+        return keys.argmax(axis=1)
     
     def get_valid_actions(self, position):
         """Get valid actions at current position (avoiding grid boundaries and obstacles)"""
+        valid_action_mask = getattr(self.urban_grid, 'valid_action_mask', None)
+        if valid_action_mask is not None:
+            # Precomputed by the grid; a cell with no valid move allows all directions
+            return AGENT_ACTIONS_BY_MASK[valid_action_mask.item(position[0], position[1])]
+        
         valid_actions = []
         for i, (dx, dy) in enumerate(self.actions):
             new_x = position[0] + dx
@@ -90,14 +208,62 @@ class QLearningAgent:
                                      self.learning_rate * (reward + self.discount_factor * 
                                                          self.q_table[next_state][best_next_action])
                                                          
+    def update_q_batch(self, states, actions, rewards, next_states, duplicates="mean"):
+        """Apply many Q-learning updates at once
+        
+        Args:
+            states: Encoded states (see DenseQTable.encode) of the transitions
+            actions: Action indices
+            rewards: Rewards received
+            next_states: Encoded states reached
+            duplicates: How transitions sharing a (state, action) pair are handled:
+                        "mean" - all targets are computed from the Q-values before the
+                                 batch and each pair gets one update towards the mean of
+                                 its targets (order independent, fully vectorized)
+                        "sequential" - transitions are applied one after another,
+                                       exactly like repeated update_q_table calls
+        """
+        states = np.asarray(states, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=float)
+        next_states = np.asarray(next_states, dtype=np.int64)
+        dense = isinstance(self.q_table, DenseQTable)
+        size = self.urban_grid.size
+        
+        if duplicates == "sequential":
+            for state, action, reward, next_state in zip(states.tolist(), actions.tolist(),
+                                                         rewards.tolist(), next_states.tolist()):
+                if not dense:
+                    state, next_state = decode_state(state, size), decode_state(next_state, size)
+                self.update_q_table(state, action, reward, next_state)
+            return
+        if duplicates != "mean":
+            raise ValueError(f"Unknown duplicates policy '{duplicates}'. Use 'mean' or 'sequential'.")
+        
+        next_keys = next_states if dense else [decode_state(s, size) for s in next_states.tolist()]
+        targets = rewards + self.discount_factor * self.get_q_values(next_keys).max(axis=1)
+        
+        # Average the targets of every distinct (state, action) pair
+        pairs, inverse = np.unique(states * 4 + actions, return_inverse=True)
+        mean_targets = np.bincount(inverse, weights=targets) / np.bincount(inverse)
+        pair_states, pair_actions = np.divmod(pairs, 4)
+        
+        if dense:
+            q_values = self.q_table.q_values
+            q_values[pair_states, pair_actions] = ((1 - self.learning_rate) * q_values[pair_states, pair_actions]
+                                                   + self.learning_rate * mean_targets)
+            self.q_table.visited[pair_states] = True
+        else:
+            for state, action, target in zip(pair_states.tolist(), pair_actions.tolist(), mean_targets.tolist()):
+                row = self.q_table[decode_state(state, size)]
+                row[action] = (1 - self.learning_rate) * row[action] + self.learning_rate * target
+    
     def reset_state_q_values(self, state):
         """Reset Q-values for a state to encourage exploration of other paths
         
         This is called when a loop is detected in the vehicle's path, to 
         discourage the agent from getting stuck in loops
         """
-        # Set Q-values for this state to below average to discourage revisiting
-        avg_q = np.mean(list(self.q_table.values()))
         # Reset to small negative values to encourage exploration
         self.q_table[state] = np.ones(4) * -0.5
     
@@ -106,7 +272,9 @@ class QLearningAgent:
         state = self.__dict__.copy()
         
         # Convert defaultdict q_table to regular dict for pickling
-        state['q_table'] = dict(self.q_table)
+        # (the dense backend is a plain object of arrays and pickles as is)
+        if not isinstance(self.q_table, DenseQTable):
+            state['q_table'] = dict(self.q_table)
         
         # Remove unpicklable parts
         visualizer_backup = self.prepare_for_save()
@@ -118,10 +286,15 @@ class QLearningAgent:
         """Called when unpickling the agent - restore after deserialization"""
         self.__dict__.update(state)
         
+        # Agents saved before the dense backend existed always used a dict
+        if not hasattr(self, 'q_table_backend'):
+            self.q_table_backend = "dict"
+        
         # Convert back to defaultdict
-        self.q_table = defaultdict(lambda: np.zeros(4))
-        for k, v in state['q_table'].items():
-            self.q_table[k] = v
+        if not isinstance(state['q_table'], DenseQTable):
+            self.q_table = defaultdict(lambda: np.zeros(4))
+            for k, v in state['q_table'].items():
+                self.q_table[k] = v
         
         # Recreate urban_grid if needed
         if not hasattr(self, 'urban_grid') or self.urban_grid is None:
@@ -1,11 +1,19 @@
 import heapq
 import numpy as np
+from module.actions import NEIGHBOR_OFFSETS_BY_MASK
 
 def manhattan_distance(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-def get_neighbors(pos, grid_size, obstacles):
-    """Get valid neighboring positions"""
+def get_neighbors(pos, grid_size, obstacles, valid_mask=None):
+    """Get valid neighboring positions
+    
+    If a precomputed valid-action mask (see UrbanGrid.valid_action_mask) is given, the
+    neighbors are read from it instead of checking bounds and obstacles.
+    """
+    if valid_mask is not None:
+        x, y = pos
+        return [(x + dx, y + dy) for dx, dy in NEIGHBOR_OFFSETS_BY_MASK[valid_mask.item(x, y)]]
     neighbors = []
     for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:  # Up, Right, Down, Left
         new_x, new_y = pos[0] + dx, pos[1] + dy
@@ -15,7 +23,7 @@ def get_neighbors(pos, grid_size, obstacles):
             neighbors.append((new_x, new_y))
     return neighbors
 
-def astar(start, goal, grid_size, obstacles, congestion):
+def astar(start, goal, grid_size, obstacles, congestion, valid_mask=None):
     """A* pathfinding algorithm with congestion consideration
     
     Args:
@@ -24,6 +32,7 @@ def astar(start, goal, grid_size, obstacles, congestion):
         grid_size: Size of the grid
         obstacles: Boolean array of obstacles
         congestion: Array of congestion levels
+        valid_mask: Optional valid-action bitmask matching obstacles
     
     Returns:
         path: List of positions from start to goal, or None if no path found
@@ -52,7 +61,7 @@ def astar(start, goal, grid_size, obstacles, congestion):
             path.reverse()
             return path
 
-        for next_pos in get_neighbors(current, grid_size, obstacles):
+        for next_pos in get_neighbors(current, grid_size, obstacles, valid_mask):
             new_cost = cost_so_far[current] + get_path_cost(next_pos)
             
             if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
@@ -0,0 +1,412 @@
+"""
+Q-table Checkpoint Module
+
+This module saves and loads trained agents in a compact binary format instead of
+pickling the whole agent object:
+
+    [magic "VQTABLE1"][u32 header length][header JSON]            padded to 64 bytes
+    [magic "VQSEGMNT"][u32 meta length][segment meta JSON]        padded to 64 bytes
+    [segment payloads]                                            each padded to 64 bytes
+    [magic "VQSEGEND"][u32 CRC-32 of the meta JSON and payloads]  padded to 64 bytes
+    ... more segments ...
+
+The header holds the agent and grid parameters. Each segment holds Q-values:
+  - a dense segment stores the whole (num_states, 4) float32 matrix followed by a
+    bit-packed visited mask, so an uncompressed dense checkpoint can be memory-mapped;
+  - a sparse segment stores int64 encoded state indices and their float32 rows.
+Segments are applied in order, so a checkpoint can be extended incrementally by
+appending a sparse segment with only the rows that changed since the last save.
+Payloads can optionally be zlib-compressed.
+
+A crash while appending can leave the last segment cut short. Its length or checksum
+check then fails, and the loader keeps the segments before it with a warning.
+Version 1 files, written before the checksums were added, still load.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import struct
+import zlib
+from collections import defaultdict
+import numpy as np
+from algorithm.q_table import DenseQTable, encode_state
+
+MAGIC = b"VQTABLE1"
+SEGMENT_MAGIC = b"VQSEGMNT"
+SEGMENT_END = b"VQSEGEND"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+
+def _padding(length):
+    """Number of bytes needed to pad length up to the alignment"""
+    return -length % ALIGNMENT
+
+
+def _write_block(f, magic, info):
+    """Write a magic tag followed by a length-prefixed JSON block, padded; returns the JSON bytes"""
+    data = json.dumps(info).encode("utf-8")
+    block = magic + struct.pack("<I", len(data)) + data
+    f.write(block + b"\0" * _padding(len(block)))
+    return data
+
+
+def _read_exact(f, nbytes):
+    """Read exactly nbytes, raising EOFError if the file ends first"""
+    data = f.read(nbytes)
+    if len(data) != nbytes:
+        raise EOFError(f"expected {nbytes} bytes, found {len(data)}")
+    return data
+
+
+def _read_block_data(f, magic):
+    """Read the JSON bytes of a block written by _write_block, or return None at end of file"""
+    tag = f.read(len(magic))
+    if not tag:
+        return None
+    if tag != magic:
+        if magic.startswith(tag):
+            raise EOFError("block tag cut short")
+        raise ValueError("Not a Q-table checkpoint or the file is corrupted")
+    (length,) = struct.unpack("<I", _read_exact(f, 4))
+    data = _read_exact(f, length)
+    _read_exact(f, _padding(len(magic) + 4 + length))
+    return data
+
+
+def _read_block(f, magic):
+    """Read a block written by _write_block, or return None at end of file"""
+    data = _read_block_data(f, magic)
+    return None if data is None else json.loads(data.decode("utf-8"))
+
+
+def _payload_bytes(data, compress):
+    """Serialize one payload array, compressing it if requested"""
+    data = np.ascontiguousarray(data).tobytes()
+    return zlib.compress(data) if compress else data
+
+
+def _write_segment(f, meta, payloads):
+    """Write a segment header, its padded payloads and a checksum trailer"""
+    crc = zlib.crc32(_write_block(f, SEGMENT_MAGIC, meta))
+    for data in payloads:
+        f.write(data + b"\0" * _padding(len(data)))
+        crc = zlib.crc32(data, crc)
+    trailer = SEGMENT_END + struct.pack("<I", crc)
+    f.write(trailer + b"\0" * _padding(len(trailer)))
+
+
+def _atomic_write(path, write):
+    """Write a file through a temporary file in the same directory and move it into place
+
+    The old file is never truncated, so a process that still memory-maps it (for example
+    an agent loaded with mmap=True from the same path) keeps reading valid data, and an
+    interrupted save leaves the previous file intact.
+
+    Args:
+        path: Destination file path
+        write: Callable taking the open binary file object and writing the contents
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_table_arrays(agent, dtype=np.float32):
+    """Get the visited states of an agent's Q-table as (encoded indices, Q-value rows)"""
+    q_table = agent.q_table
+    if isinstance(q_table, DenseQTable):
+        indices = np.flatnonzero(q_table.visited)
+        return indices.astype(np.int64), q_table.q_values[indices].astype(dtype)
+
+    indices = np.array([encode_state(key, agent.urban_grid.size) for key in q_table.keys()], dtype=np.int64)
+    values = np.array(list(q_table.values()), dtype=dtype).reshape(-1, DenseQTable.NUM_ACTIONS)
+    return indices, values
+
+
+def _header(agent):
+    grid = agent.urban_grid
+    return {
+        "format_version": FORMAT_VERSION,
+        "grid_size": grid.size,
+        "congestion_update_rate": grid.congestion_update_rate,
+        "traffic_light_cycle": grid.traffic_light_cycle,
+        "learning_rate": agent.learning_rate,
+        "discount_factor": agent.discount_factor,
+        "epsilon": agent.epsilon,
+        # Shared tables are saved as plain dense ones: the shared block does not outlive training
+        "q_table_backend": "dense" if isinstance(agent.q_table, DenseQTable) else "dict",
+        "num_congestion_levels": DenseQTable.NUM_CONGESTION_LEVELS,
+        "num_directions": DenseQTable.NUM_DIRECTIONS,
+        "num_actions": DenseQTable.NUM_ACTIONS,
+    }
+
+
+def _write_dense_segment(f, q_table, compress):
+    values = _payload_bytes(q_table.q_values.astype(np.float32, copy=False), compress)
+    visited = _payload_bytes(np.packbits(q_table.visited), compress)
+    meta = {"type": "dense", "count": int(q_table.num_states), "compressed": compress,
+            "values_nbytes": len(values), "visited_nbytes": len(visited)}
+    _write_segment(f, meta, (values, visited))
+
+
+def _write_sparse_segment(f, indices, values, compress):
+    count = int(len(indices))
+    dtype = np.dtype(values.dtype).name
+    indices = _payload_bytes(indices.astype(np.int64, copy=False), compress)
+    values = _payload_bytes(values, compress)
+    meta = {"type": "sparse", "count": count, "compressed": compress, "dtype": dtype,
+            "indices_nbytes": len(indices), "values_nbytes": len(values)}
+    _write_segment(f, meta, (indices, values))
+
+
+def save_checkpoint(agent, path, compress=False, dtype=np.float32):
+    """Save an agent's parameters and Q-table to a checkpoint file
+
+    Args:
+        agent: The QLearningAgent to save
+        path: Output file path (conventionally ending in .vqt)
+        compress: Whether to zlib-compress the Q-values (compressed files cannot be memory-mapped)
+        dtype: Value type for dict Q-tables (np.float64 keeps them bit-exact; dense
+               tables are always stored as float32)
+    """
+    def write(f):
+        _write_block(f, MAGIC, _header(agent))
+        if isinstance(agent.q_table, DenseQTable):
+            _write_dense_segment(f, agent.q_table, compress)
+        else:
+            _write_sparse_segment(f, *get_table_arrays(agent, dtype), compress)
+
+    _atomic_write(path, write)
+
+
+class CheckpointWriter:
+    """Save an agent repeatedly, appending only the Q-values that changed
+
+    The first write() creates a full checkpoint; every later write() appends a sparse
+    segment holding the rows that differ from the previous save and syncs it to disk.
+    """
+
+    def __init__(self, agent, path, compress=False):
+        self.agent = agent
+        self.path = path
+        self.compress = compress
+        self._saved = None  # Dense float32 copy of the Q-values as of the last write
+
+    def write(self):
+        """Write the current Q-table; returns the number of rows written"""
+        num_states = self.agent.urban_grid.size ** 2 * DenseQTable.NUM_CONGESTION_LEVELS * DenseQTable.NUM_DIRECTIONS
+        indices, values = get_table_arrays(self.agent)
+        current = np.zeros((num_states, DenseQTable.NUM_ACTIONS), dtype=np.float32)
+        visited = np.zeros(num_states, dtype=bool)
+        current[indices] = values
+        visited[indices] = True
+
+        if self._saved is None:
+            save_checkpoint(self.agent, self.path, self.compress)
+            written = len(indices)
+        else:
+            saved_values, saved_visited = self._saved
+            changed = np.flatnonzero((visited & ~saved_visited) | np.any(current != saved_values, axis=1))
+            with open(self.path, "r+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                try:
+                    _write_sparse_segment(f, changed, current[changed], self.compress)
+                    f.flush()
+                    os.fsync(f.fileno())
+                except BaseException:
+                    # Do not leave a partial segment in front of the next append
+                    f.truncate(end)
+                    raise
+            written = len(changed)
+
+        self._saved = (current, visited)
+        return written
+
+
+def _read_payload(f, nbytes):
+    data = _read_exact(f, nbytes)
+    _read_exact(f, _padding(nbytes))
+    return data
+
+
+def _decode_payload(data, dtype, compressed):
+    if compressed:
+        data = zlib.decompress(data)
+    return np.frombuffer(data, dtype=dtype)
+
+
+def _read_segment(f, path, mmap, checksum):
+    """Read the next segment as (meta, first array, second array), or None at end of file
+
+    Dense segments give (Q-values, packed visited mask) and sparse segments give
+    (encoded indices, Q-value rows).
+
+    Raises:
+        EOFError: If the file ends inside the segment
+        ValueError: If the segment is malformed or fails its checksum
+    """
+    data = _read_block_data(f, SEGMENT_MAGIC)
+    if data is None:
+        return None
+    meta = json.loads(data.decode("utf-8"))
+    crc = zlib.crc32(data)
+    compressed = meta["compressed"]
+    if meta["type"] == "dense":
+        shape = (meta["count"], DenseQTable.NUM_ACTIONS)
+        nbytes = meta["values_nbytes"]
+        if mmap and not compressed:
+            offset = f.tell()
+            if offset + nbytes + _padding(nbytes) > os.fstat(f.fileno()).st_size:
+                raise EOFError("dense values cut short")
+            first = np.memmap(path, dtype=np.float32, mode="c", offset=offset, shape=shape)
+            crc = zlib.crc32(first, crc)
+            f.seek(nbytes + _padding(nbytes), 1)
+        else:
+            raw = _read_payload(f, nbytes)
+            crc = zlib.crc32(raw, crc)
+            first = _decode_payload(raw, np.float32, compressed).reshape(shape).copy()
+        raw = _read_payload(f, meta["visited_nbytes"])
+        crc = zlib.crc32(raw, crc)
+        second = _decode_payload(raw, np.uint8, compressed)
+    else:
+        raw_indices = _read_payload(f, meta["indices_nbytes"])
+        raw_values = _read_payload(f, meta["values_nbytes"])
+        crc = zlib.crc32(raw_values, zlib.crc32(raw_indices, crc))
+        first = _decode_payload(raw_indices, np.int64, compressed)
+        second = _decode_payload(raw_values, meta.get("dtype", "float32"), compressed)
+        second = second.reshape(-1, DenseQTable.NUM_ACTIONS)
+
+    if checksum:
+        if _read_exact(f, len(SEGMENT_END)) != SEGMENT_END:
+            raise ValueError("missing segment trailer")
+        (stored,) = struct.unpack("<I", _read_exact(f, 4))
+        _read_exact(f, _padding(len(SEGMENT_END) + 4))
+        if stored != crc:
+            raise ValueError("segment checksum mismatch")
+    return meta, first, second
+
+
+def load_checkpoint(path, urban_grid=None, mmap=False):
+    """Load an agent from a checkpoint file
+
+    Args:
+        path: Checkpoint file path
+        urban_grid: Optional grid for the agent (if None, a grid is created from the header)
+        mmap: Memory-map the Q-values of an uncompressed dense checkpoint instead of reading
+              them into memory (copy-on-write: training the loaded agent never modifies
+              the file); only for callers that treat the file as read-only while the
+              agent is alive
+
+    Returns:
+        A QLearningAgent with the saved parameters and Q-values
+    """
+    from algorithm.agent import QLearningAgent
+    from module.urban_grid import UrbanGrid
+
+    with open(path, "rb") as f:
+        header = _read_block(f, MAGIC)
+        if header is None or header.get("format_version") not in (1, FORMAT_VERSION):
+            raise ValueError(f"Unsupported checkpoint format in '{path}'")
+
+        grid_size = header["grid_size"]
+        if urban_grid is None:
+            urban_grid = UrbanGrid(size=grid_size,
+                                   congestion_update_rate=header["congestion_update_rate"],
+                                   traffic_light_cycle=header["traffic_light_cycle"])
+        elif urban_grid.size != grid_size:
+            raise ValueError(f"Checkpoint grid size {grid_size} does not match grid size {urban_grid.size}")
+
+        agent = QLearningAgent(urban_grid, learning_rate=header["learning_rate"],
+                               discount_factor=header["discount_factor"], epsilon=header["epsilon"],
+                               q_table_backend=header["q_table_backend"])
+        table = DenseQTable(grid_size)
+        rows = {}  # Sparse rows of a dict agent, by encoded state
+        checksum = header["format_version"] >= 2
+        num_segments = 0
+
+        while True:
+            try:
+                segment = _read_segment(f, path, mmap, checksum)
+            except (EOFError, ValueError, zlib.error) as e:
+                if num_segments == 0:
+                    raise ValueError(f"Checkpoint '{path}' has no complete Q-table segment ({e})") from e
+                # A crash while appending leaves the last increment incomplete
+                print(f"Warning: ignoring a damaged segment at the end of checkpoint '{path}' ({e}); "
+                      f"loaded the {num_segments} complete segments before it")
+                break
+            if segment is None:
+                break
+            meta, first, second = segment
+            num_segments += 1
+            if meta["type"] == "dense":
+                table.q_values = first
+                table.visited = np.unpackbits(second, count=meta["count"]).astype(bool)
+            else:
+                indices, values = first, second
+                if agent.q_table_backend == "dense":
+                    table.q_values[indices] = values
+                    table.visited[indices] = True
+                else:
+                    rows.update(zip(indices.tolist(), values))
+
+    if agent.q_table_backend == "dense":
+        agent.q_table = table
+    else:
+        agent.q_table = defaultdict(lambda: np.zeros(4))
+        for index, row in rows.items():
+            agent.q_table[table.decode(index)] = np.array(row, dtype=float)
+    return agent
+
+
+def is_checkpoint(path):
+    """Check whether a file is a Q-table checkpoint (rather than a pickled agent)"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_agent(agent, path, compress=False):
+    """Save an agent, as a pickle for .pkl paths and as a checkpoint otherwise"""
+    if str(path).endswith(".pkl"):
+        # Prepare agent for saving (remove tkinter objects)
+        visualizer_backup = agent.prepare_for_save()
+        try:
+            _atomic_write(path, lambda f: pickle.dump(agent, f))
+        finally:
+            agent.restore_after_save(visualizer_backup)
+    else:
+        save_checkpoint(agent, path, compress=compress)
+
+
+def load_agent(path, mmap=False):
+    """Load an agent saved either as a checkpoint or as a pickle
+
+    Args:
+        path: Checkpoint or pickle file path
+        mmap: Memory-map the Q-values of a dense checkpoint (see load_checkpoint)
+    """
+    if is_checkpoint(path):
+        return load_checkpoint(path, mmap=mmap)
+
+    with open(path, "rb") as f:
+        agent = pickle.load(f)
+
+    # Make sure urban_grid is properly initialized
+    if not hasattr(agent, 'urban_grid') or agent.urban_grid is None:
+        from module.urban_grid import UrbanGrid
+        agent.urban_grid = UrbanGrid(
+            size=agent.grid_size,
+            congestion_update_rate=agent.grid_congestion_update_rate,
+            traffic_light_cycle=agent.grid_traffic_light_cycle
+        )
+    return agent
@@ -0,0 +1,109 @@
+"""
+Experience Buffer Module
+
+This module collects Q-learning transitions (state, action, reward, next state) in
+fixed-capacity NumPy arrays. Transitions gathered from every vehicle during a step are
+applied to the agent together with QLearningAgent.update_q_batch, and the stored
+history can be replayed in later episodes for more learning per simulated step.
+States are stored as dense encoded indices (see algorithm.q_table.encode_state).
+"""
+
+import numpy as np
+
+
+class ExperienceBuffer:
+    """Ring buffer of transitions with a pending range for batched updates
+
+    Newly added transitions are "pending" until flush() applies them to an agent; all
+    stored transitions (pending or not) can be sampled by replay(). When the buffer is
+    full the oldest transitions are overwritten.
+    """
+
+    def __init__(self, capacity=100000):
+        """Create an empty buffer
+
+        Args:
+            capacity: Maximum number of transitions kept for replay
+        """
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.size = 0  # Number of stored transitions
+        self.next_index = 0  # Ring position of the next write
+        self.pending = 0  # Number of most recent transitions not yet applied
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state):
+        """Add one transition (states as encoded indices)"""
+        self.add_batch([state], [action], [reward], [next_state])
+
+    def add_batch(self, states, actions, rewards, next_states):
+        """Add a batch of transitions (states as encoded indices)"""
+        count = len(states)
+        if count > self.capacity:
+            raise ValueError(f"Cannot add {count} transitions to a buffer of capacity {self.capacity}")
+        slots = (self.next_index + np.arange(count)) % self.capacity
+        self.states[slots] = states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.next_states[slots] = next_states
+        self.next_index = (self.next_index + count) % self.capacity
+        self.size = min(self.capacity, self.size + count)
+        self.pending = min(self.capacity, self.pending + count)
+
+    def _slots(self, slots):
+        return self.states[slots], self.actions[slots], self.rewards[slots], self.next_states[slots]
+
+    def get_pending(self):
+        """Get the pending transitions in insertion order as (states, actions, rewards, next_states)"""
+        slots = (self.next_index - self.pending + np.arange(self.pending)) % self.capacity
+        return self._slots(slots)
+
+    def flush(self, agent, duplicates="mean"):
+        """Apply the pending transitions to an agent in one batched update
+
+        Args:
+            agent: The QLearningAgent to update
+            duplicates: How repeated (state, action) pairs are combined (see update_q_batch)
+
+        Returns:
+            Number of transitions applied
+        """
+        count = self.pending
+        if count:
+            agent.update_q_batch(*self.get_pending(), duplicates=duplicates)
+            self.pending = 0
+        return count
+
+    def sample(self, batch_size, rng):
+        """Sample stored transitions uniformly with replacement"""
+        return self._slots(rng.integers(0, self.size, size=batch_size))
+
+    def replay(self, agent, batch_size, rng=None, duplicates="mean"):
+        """Apply a random sample of stored transitions to an agent
+
+        Args:
+            agent: The QLearningAgent to update
+            batch_size: Number of transitions to sample
+            rng: numpy Generator used for sampling (defaults to the agent's grid generator)
+            duplicates: How repeated (state, action) pairs are combined (see update_q_batch)
+
+        Returns:
+            Number of transitions applied
+        """
+        if self.size == 0:
+            return 0
+        if rng is None:
+            rng = agent.urban_grid.rng
+        agent.update_q_batch(*self.sample(batch_size, rng), duplicates=duplicates)
+        return batch_size
+
+    def clear(self):
+        """Drop every stored transition"""
+        self.size = 0
+        self.next_index = 0
+        self.pending = 0
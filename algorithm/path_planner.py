@@ -0,0 +1,126 @@
+"""
+Path Planner Module
+
+This module caches A* paths so vehicles do not rerun a full search every time they
+refresh their optimal path. A cached path is reused while the grid changes that
+happened since it was planned cannot affect it, and replanned otherwise.
+"""
+
+from collections import OrderedDict
+import numpy as np
+from algorithm.astar import astar, manhattan_distance
+
+
+def congestion_step_cost(congestion):
+    """Movement cost of entering cells with the given congestion (same rule as astar)"""
+    return np.where(congestion > 0.5, 1.0 + congestion * 2, 1.0)
+
+
+class CachedPath:
+    """A planned path together with what is needed to validate it later"""
+
+    def __init__(self, path, obstacle_version, congestion):
+        self.path = path
+        self.obstacle_version = obstacle_version  # Obstacle version the path was planned at
+        # Latest obstacle version the path was checked against, and the earliest path index
+        # that check covered (a check from one index also holds for every later index)
+        self.validated_version = obstacle_version
+        self.validated_index = 0
+        # First index of every position on the path
+        self.index = {}
+        for i, position in enumerate(path):
+            self.index.setdefault(position, i)
+        self.xs = np.array([p[0] for p in path])
+        self.ys = np.array([p[1] for p in path])
+        # Step costs along the path at planning time
+        self.costs = congestion_step_cost(congestion[self.xs, self.ys])
+
+
+class PathPlanner:
+    """A* planner with a per-goal path cache and selective replanning
+
+    A cached path for a goal is reused from any position on it as long as:
+      - no obstacle was added on the remaining part of the path,
+      - no removed obstacle could lie on a cheaper route (its Manhattan detour is shorter
+        than the remaining path cost),
+      - the congestion cost of the remaining path has not grown by more than
+        replan_threshold relative to when it was planned.
+    Otherwise the path is replanned with a full A* search and the cache is updated.
+    """
+
+    def __init__(self, urban_grid, replan_threshold=0.1, max_cached_paths=256):
+        """Create a planner for an urban grid
+
+        Args:
+            urban_grid: The urban grid to plan on
+            replan_threshold: Relative growth of the remaining path cost that triggers a replan
+            max_cached_paths: Maximum number of goals kept in the cache
+        """
+        self.urban_grid = urban_grid
+        self.replan_threshold = replan_threshold
+        self.max_cached_paths = max_cached_paths
+        self._cache = OrderedDict()  # {goal: CachedPath}
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, start, goal):
+        """Get a path from start to goal, reusing a cached path when it is still valid
+
+        Returns:
+            List of positions from start to goal, or None if no path exists
+        """
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+
+        entry = self._cache.get(goal)
+        if entry is not None and self._is_reusable(entry, start):
+            self._cache.move_to_end(goal)
+            self.hits += 1
+            return entry.path[entry.index[start]:]
+
+        self.misses += 1
+        grid = self.urban_grid
+        path = astar(start, goal, grid.size, grid.obstacles, grid.congestion, grid.valid_action_mask)
+        if path:
+            self._cache[goal] = CachedPath(path, grid.obstacle_version, grid.congestion)
+            self._cache.move_to_end(goal)
+            if len(self._cache) > self.max_cached_paths:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.pop(goal, None)
+        return path
+
+    def invalidate(self):
+        """Drop every cached path"""
+        self._cache.clear()
+
+    def _is_reusable(self, entry, start):
+        """Check whether a cached path is still good enough from start"""
+        start_index = entry.index.get(start)
+        if start_index is None:
+            return False
+
+        grid = self.urban_grid
+        remaining_xs = entry.xs[start_index + 1:]
+        remaining_ys = entry.ys[start_index + 1:]
+        current_costs = congestion_step_cost(grid.congestion_at(remaining_xs, remaining_ys))
+        current_cost = current_costs.sum()
+
+        if not (entry.validated_version == grid.obstacle_version and start_index >= entry.validated_index):
+            # Check every change since planning: an earlier check from a later start does
+            # not cover the part of the path before it
+            changes = grid.get_obstacle_changes(entry.obstacle_version)
+            if changes is None:
+                return False  # The obstacle map was replaced wholesale
+            goal = entry.path[-1]
+            for x, y, added in changes:
+                if added:
+                    if entry.index.get((x, y), -1) > start_index:
+                        return False
+                elif manhattan_distance(start, (x, y)) + manhattan_distance((x, y), goal) < current_cost:
+                    return False
+            entry.validated_version = grid.obstacle_version
+            entry.validated_index = start_index
+
+        planned_cost = entry.costs[start_index + 1:].sum()
+        return current_cost <= planned_cost * (1 + self.replan_threshold)
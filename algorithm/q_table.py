@@ -0,0 +1,211 @@
+"""
+Dense Q-table Module
+
+This module provides an array-backed alternative to the dictionary Q-table used by
+QLearningAgent. The state space (x, y, congestion level, direction) is fully bounded
+by the grid size, so every state can be encoded as an integer row index into a single
+contiguous float32 matrix instead of a dictionary of small ndarrays.
+"""
+
+from functools import lru_cache
+from multiprocessing import shared_memory
+import numpy as np
+
+NUM_CONGESTION_LEVELS = 5
+NUM_DIRECTIONS = 8
+NUM_ACTIONS = 4
+
+
+def encode_state(state, grid_size):
+    """Convert a state key (x, y, congestion, direction) to its dense row index
+
+    Integer indices are passed through unchanged, so callers that already work
+    with encoded states can use them directly.
+    """
+    if isinstance(state, (int, np.integer)):
+        return int(state)
+    x, y, congestion, direction = state
+    return ((int(x) * grid_size + int(y)) * NUM_CONGESTION_LEVELS + int(congestion)) * NUM_DIRECTIONS + int(direction)
+
+
+@lru_cache(maxsize=None)
+def direction_table(grid_size):
+    """Lookup table of the discretized bearing to a destination
+
+    direction_table(size)[dx + size - 1, dy + size - 1] is the direction (0-7) of the
+    offset (dx, dy) from a position to its destination, computed once per grid size
+    with the same arctan2 rule the agent used per step.
+    """
+    offsets = np.arange(-(grid_size - 1), grid_size)
+    dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+    angle = np.arctan2(dy, dx)
+    table = np.floor(((angle + np.pi) * 4 / np.pi + 0.5) % 8).astype(np.int64)
+    table.setflags(write=False)
+    return table
+
+
+def decode_state(index, grid_size):
+    """Convert a dense row index back to its (x, y, congestion, direction) state key"""
+    index, direction = divmod(int(index), NUM_DIRECTIONS)
+    index, congestion = divmod(index, NUM_CONGESTION_LEVELS)
+    x, y = divmod(index, grid_size)
+    return (x, y, congestion, direction)
+
+
+class DenseQTable:
+    """Q-table stored as one (num_states, num_actions) float32 array
+
+    The table behaves like the defaultdict it replaces: indexing with a state key
+    returns a writable row of Q-values (initialized to zero), so existing code such as
+    ``q_table[state][action] = value`` keeps working unchanged.
+    """
+
+    NUM_CONGESTION_LEVELS = NUM_CONGESTION_LEVELS
+    NUM_DIRECTIONS = NUM_DIRECTIONS
+    NUM_ACTIONS = NUM_ACTIONS
+
+    def __init__(self, grid_size, q_values=None, visited=None):
+        """Create an empty dense Q-table for a square grid
+
+        Args:
+            grid_size: Size of the urban grid (the grid is grid_size x grid_size)
+            q_values: Optional existing (num_states, 4) array to wrap
+            visited: Optional existing boolean array marking touched states
+        """
+        self.grid_size = grid_size
+        self.num_states = grid_size * grid_size * self.NUM_CONGESTION_LEVELS * self.NUM_DIRECTIONS
+
+        if q_values is None:
+            q_values = np.zeros((self.num_states, self.NUM_ACTIONS), dtype=np.float32)
+        if visited is None:
+            visited = np.zeros(self.num_states, dtype=bool)
+        self.q_values = q_values
+        self.visited = visited
+
+    def encode(self, state):
+        """Convert a state key (x, y, congestion, direction) to its row index
+
+        Integer indices are passed through unchanged, so callers that already work
+        with encoded states can use them directly.
+        """
+        return encode_state(state, self.grid_size)
+
+    def decode(self, index):
+        """Convert a row index back to its (x, y, congestion, direction) state key"""
+        return decode_state(index, self.grid_size)
+
+    def __getitem__(self, state):
+        index = self.encode(state)
+        self.visited[index] = True
+        return self.q_values[index]
+
+    def __setitem__(self, state, value):
+        index = self.encode(state)
+        self.visited[index] = True
+        self.q_values[index] = value
+
+    def __contains__(self, state):
+        return bool(self.visited[self.encode(state)])
+
+    def __len__(self):
+        return int(np.count_nonzero(self.visited))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        """Get the state keys of all states that have been accessed"""
+        return [self.decode(i) for i in np.flatnonzero(self.visited)]
+
+    def values(self):
+        """Get the Q-value rows of all states that have been accessed"""
+        return list(self.q_values[self.visited])
+
+    def items(self):
+        """Get (state key, Q-value row) pairs of all states that have been accessed"""
+        return [(self.decode(i), self.q_values[i]) for i in np.flatnonzero(self.visited)]
+
+    def get_memory_usage(self):
+        """Get the memory used by the table in bytes"""
+        return self.q_values.nbytes + self.visited.nbytes
+
+
+class SharedDenseQTable(DenseQTable):
+    """Dense Q-table living in a named shared memory block
+
+    Several processes can attach to the same block and update it concurrently without
+    locks (Hogwild-style): occasional lost updates from racing writes are tolerated by
+    Q-learning. Pickling the table only sends the block name, so agents holding a shared
+    table can be passed to worker processes cheaply and all of them train the same values.
+
+    The process that creates the table owns the block and unlinks it when the table is
+    garbage collected (or when unlink() is called explicitly).
+    """
+
+    def __init__(self, grid_size, name=None):
+        """Create a new shared table, or attach to an existing one
+
+        Args:
+            grid_size: Size of the urban grid (the grid is grid_size x grid_size)
+            name: Name of an existing shared memory block to attach to (None creates one)
+        """
+        num_states = grid_size * grid_size * self.NUM_CONGESTION_LEVELS * self.NUM_DIRECTIONS
+        values_nbytes = num_states * self.NUM_ACTIONS * np.dtype(np.float32).itemsize
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=values_nbytes + num_states)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        q_values = np.ndarray((num_states, self.NUM_ACTIONS), dtype=np.float32, buffer=self._shm.buf)
+        visited = np.ndarray(num_states, dtype=bool, buffer=self._shm.buf, offset=values_nbytes)
+        if self._owner:
+            q_values[:] = 0
+            visited[:] = False
+        super().__init__(grid_size, q_values, visited)
+
+    @classmethod
+    def from_table(cls, table):
+        """Create a shared table holding a copy of a DenseQTable's values"""
+        shared = cls(table.grid_size)
+        shared.q_values[:] = table.q_values
+        shared.visited[:] = table.visited
+        return shared
+
+    @property
+    def name(self):
+        """Name of the shared memory block (used to attach from other processes)"""
+        return self._shm.name
+
+    def to_dense(self):
+        """Copy the values into a private (non-shared) DenseQTable"""
+        return DenseQTable(self.grid_size, self.q_values.copy(), self.visited.copy())
+
+    def close(self):
+        """Detach this process from the shared memory block"""
+        if self._shm is None:
+            return
+        # Views into the buffer must be released before it can be closed
+        self.q_values = None
+        self.visited = None
+        self._shm.close()
+
+    def unlink(self):
+        """Detach and destroy the shared memory block (owner only)"""
+        shm = self._shm
+        self.close()
+        if shm is not None and self._owner:
+            shm.unlink()
+        self._shm = None
+
+    def __del__(self):
+        try:
+            self.unlink()
+        except (BufferError, FileNotFoundError, AttributeError):
+            pass
+
+    def __getstate__(self):
+        return {'grid_size': self.grid_size, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['grid_size'], name=state['name'])
@@ -3,12 +3,56 @@ Reward Configuration Module
 
 This module contains all reward-related constants and configurations for the vehicle simulation.
 It allows easy customization of reward values without modifying the core vehicle logic.
+
+The simulation hot path reads RewardConfig.params, a frozen RewardParams snapshot that
+is rebuilt only after a value changes, instead of the get_*() methods that build a new
+dict on every call. Listeners registered with add_listener are notified of changes.
 """
 
+import math
+import numbers
+from collections import namedtuple
+
+ALGORITHM_TYPES = ("proximity_based", "exponential_distance")
+
+# Configurable parameters, in the order of get_all_config
+PARAMETER_NAMES = (
+    'step_penalty', 'astar_follow_reward', 'astar_on_path_reward', 'closer_to_destination_reward',
+    'high_congestion_threshold', 'congestion_penalty_multiplier', 'immediate_backtrack_penalty',
+    'oscillation_penalty', 'long_oscillation_penalty', 'red_light_wait_penalty',
+    'destination_reached_reward', 'loop_threshold_base', 'loop_threshold_max', 'loop_penalty_base',
+    'loop_penalty_max', 'proximity_base_multiplier', 'proximity_max_multiplier',
+    'path_distance_base_reward', 'path_distance_penalty_multiplier', 'algorithm',
+    'exp_base_reward', 'exp_amplitude', 'exp_x_scale', 'exp_y_scale',
+)
+
+# Parameters that must be integers, and parameters that must be positive
+INTEGER_PARAMETERS = ('loop_threshold_base', 'loop_threshold_max')
+POSITIVE_PARAMETERS = ('exp_x_scale', 'exp_y_scale')
+
+
+class RewardParams(namedtuple('RewardParams', PARAMETER_NAMES + ('path_reward_max_distance',))):
+    """Frozen snapshot of every reward parameter, read by attribute on the hot path
+
+    Besides the configurable parameters it holds values derived from them:
+    path_reward_max_distance is the distance from the optimal path at which the path
+    distance reward drops to zero (None if it never does).
+    """
+
+    __slots__ = ()
+
+    def loop_threshold(self, grid_size):
+        """Loop detection threshold for a grid (smaller maps use a smaller threshold)"""
+        return max(self.loop_threshold_base, min(self.loop_threshold_max, grid_size // 5))
+
+
 class RewardConfig:
     """Configuration class for reward system parameters"""
     
     def __init__(self):
+        self._params = None  # RewardParams snapshot, rebuilt lazily after a change
+        self._listeners = []
+        
         # Algorithm selection
         self.algorithm = "proximity_based"  # Options: "proximity_based", "exponential_distance"
         
@@ -57,6 +101,57 @@ class RewardConfig:
         self.path_distance_base_reward = 10  # Base reward for being near optimal path
         self.path_distance_penalty_multiplier = 2  # Penalty multiplier for distance from path
         
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in PARAMETER_NAMES:
+            object.__setattr__(self, '_params', None)
+    
+    def __getstate__(self):
+        # Listeners (often GUI callbacks) stay with the original object
+        state = self.__dict__.copy()
+        state['_params'] = None
+        state['_listeners'] = []
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+    
+    @property
+    def params(self):
+        """Frozen RewardParams snapshot of the current configuration"""
+        params = self._params
+        if params is None:
+            params = self._params = self._build_params()
+        return params
+    
+    def _build_params(self):
+        values = [getattr(self, name) for name in PARAMETER_NAMES]
+        # The path distance reward is zero from base_reward / penalty_multiplier onwards
+        if self.path_distance_penalty_multiplier <= 0:
+            max_distance = None
+        else:
+            max_distance = max(0, math.ceil(self.path_distance_base_reward /
+                                            self.path_distance_penalty_multiplier) - 1)
+        return RewardParams(*values, max_distance)
+    
+    def add_listener(self, callback):
+        """Register a callback called as callback(config) after the configuration changes
+        
+        Changes made through update_config, set_algorithm_type and reset_to_defaults are
+        reported; direct attribute assignments only refresh params.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """Unregister a callback added with add_listener"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify_listeners(self):
+        for callback in list(self._listeners):
+            callback(self)
+    
     def get_step_penalty(self):
         """Get the penalty for taking a step"""
         return self.step_penalty
@@ -124,11 +219,12 @@ class RewardConfig:
     
     def set_algorithm_type(self, algorithm_type):
         """Set the algorithm type"""
-        if algorithm_type in ["proximity_based", "exponential_distance"]:
+        if algorithm_type in ALGORITHM_TYPES:
             self.algorithm = algorithm_type
         else:
             print(f"Warning: Unknown algorithm type '{algorithm_type}'. Using 'proximity_based'.")
             self.algorithm = "proximity_based"
+        self._notify_listeners()
     
     def get_exponential_distance_config(self):
         """Get exponential distance algorithm configuration"""
@@ -143,6 +239,10 @@ class RewardConfig:
         """
         Update configuration values dynamically
         
+        Values are validated before they are applied: unknown parameters and invalid
+        values are reported and ignored, the rest are applied together and listeners
+        are notified once.
+        
         Args:
             **kwargs: Key-value pairs of configuration parameters to update
             
@@ -153,15 +253,45 @@ class RewardConfig:
                 congestion_penalty_multiplier=7
             )
         """
+        updates = {}
         for key, value in kwargs.items():
-            if hasattr(self, key):
-                setattr(self, key, value)
-            else:
+            if key not in PARAMETER_NAMES:
                 print(f"Warning: Unknown configuration parameter '{key}' ignored")
+                continue
+            error = self._validate(key, value)
+            if error:
+                print(f"Warning: Invalid value {value!r} for '{key}' ignored ({error})")
+                continue
+            updates[key] = value
+        
+        for key, value in updates.items():
+            setattr(self, key, value)
+        if updates:
+            self._notify_listeners()
+    
+    @staticmethod
+    def _validate(key, value):
+        """Get the reason a parameter value is invalid, or None if it is valid"""
+        if key == 'algorithm':
+            if value not in ALGORITHM_TYPES:
+                return f"expected one of {', '.join(ALGORITHM_TYPES)}"
+            return None
+        if isinstance(value, bool) or not isinstance(value, numbers.Real):
+            return "expected a number"
+        if math.isnan(value) or math.isinf(value):
+            return "expected a finite number"
+        if key in INTEGER_PARAMETERS and value != int(value):
+            return "expected an integer"
+        if key in POSITIVE_PARAMETERS and value <= 0:
+            return "expected a positive number"
+        return None
     
     def reset_to_defaults(self):
         """Reset all configuration values to their defaults"""
+        listeners = self._listeners
         self.__init__()
+        self._listeners = listeners
+        self._notify_listeners()
     
     def get_all_config(self):
         """Get all configuration parameters as a dictionary"""
@@ -0,0 +1,169 @@
+"""
+Reward Engine Module
+
+This module evaluates the reward of Vehicle.calculate_reward for whole arrays of
+candidate moves at once. A RewardEngine copies the values it needs out of the
+RewardConfig parameters when it is built, so computing rewards costs a few NumPy operations
+per batch instead of several config lookups and Python branches per vehicle.
+
+Rows describe one move each: the current position, the new position, the destination,
+the congestion at the new position, the recent path of the vehicle and, optionally,
+the PathIndex of its planned path for the A* guidance terms.
+"""
+
+import numpy as np
+
+# Number of past positions needed for the backtracking/oscillation terms
+HISTORY_LENGTH = 5
+
+# (offset into the history, minimum path length, penalty parameter) of every revisit penalty,
+# mirroring the path[-2], path[-3] and path[-5] checks of Vehicle
+REVISIT_CHECKS = ((2, 1, 'immediate_backtrack_penalty'),
+                  (3, 3, 'oscillation_penalty'),
+                  (5, 5, 'long_oscillation_penalty'))
+
+
+def history_from_path(path, length=HISTORY_LENGTH):
+    """Get the last entries of a vehicle path as a (length, 2) history array
+
+    Shorter paths are padded with their first entry; the padding is never compared
+    because the revisit checks are gated on the real path length.
+    """
+    recent = list(path[-length:])
+    recent = [recent[0]] * (length - len(recent)) + recent
+    return np.array(recent, dtype=np.int64)
+
+
+class RewardEngine:
+    """Vectorized reward computation from a snapshot of a RewardConfig
+
+    The snapshot is taken when the engine is built; build a new engine after changing
+    the configuration (reward_config.params is a new object after every change).
+    """
+
+    def __init__(self, reward_config, grid_size):
+        """Snapshot a reward configuration
+
+        Args:
+            reward_config: RewardConfig object to copy the reward values from
+            grid_size: Size of the urban grid (scales the proximity reward)
+        """
+        self.grid_size = grid_size
+        params = reward_config.params
+        self.params = params  # The RewardParams snapshot the engine was built from
+        self.algorithm = params.algorithm
+
+        self.step_penalty = float(params.step_penalty)
+        self.distance_reward = float(params.closer_to_destination_reward)
+        self.follow_reward = float(params.astar_follow_reward)
+        self.on_path_reward = float(params.astar_on_path_reward)
+        self.proximity_base = float(params.proximity_base_multiplier)
+        self.proximity_max = float(params.proximity_max_multiplier)
+        self.path_base_reward = float(params.path_distance_base_reward)
+        self.path_penalty_multiplier = float(params.path_distance_penalty_multiplier)
+        self.exp_x_scale = float(params.exp_x_scale)
+        self.exp_y_scale = float(params.exp_y_scale)
+        self.congestion_threshold = float(params.high_congestion_threshold)
+        self.congestion_multiplier = float(params.congestion_penalty_multiplier)
+        self.revisit_penalties = [(offset, min_length, float(getattr(params, name)))
+                                  for offset, min_length, name in REVISIT_CHECKS]
+
+    def path_terms(self, path_indices, new_positions):
+        """Gather the per-row path guidance inputs from PathIndex objects
+
+        Args:
+            path_indices: Sequence with a PathIndex (or None) per row
+            new_positions: (N, 2) array of new positions
+
+        Returns:
+            (follow, on_path, distance, progress) arrays: whether the move is the next
+            planned step, whether it lands on the path, the distance to the nearest path
+            point (-1 if there is none in range) and that point's progress along the path
+        """
+        count = len(new_positions)
+        follow = np.zeros(count, dtype=bool)
+        on_path = np.zeros(count, dtype=bool)
+        distance = np.full(count, -1, dtype=np.int64)
+        progress = np.zeros(count)
+        for row, index in enumerate(path_indices):
+            if index is None or index.length == 0:
+                continue
+            position = (int(new_positions[row, 0]), int(new_positions[row, 1]))
+            if index.length > 1:
+                follow[row] = position == index.path[1]
+                on_path[row] = position in index
+            nearest = index.nearest(position)
+            if nearest is not None:
+                distance[row] = nearest[0]
+                progress[row] = nearest[1] / index.length
+        return follow, on_path, distance, progress
+
+    def compute(self, positions, new_positions, destinations, congestion, history, path_lengths,
+                path_indices=None):
+        """Reward of every move (see Vehicle.calculate_reward)
+
+        Only moves that stay inside the grid are scored here; the fixed off-grid penalty
+        is applied by the caller, as in Vehicle.move.
+
+        Args:
+            positions: (N, 2) array of current positions
+            new_positions: (N, 2) array of new positions
+            destinations: (N, 2) array of destinations
+            congestion: (N,) array of congestion levels at the new positions
+            history: (N, HISTORY_LENGTH, 2) array of recent path entries, history[:, -1]
+                     being the current position
+            path_lengths: (N,) array of full path lengths (len(vehicle.path))
+            path_indices: Optional sequence with a PathIndex (or None) per row for the
+                          A* guidance terms of the proximity-based algorithm
+
+        Returns:
+            (N,) array of rewards
+        """
+        positions = np.asarray(positions)
+        new_positions = np.asarray(new_positions)
+        destinations = np.asarray(destinations)
+        history = np.asarray(history)
+        path_lengths = np.asarray(path_lengths)
+
+        if self.algorithm == "exponential_distance":
+            reward = self.exponential_distance_reward(new_positions, destinations)
+        else:
+            reward = self.proximity_based_reward(positions, new_positions, destinations, path_indices)
+
+        # Congestion penalty
+        congestion = np.asarray(congestion, dtype=float)
+        reward -= np.where(congestion > self.congestion_threshold,
+                           self.congestion_multiplier * congestion, 0)
+
+        # Backtracking and oscillation penalties
+        for offset, min_length, penalty in self.revisit_penalties:
+            revisit = (path_lengths > min_length) & np.all(new_positions == history[:, -offset], axis=1)
+            reward += np.where(revisit, penalty, 0)
+
+        return reward
+
+    def proximity_based_reward(self, positions, new_positions, destinations, path_indices=None):
+        """Base reward of the proximity-based algorithm"""
+        current_dist = np.abs(positions - destinations).sum(axis=1)
+        new_dist = np.abs(new_positions - destinations).sum(axis=1)
+
+        reward = np.full(len(positions), self.step_penalty)
+        reward += np.where(new_dist < current_dist, self.distance_reward, 0)
+
+        progress = 1 - new_dist / (self.grid_size * 2)
+        reward += (current_dist - new_dist) * (self.proximity_base + self.proximity_max * progress)
+
+        if path_indices is not None:
+            follow, on_path, distance, path_progress = self.path_terms(path_indices, new_positions)
+            reward += np.where(follow, self.follow_reward, np.where(on_path, self.on_path_reward, 0))
+            path_reward = np.maximum(0, self.path_base_reward - distance * self.path_penalty_multiplier)
+            reward += np.where(distance >= 0, path_reward * (1 + path_progress), 0)
+
+        return reward
+
+    def exponential_distance_reward(self, new_positions, destinations):
+        """Base reward of the exponential distance algorithm"""
+        normalized_dist = (np.abs(new_positions[:, 0] - destinations[:, 0]) / self.exp_x_scale +
+                           np.abs(new_positions[:, 1] - destinations[:, 1]) / self.exp_y_scale)
+        # Same constants as Vehicle.calculate_reward_exponential_distance
+        return -1 + 40 * np.exp(-normalized_dist)
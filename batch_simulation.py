@@ -0,0 +1,273 @@
+"""
+Batched training engine for Q-Learning Urban Traffic Simulation
+
+Runs many independent urban grid environments in lockstep. Positions, destinations,
+rewards and Q-updates for every vehicle in every environment are kept in NumPy arrays,
+so one simulation step costs a handful of array operations instead of a Python call
+per vehicle. All environments train the same agent through its dense Q-table.
+"""
+import numpy as np
+from module.urban_grid import (UrbanGrid, initial_traffic_lights, build_traffic_light_states,
+                               summed_area_table, window_means)
+from algorithm.agent import QLearningAgent
+from algorithm.q_table import DenseQTable
+from algorithm.experience_buffer import ExperienceBuffer
+from algorithm.reward_config import RewardConfig
+from algorithm.reward_engine import RewardEngine, HISTORY_LENGTH
+from module.actions import ACTION_DELTAS, build_valid_action_mask
+
+# Up, Right, Down, Left (same order as QLearningAgent.actions)
+ACTION_DELTA_ARRAY = np.array(ACTION_DELTAS)
+
+
+class BatchTrainer:
+    """Train one Q-learning agent on a batch of independent environments
+
+    Each environment mirrors one episode of simulation.run_simulation: its own random
+    obstacles, congestion map and vehicles with random start and end positions. The
+    per-vehicle logic of Vehicle.move is reproduced with array operations, except that
+    A* path guidance terms are not part of the batched reward and each vehicle uses its
+    own destination when encoding the state.
+
+    The transitions of every vehicle in a step go through an ExperienceBuffer and are
+    applied in one batched update from the Q-values at the start of the step; vehicles
+    updating the same state-action pair in the same step are averaged. Optionally a
+    random sample of earlier transitions is replayed after every step.
+    """
+
+    def __init__(self, agent, num_envs=32, num_vehicles=5, reward_config=None,
+                 obstacle_density=0.05, seed=None, replay_batch_size=0, replay_capacity=100000):
+        """Create a batch trainer
+
+        Args:
+            agent: QLearningAgent using the dense Q-table backend
+            num_envs: Number of environments advanced in lockstep
+            num_vehicles: Number of vehicles per environment
+            reward_config: Optional reward configuration object (if None, uses default)
+            obstacle_density: Fraction of cells that receive a random obstacle each episode
+            seed: Optional seed for the trainer's random number generator
+            replay_batch_size: Number of stored transitions replayed after every step (0 disables)
+            replay_capacity: Number of most recent transitions kept for replay
+        """
+        if not isinstance(agent.q_table, DenseQTable):
+            raise ValueError("BatchTrainer requires an agent created with q_table_backend='dense'")
+
+        self.agent = agent
+        self.size = agent.urban_grid.size
+        self.num_envs = num_envs
+        self.num_vehicles = num_vehicles
+        self.reward_config = reward_config if reward_config is not None else RewardConfig()
+        self.reward_engine = RewardEngine(self.reward_config, self.size)
+        self.obstacle_density = obstacle_density
+        self.congestion_update_rate = agent.urban_grid.congestion_update_rate
+        self.traffic_light_cycle = agent.urban_grid.traffic_light_cycle
+        self.rng = np.random.default_rng(seed)
+        self.replay_batch_size = replay_batch_size
+        self.experience = ExperienceBuffer(max(replay_capacity, num_envs * num_vehicles))
+
+        # Traffic lights follow the same layout and cycle in every environment
+        self.traffic_light_states = build_traffic_light_states(initial_traffic_lights(self.size))
+        self.light_phase = 0
+        self.current_cycle = 0
+
+        # Flattened (environment, vehicle) layout: vehicle b lives in environment env_index[b]
+        self.env_index = np.repeat(np.arange(num_envs), num_vehicles)
+
+        # Statistics tracking (one entry per environment episode)
+        self.episode_rewards = []
+        self.episode_steps = []
+        self.success_rate = []
+
+    def reset(self):
+        """Start a new episode in every environment"""
+        n, s = self.num_envs, self.size
+        batch = n * self.num_vehicles
+
+        self.congestion = self.rng.uniform(0, 0.3, size=(n, s, s))
+
+        self.obstacles = np.zeros((n, s, s), dtype=bool)
+        num_obstacles = int(self.obstacle_density * s * s)
+        obstacle_envs = np.repeat(np.arange(n), num_obstacles)
+        obstacle_cells = self.rng.integers(0, s, size=(n * num_obstacles, 2))
+        self.obstacles[obstacle_envs, obstacle_cells[:, 0], obstacle_cells[:, 1]] = True
+
+        # Valid-action bitmask of every cell in every environment
+        self.valid_action_mask = build_valid_action_mask(self.obstacles)
+
+        self.positions = self.rng.integers(0, s, size=(batch, 2))
+        self.destinations = self.rng.integers(0, s, size=(batch, 2))
+        same = np.all(self.positions == self.destinations, axis=1)
+        while same.any():
+            self.destinations[same] = self.rng.integers(0, s, size=(int(same.sum()), 2))
+            same = np.all(self.positions == self.destinations, axis=1)
+
+        self.reached = np.zeros(batch, dtype=bool)
+        self.steps = np.zeros(batch, dtype=int)
+        self.total_rewards = np.zeros(batch)
+
+        # Ring buffer of the last HISTORY_LENGTH path entries; history[:, -1] is the current position
+        self.history = np.repeat(self.positions[:, None, :], HISTORY_LENGTH, axis=1)
+        self.path_lengths = np.ones(batch, dtype=int)
+
+        # Loop detection state
+        self.visit_counts = np.zeros((batch, s, s), dtype=np.int32)
+        self.visit_counts[np.arange(batch), self.positions[:, 0], self.positions[:, 1]] = 1
+        self.loop_penalty_applied = np.zeros((batch, s, s), dtype=bool)
+
+    def update_congestion(self):
+        """Update every environment's congestion map from its active vehicles"""
+        active = ~self.reached
+        heatmap = np.zeros_like(self.congestion)
+        np.add.at(heatmap, (self.env_index[active], self.positions[active, 0], self.positions[active, 1]), 1)
+
+        rate = self.congestion_update_rate
+        self.congestion *= (1 - rate)
+        self.congestion += rate * heatmap
+
+        # Normalize each environment to [0, 1]
+        max_congestion = self.congestion.max(axis=(1, 2), keepdims=True)
+        np.divide(self.congestion, max_congestion, out=self.congestion, where=max_congestion > 0)
+
+    def update_traffic_lights(self):
+        """Advance the shared traffic light cycle"""
+        self.current_cycle += 1
+        if self.current_cycle % self.traffic_light_cycle == 0:
+            self.light_phase ^= 1
+
+    def step(self):
+        """Advance every environment by one simulation step"""
+        self.update_congestion()
+        self.update_traffic_lights()
+
+        active = np.flatnonzero(~self.reached)
+        if len(active) == 0:
+            return
+        env = self.env_index[active]
+        positions = self.positions[active]
+        destinations = self.destinations[active]
+        size = self.size
+
+        # Current state and action
+        table = summed_area_table(self.congestion)
+        congestion = window_means(table, positions[:, 0], positions[:, 1], size, batch_index=env)
+        states = self.agent.encode_states(positions, congestion, destinations)
+        valid_masks = self.valid_action_mask[env, positions[:, 0], positions[:, 1]]
+        actions = self.agent.choose_actions(states, valid_masks=valid_masks, rng=self.rng)
+        deltas = ACTION_DELTA_ARRAY[actions]
+        new_positions = positions + deltas
+
+        # Moves off the grid keep the vehicle in place with a fixed penalty
+        in_bounds = np.all((new_positions >= 0) & (new_positions < size), axis=1)
+        new_positions = np.where(in_bounds[:, None], new_positions, positions)
+        rewards = np.full(len(active), -10.0)
+        params = self.reward_config.params
+        if self.reward_engine.params is not params:
+            self.reward_engine = RewardEngine(self.reward_config, size)
+        moving = active[in_bounds]
+        rewards[in_bounds] = self.reward_engine.compute(
+            positions[in_bounds], new_positions[in_bounds], destinations[in_bounds],
+            self.congestion[env[in_bounds], new_positions[in_bounds, 0], new_positions[in_bounds, 1]],
+            self.history[moving], self.path_lengths[moving]
+        )
+
+        # Red lights stop the vehicle
+        lights = self.traffic_light_states[self.light_phase, new_positions[:, 0], new_positions[:, 1]]
+        red_light = ((deltas[:, 1] != 0) & (lights == 2)) | ((deltas[:, 0] != 0) & (lights == 1))
+        rewards += np.where(red_light, params.red_light_wait_penalty, 0)
+
+        moved = ~red_light
+        arrived = moved & np.all(new_positions == destinations, axis=1)
+        rewards += np.where(arrived, params.destination_reached_reward, 0)
+        positions = np.where(moved[:, None], new_positions, positions)
+
+        self.positions[active] = positions
+        self.reached[active] = arrived
+        self.steps[active] += 1
+        self.history[active] = np.concatenate([self.history[active, 1:], positions[:, None, :]], axis=1)
+        self.path_lengths[active] += 1
+
+        # Loop detection
+        loop_threshold = params.loop_threshold(size)
+        self.visit_counts[active, positions[:, 0], positions[:, 1]] += 1
+        counts = self.visit_counts[active, positions[:, 0], positions[:, 1]]
+        looping = (counts > loop_threshold) & ~self.loop_penalty_applied[active, positions[:, 0], positions[:, 1]]
+        rewards += np.where(looping,
+                            np.maximum(params.loop_penalty_max,
+                                       params.loop_penalty_base * (counts - loop_threshold)),
+                            0)
+        self.loop_penalty_applied[active[looping], positions[looping, 0], positions[looping, 1]] = True
+
+        self.total_rewards[active] += rewards
+
+        # Q-learning update
+        q_table = self.agent.q_table
+        q_table.q_values[states[looping]] = -0.5
+        next_congestion = window_means(table, positions[:, 0], positions[:, 1], size, batch_index=env)
+        next_states = self.agent.encode_states(positions, next_congestion, destinations)
+        self.experience.add_batch(states, actions, rewards, next_states)
+        self.experience.flush(self.agent)
+        if self.replay_batch_size > 0:
+            self.experience.replay(self.agent, self.replay_batch_size, rng=self.rng)
+
+    def run_episodes(self, max_steps=200):
+        """Run one episode in every environment and record its statistics
+
+        Args:
+            max_steps: Maximum steps per episode (if 0, run until all vehicles reach destination)
+        """
+        self.reset()
+        step = 0
+        while not self.reached.all() and (max_steps == 0 or step < max_steps):
+            self.step()
+            step += 1
+
+        shape = (self.num_envs, self.num_vehicles)
+        rewards = self.total_rewards.reshape(shape).sum(axis=1)
+        steps = self.steps.reshape(shape).mean(axis=1)
+        success = self.reached.reshape(shape).mean(axis=1)
+        self.episode_rewards.extend(rewards.tolist())
+        self.episode_steps.extend(steps.tolist())
+        self.success_rate.extend(success.tolist())
+        return rewards, steps, success
+
+    def train(self, episodes, max_steps=200):
+        """Train for at least the given number of environment episodes
+
+        Args:
+            episodes: Number of episodes to run, rounded up to a multiple of num_envs
+            max_steps: Maximum steps per episode (if 0, run until all vehicles reach destination)
+        """
+        rounds = -(-episodes // self.num_envs)
+        for batch_round in range(rounds):
+            rewards, steps, success = self.run_episodes(max_steps)
+            if batch_round % 10 == 0:
+                print(f"Episodes {batch_round * self.num_envs}-{(batch_round + 1) * self.num_envs - 1}: "
+                      f"Reward: {rewards.mean():.2f}, Steps: {steps.mean():.2f}, "
+                      f"Success Rate: {success.mean():.2f}")
+        return self.agent
+
+
+def run_batch_simulation(episodes=1000, num_envs=32, max_steps=200, agent=None, reward_config=None,
+                         num_vehicles=5, seed=None, replay_batch_size=0):
+    """Train an agent with the batched engine (a faster counterpart of run_simulation)
+
+    Args:
+        episodes: Number of episodes to run (rounded up to a multiple of num_envs)
+        num_envs: Number of environments advanced in lockstep
+        max_steps: Maximum steps per episode (if 0, run until all vehicles reach destination)
+        agent: Optional pre-existing agent with a dense Q-table (if None, creates a new agent)
+        reward_config: Optional reward configuration object (if None, uses default)
+        num_vehicles: Number of vehicles per environment
+        seed: Optional seed for reproducible training
+        replay_batch_size: Number of stored transitions replayed after every step (0 disables)
+
+    Returns:
+        The trained agent
+    """
+    if agent is None:
+        urban_grid = UrbanGrid(size=20)
+        agent = QLearningAgent(urban_grid, q_table_backend="dense")
+
+    trainer = BatchTrainer(agent, num_envs=num_envs, num_vehicles=num_vehicles,
+                           reward_config=reward_config, seed=seed, replay_batch_size=replay_batch_size)
+    return trainer.train(episodes, max_steps=max_steps)
@@ -4,30 +4,41 @@
 用於運行一萬次實驗的核心實驗類
 """
 
+import os
 import time
 import json
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from algorithm.agent import QLearningAgent
 from module.urban_grid import UrbanGrid
 from vehicle import Vehicle
 from algorithm.reward_config import RewardConfig
+from algorithm.checkpoint import save_checkpoint, load_checkpoint
+from metrics_writer import EpisodeMetricsWriter, RunningStats
+
+# 逐回合指標檔案的欄位
+EPISODE_METRIC_FIELDS = ['episode', 'success', 'steps', 'reward', 'computation_ms']
 
 
 class ComprehensiveExperiment:
     """綜合實驗類，支持大規模實驗運行"""
     
-    def __init__(self, grid_size=20):
+    def __init__(self, grid_size=20, checkpoint_dir=None, checkpoint_interval=500):
         """初始化實驗環境
         
         Args:
             grid_size: 網格大小
+            checkpoint_dir: 檢查點目錄 (None 表示不保存；若已有檢查點則從該處接續)
+            checkpoint_interval: 每多少回合保存一次檢查點
         """
         self.grid_size = grid_size
         self.results = []
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
         
     def run_single_experiment(self, algorithm_type, obstacle_density, congestion_level, 
-                            num_episodes=10000, max_steps=300):
+                            num_episodes=10000, max_steps=300, seed=42, metrics_path=None):
         """運行單個實驗配置
         
         Args:
@@ -36,6 +47,8 @@ class ComprehensiveExperiment:
             congestion_level: 壅塞程度 ('low' 或 'high')
             num_episodes: 實驗回合數
             max_steps: 每回合最大步數
+            seed: 隨機種子 (同一種子可重現相同結果)
+            metrics_path: 逐回合指標 CSV 路徑 (None 表示不寫入)
             
         Returns:
             實驗結果字典
@@ -57,21 +70,20 @@ class ComprehensiveExperiment:
                 step_penalty=0  # 由指數函數處理
             )
         
-        # 創建環境
-        urban_grid = UrbanGrid(size=self.grid_size)
+        # 創建環境 (網格的隨機數產生器供障礙物、車輛與代理共用，保證可重現性)
+        urban_grid = UrbanGrid(size=self.grid_size, seed=seed)
+        rng = urban_grid.rng
         
         # 設置障礙物密度
         num_obstacles = int(obstacle_density * self.grid_size * self.grid_size)
-        np.random.seed(42)  # 保證可重現性
-        for _ in range(num_obstacles):
-            x, y = np.random.randint(0, self.grid_size, 2)
+        for x, y in urban_grid.random_positions(num_obstacles):
             urban_grid.add_obstacle(x, y)
         
         # 設置壅塞程度
         if congestion_level == 'high':
-            urban_grid.congestion = np.random.uniform(0.3, 0.8, size=(self.grid_size, self.grid_size))
+            urban_grid.congestion = rng.uniform(0.3, 0.8, size=(self.grid_size, self.grid_size))
         else:  # low
-            urban_grid.congestion = np.random.uniform(0.0, 0.3, size=(self.grid_size, self.grid_size))
+            urban_grid.congestion = rng.uniform(0.0, 0.3, size=(self.grid_size, self.grid_size))
         
         # 創建代理
         agent = QLearningAgent(urban_grid, learning_rate=0.1, discount_factor=0.95, epsilon=0.1)
@@ -80,63 +92,118 @@ class ComprehensiveExperiment:
         success_count = 0
         total_steps = 0
         total_rewards = 0
-        path_lengths = []
-        computation_times = []
+        path_length_stats = RunningStats()  # 成功回合的步數
+        computation_time_stats = RunningStats()  # 每回合計算時間 (毫秒)
+        start_episode = 0
+        previous_time = 0.0  # 中斷前已花費的時間
+        
+        # 若有檢查點則從該處接續
+        checkpoint_name = None
+        if self.checkpoint_dir:
+            checkpoint_name = f"{algorithm_type}_{obstacle_density}_{congestion_level}_seed{seed}"
+            state = self._load_checkpoint(checkpoint_name, agent)
+            if state:
+                start_episode = state['episode']
+                success_count = state['success_count']
+                total_steps = state['total_steps']
+                total_rewards = state['total_rewards']
+                path_length_stats = RunningStats.from_dict(state['path_length_stats'])
+                computation_time_stats = RunningStats.from_dict(state['computation_time_stats'])
+                previous_time = state['elapsed_time']
+                print(f"♻️  從檢查點接續: 第 {start_episode} 回合")
+        
+        metrics_writer = None
+        if metrics_path:
+            metrics_writer = EpisodeMetricsWriter(metrics_path, EPISODE_METRIC_FIELDS, resume=start_episode > 0)
+            if start_episode > 0:
+                # 丟棄檢查點之後寫入的回合，接續後會重新運行
+                metrics_writer.truncate(start_episode)
         
         # 進度顯示間隔
         progress_interval = max(1, num_episodes // 20)  # 每5%顯示一次
         
-        start_time = time.time()
+        start_time = time.time() - previous_time
         
-        for episode in range(num_episodes):
-            # 隨機設置起點和終點
-            start_pos = self._get_random_valid_position(urban_grid)
-            end_pos = self._get_random_valid_position(urban_grid)
-            
-            # 確保起點和終點不同
-            while start_pos == end_pos:
+        try:
+            for episode in range(start_episode, num_episodes):
+                # 隨機設置起點和終點
+                start_pos = self._get_random_valid_position(urban_grid)
                 end_pos = self._get_random_valid_position(urban_grid)
             
-            # 創建車輛
-            vehicle = Vehicle(urban_grid, agent, reward_config=reward_config)
-            vehicle.position = start_pos
-            vehicle.destination = end_pos
-            vehicle.path = [start_pos]
+                # 確保起點和終點不同
+                while start_pos == end_pos:
+                    end_pos = self._get_random_valid_position(urban_grid)
             
-            # 運行單回合
-            episode_start_time = time.time()
-            success, steps, total_reward = self._run_single_episode(
-                vehicle, agent, urban_grid, max_steps
-            )
-            episode_time = time.time() - episode_start_time
+                # 創建車輛
+                vehicle = Vehicle(urban_grid, agent, reward_config=reward_config)
+                vehicle.position = start_pos
+                vehicle.destination = end_pos
+                vehicle.path = [start_pos]
+            
+                # 運行單回合
+                episode_start_time = time.time()
+                success, steps, total_reward = self._run_single_episode(
+                    vehicle, agent, urban_grid, max_steps
+                )
+                episode_time = time.time() - episode_start_time
             
-            # 統計結果
-            if success:
-                success_count += 1
-                path_lengths.append(steps)
+                # 統計結果
+                if success:
+                    success_count += 1
+                    path_length_stats.add(steps)
             
-            total_steps += steps
-            total_rewards += total_reward
-            computation_times.append(episode_time * 1000)  # 轉換為毫秒
+                total_steps += steps
+                total_rewards += total_reward
+                computation_time_stats.add(episode_time * 1000)  # 轉換為毫秒
             
-            # 進度顯示
-            if (episode + 1) % progress_interval == 0:
-                progress = (episode + 1) / num_episodes * 100
-                current_success_rate = success_count / (episode + 1)
-                print(f"進度: {progress:.1f}% ({episode + 1}/{num_episodes}), "
-                      f"成功率: {current_success_rate:.3f}")
+                if metrics_writer:
+                    metrics_writer.write({
+                        'episode': episode,
+                        'success': int(success),
+                        'steps': steps,
+                        'reward': total_reward,
+                        'computation_ms': episode_time * 1000
+                    })
+            
+                # 進度顯示
+                if (episode + 1) % progress_interval == 0:
+                    progress = (episode + 1) / num_episodes * 100
+                    current_success_rate = success_count / (episode + 1)
+                    print(f"進度: {progress:.1f}% ({episode + 1}/{num_episodes}), "
+                          f"成功率: {current_success_rate:.3f}")
+            
+                # 定期保存檢查點
+                if checkpoint_name and (episode + 1) % self.checkpoint_interval == 0 and episode + 1 < num_episodes:
+                    if metrics_writer:
+                        metrics_writer.flush()
+                    self._save_checkpoint(checkpoint_name, agent, {
+                        'episode': episode + 1,
+                        'success_count': success_count,
+                        'total_steps': total_steps,
+                        'total_rewards': total_rewards,
+                        'path_length_stats': path_length_stats.to_dict(),
+                        'computation_time_stats': computation_time_stats.to_dict(),
+                        'elapsed_time': time.time() - start_time
+                    })
+        finally:
+            # 中途發生例外時也要關閉檔案（已寫入的回合保留，可從檢查點接續）
+            if metrics_writer:
+                metrics_writer.close()
         
         experiment_time = time.time() - start_time
+        if checkpoint_name:
+            # 實驗已完成，檢查點不再需要
+            self._remove_checkpoint(checkpoint_name)
         
         # 計算最終統計
         success_rate = success_count / num_episodes
         avg_steps = total_steps / num_episodes
         avg_reward = total_rewards / num_episodes
-        avg_computation_time = np.mean(computation_times)
+        avg_computation_time = computation_time_stats.mean
         
         # 路徑效率計算 (成功案例的平均步數 vs 理論最短路徑)
-        if path_lengths:
-            avg_successful_steps = np.mean(path_lengths)
+        if path_length_stats.count:
+            avg_successful_steps = path_length_stats.mean
             # 簡化的效率估算 (實際應該用A*計算最短路徑)
             estimated_optimal_steps = self.grid_size * 0.6  # 粗略估算
             path_efficiency = estimated_optimal_steps / avg_successful_steps if avg_successful_steps > 0 else 0
@@ -147,6 +214,7 @@ class ComprehensiveExperiment:
             'algorithm_type': algorithm_type,
             'obstacle_density': obstacle_density,
             'congestion_level': congestion_level,
+            'seed': seed,
             'num_episodes': num_episodes,
             'success_rate': success_rate,
             'avg_steps': avg_steps,
@@ -156,7 +224,8 @@ class ComprehensiveExperiment:
             'experiment_time': experiment_time,
             'successful_episodes': success_count,
             'total_steps': total_steps,
-            'total_rewards': total_rewards
+            'total_rewards': total_rewards,
+            'metrics_path': metrics_path
         }
         
         print(f"✅ 實驗完成:")
@@ -169,12 +238,91 @@ class ComprehensiveExperiment:
         
         return result
     
+    def _checkpoint_path(self, name, suffix):
+        return os.path.join(self.checkpoint_dir, f"{name}{suffix}")
+    
+    def _save_checkpoint(self, name, agent, state):
+        """保存檢查點: Q 表、網格狀態、隨機數產生器狀態與累計統計
+        
+        Q 表與網格檔案名稱帶有回合數，最後才以 os.replace 原子地替換狀態檔，
+        因此中斷時磁碟上永遠保留一組完整的檢查點。
+        """
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        episode = state['episode']
+        q_table_file = f"{name}_ep{episode}.vqt"
+        grid_file = f"{name}_ep{episode}.npz"
+        
+        # 以 float64 保存 Q 值，接續後的結果與未中斷時完全相同
+        save_checkpoint(agent, os.path.join(self.checkpoint_dir, q_table_file), dtype=np.float64)
+        np.savez(os.path.join(self.checkpoint_dir, grid_file), **agent.urban_grid.get_dynamic_state())
+        
+        state = dict(state,
+                     q_table_file=q_table_file,
+                     grid_file=grid_file,
+                     vehicle_next_id=Vehicle.next_id,
+                     rng_state=agent.urban_grid.rng.bit_generator.state)
+        
+        state_path = self._checkpoint_path(name, '.json')
+        previous = self._read_checkpoint_state(name)
+        with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(state_path + '.tmp', state_path)
+        
+        # 刪除上一個檢查點的檔案
+        if previous:
+            for filename in (previous['q_table_file'], previous['grid_file']):
+                if filename not in (q_table_file, grid_file):
+                    os.remove(os.path.join(self.checkpoint_dir, filename))
+        
+        # 清空路徑快取，使接續的運行與未中斷的運行重新規劃相同的路徑
+        agent.urban_grid.get_path_planner().invalidate()
+    
+    def _read_checkpoint_state(self, name):
+        state_path = self._checkpoint_path(name, '.json')
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _load_checkpoint(self, name, agent):
+        """載入檢查點並還原代理、網格與隨機數狀態
+        
+        Returns:
+            檢查點狀態字典，沒有檢查點時回傳 None
+        """
+        state = self._read_checkpoint_state(name)
+        if state is None:
+            return None
+        
+        urban_grid = agent.urban_grid
+        with np.load(os.path.join(self.checkpoint_dir, state['grid_file'])) as grid_state:
+            urban_grid.restore_dynamic_state(grid_state)
+        agent.q_table = load_checkpoint(os.path.join(self.checkpoint_dir, state['q_table_file']),
+                                        urban_grid=urban_grid).q_table
+        
+        urban_grid.rng.bit_generator.state = state['rng_state']
+        Vehicle.next_id = state['vehicle_next_id']
+        return state
+    
+    def _remove_checkpoint(self, name):
+        """刪除已完成實驗的檢查點"""
+        state = self._read_checkpoint_state(name)
+        if state is None:
+            return
+        for filename in (state['q_table_file'], state['grid_file']):
+            path = os.path.join(self.checkpoint_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+        os.remove(self._checkpoint_path(name, '.json'))
+    
     def _get_random_valid_position(self, urban_grid):
         """獲取隨機有效位置（不在障礙物上）"""
         while True:
-            x, y = np.random.randint(0, urban_grid.size, 2)
+            x, y = urban_grid.rng.integers(0, urban_grid.size, 2)
             if not urban_grid.obstacles[x, y]:
-                return (x, y)
+                return (int(x), int(y))
     
     def _run_single_episode(self, vehicle, agent, urban_grid, max_steps):
         """運行單個回合
@@ -206,6 +354,47 @@ class ComprehensiveExperiment:
         # 未在最大步數內到達
         return False, steps, total_reward
     
+    def run_parallel_experiments(self, configs, num_episodes=10000, max_steps=300,
+                                 seeds=(42,), max_workers=None, on_result=None, metrics_dir=None):
+        """以進程池平行運行多個實驗配置
+        
+        每個 (演算法, 密度, 壅塞, 種子) 組合在獨立進程中運行，結果完成後
+        立即加入 self.results，並可透過回呼函數即時處理（例如保存中間結果）。
+        
+        Args:
+            configs: (algorithm_type, obstacle_density, congestion_level) 列表
+            num_episodes: 每個配置的回合數
+            max_steps: 每回合最大步數
+            seeds: 每個配置要運行的隨機種子
+            max_workers: 最大進程數 (None 表示使用所有 CPU 核心)
+            on_result: 可選回呼 on_result(result, completed, total)，每完成一個配置呼叫一次
+            metrics_dir: 逐回合指標 CSV 的目錄 (None 表示不寫入)
+            
+        Returns:
+            依完成順序排列的結果列表
+        """
+        jobs = [(algorithm_type, obstacle_density, congestion_level, seed)
+                for algorithm_type, obstacle_density, congestion_level in configs
+                for seed in seeds]
+        
+        completed_results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_run_experiment_job, self.grid_size, algorithm_type, obstacle_density,
+                                congestion_level, num_episodes, max_steps, seed,
+                                _metrics_path(metrics_dir, algorithm_type, obstacle_density, congestion_level, seed),
+                                self.checkpoint_dir, self.checkpoint_interval)
+                for algorithm_type, obstacle_density, congestion_level, seed in jobs
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                self.results.append(result)
+                completed_results.append(result)
+                if on_result is not None:
+                    on_result(result, len(completed_results), len(jobs))
+        
+        return completed_results
+    
     def analyze_results(self):
         """分析實驗結果"""
         if not self.results:
@@ -220,7 +409,8 @@ class ComprehensiveExperiment:
             'overall_avg_computation_time': np.mean([r['avg_computation_time'] for r in self.results]),
             'by_algorithm': {},
             'by_density': {},
-            'by_congestion': {}
+            'by_congestion': {},
+            'by_config': {}
         }
         
         # 按演算法分析
@@ -255,6 +445,22 @@ class ComprehensiveExperiment:
                 'avg_reward': np.mean([r['avg_reward'] for r in level_results])
             }
         
+        # 按配置合併不同種子的結果
+        config_keys = sorted(set((r['algorithm_type'], r['obstacle_density'], r['congestion_level'])
+                                 for r in self.results), key=str)
+        for algo, density, level in config_keys:
+            config_results = [r for r in self.results
+                              if (r['algorithm_type'], r['obstacle_density'], r['congestion_level']) == (algo, density, level)]
+            analysis['by_config'][f"{algo}|{density}|{level}"] = {
+                'num_runs': len(config_results),
+                'seeds': [r.get('seed') for r in config_results],
+                'success_rate': np.mean([r['success_rate'] for r in config_results]),
+                'success_rate_std': np.std([r['success_rate'] for r in config_results]),
+                'avg_steps': np.mean([r['avg_steps'] for r in config_results]),
+                'avg_reward': np.mean([r['avg_reward'] for r in config_results]),
+                'path_efficiency': np.mean([r['path_efficiency'] for r in config_results])
+            }
+        
         return analysis
     
     def save_results(self, analysis=None):
@@ -293,6 +499,25 @@ class ComprehensiveExperiment:
         return results_filename, analysis_filename if analysis else None, csv_filename
 
 
+def _metrics_path(metrics_dir, algorithm_type, obstacle_density, congestion_level, seed):
+    """單個實驗任務的逐回合指標檔案路徑"""
+    if metrics_dir is None:
+        return None
+    return os.path.join(metrics_dir, f"{algorithm_type}_{obstacle_density}_{congestion_level}_seed{seed}.csv")
+
+
+def _run_experiment_job(grid_size, algorithm_type, obstacle_density, congestion_level,
+                        num_episodes, max_steps, seed, metrics_path=None,
+                        checkpoint_dir=None, checkpoint_interval=500):
+    """進程池工作函數：在子進程中運行單個實驗配置"""
+    experiment = ComprehensiveExperiment(grid_size=grid_size, checkpoint_dir=checkpoint_dir,
+                                         checkpoint_interval=checkpoint_interval)
+    return experiment.run_single_experiment(
+        algorithm_type, obstacle_density, congestion_level,
+        num_episodes=num_episodes, max_steps=max_steps, seed=seed, metrics_path=metrics_path
+    )
+
+
 if __name__ == "__main__":
     # 測試實驗類
     print("🧪 測試 ComprehensiveExperiment 類")
@@ -1,30 +1,49 @@
 #!/usr/bin/env python3
 """
 直接運行一萬回合實驗 - 無需確認
+各配置以進程池平行運行，每完成一個配置即保存中間結果
 """
 
+import os
 import time
 import json
 import sys
+import argparse
 from datetime import datetime
 
 # 確保可以導入模組
-sys.path.insert(0, '/home/yunitrish/workspace/School/hw/final')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from comprehensive_experiment import ComprehensiveExperiment
 
 def main():
+    parser = argparse.ArgumentParser(description="一萬回合大規模實驗")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="平行進程數 (預設使用所有 CPU 核心)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[42],
+                        help="每個配置要運行的隨機種子")
+    parser.add_argument("--episodes", type=int, default=10000,
+                        help="每個配置的回合數")
+    parser.add_argument("--metrics-dir", default="metrics",
+                        help="逐回合指標 CSV 的目錄 (中斷後已完成的回合仍保留)")
+    parser.add_argument("--checkpoint-dir", default="checkpoints",
+                        help="檢查點目錄 (重新執行時從最後的檢查點接續)")
+    parser.add_argument("--checkpoint-interval", type=int, default=500,
+                        help="每多少回合保存一次檢查點")
+    args = parser.parse_args()
+
     print("🚀 一萬回合大規模實驗開始")
     print(f"開始時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*60)
-    
+
     # 創建實驗實例
-    experiment = ComprehensiveExperiment(grid_size=20)
-    
+    experiment = ComprehensiveExperiment(grid_size=20, checkpoint_dir=args.checkpoint_dir,
+                                         checkpoint_interval=args.checkpoint_interval)
+
     # 實驗配置
     configs = [
         ('proximity_based', 0.10, 'low'),
-        ('proximity_based', 0.10, 'high'), 
+        ('proximity_based', 0.10, 'high'),
         ('proximity_based', 0.25, 'low'),
         ('proximity_based', 0.25, 'high'),
         ('exponential_distance', 0.10, 'low'),
@@ -32,45 +51,43 @@ def main():
         ('exponential_distance', 0.25, 'low'),
         ('exponential_distance', 0.25, 'high'),
     ]
-    
+    total_jobs = len(configs) * len(args.seeds)
+    print(f"📊 {len(configs)} 個配置 × {len(args.seeds)} 個種子 = {total_jobs} 個任務")
+    print(f"📁 逐回合指標: {args.metrics_dir}/")
+
     start_time = time.time()
-    
-    for i, (algorithm, density, congestion) in enumerate(configs, 1):
-        config_start = time.time()
-        print(f"\n📊 配置 {i}/8: {algorithm}")
-        print(f"   障礙物密度: {density}, 壅塞: {congestion}")
-        print(f"   開始時間: {datetime.now().strftime('%H:%M:%S')}")
-        
-        result = experiment.run_single_experiment(
-            algorithm, density, congestion,
-            num_episodes=10000, max_steps=300
-        )
-        
-        config_time = time.time() - config_start
-        experiment.results.append(result)
-        
-        print(f"✅ 配置 {i} 完成!")
+
+    def on_result(result, completed, total):
+        print(f"\n✅ 任務 {completed}/{total} 完成: {result['algorithm_type']}")
+        print(f"   障礙物密度: {result['obstacle_density']}, 壅塞: {result['congestion_level']}, "
+              f"種子: {result['seed']}")
         print(f"   成功率: {result['success_rate']:.4f}")
         print(f"   平均步數: {result['avg_steps']:.1f}")
-        print(f"   路徑效率: {result['avg_path_efficiency']:.4f}")
-        print(f"   耗時: {config_time/60:.1f}分鐘")
-        
+        print(f"   路徑效率: {result['path_efficiency']:.4f}")
+        print(f"   耗時: {result['experiment_time']/60:.1f}分鐘")
+
         # 保存中間結果
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f'results_after_config_{i}_{timestamp}.json'
+        filename = f'results_after_config_{completed}_{timestamp}.json'
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(experiment.results, f, indent=2, ensure_ascii=False)
         print(f"   💾 已保存: {filename}")
-    
+
+    experiment.run_parallel_experiments(
+        configs, num_episodes=args.episodes, max_steps=300,
+        seeds=args.seeds, max_workers=args.workers, on_result=on_result,
+        metrics_dir=args.metrics_dir
+    )
+
     # 最終分析
     print("\n📈 開始最終分析...")
     final_results = experiment.analyze_results()
     final_file = experiment.save_results(final_results)
-    
+
     total_time = time.time() - start_time
     print(f"\n🎉 所有實驗完成!")
     print(f"總耗時: {total_time/3600:.2f}小時")
-    print(f"總回合數: 80,000")
+    print(f"總回合數: {total_jobs * args.episodes:,}")
     print(f"最終結果: {final_file}")
 
 if __name__ == "__main__":
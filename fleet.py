@@ -0,0 +1,336 @@
+"""
+Vehicle fleet for Q-Learning Urban Traffic Simulation
+
+Stores a whole population of vehicles on one urban grid as NumPy columns
+(structure of arrays) instead of one Vehicle object per car:
+  - positions, start positions and destinations as (N, 2) arrays,
+  - step counts, total rewards and reached flags as (N,) arrays,
+  - the recent path of every vehicle in a fixed-size ring buffer,
+  - loop-detection visit counts in a sparse table of (vehicle, cell) keys, so memory
+    grows with the cells actually visited rather than vehicles x grid cells.
+
+One call to VehicleFleet.step() moves every active vehicle with a handful of array
+operations, which makes populations of tens of thousands of vehicles practical.
+Indexing or iterating a fleet yields FleetVehicle views that expose the attributes
+the visualizers and snapshots read from a Vehicle.
+"""
+import numpy as np
+from algorithm.reward_config import RewardConfig
+from algorithm.reward_engine import RewardEngine, HISTORY_LENGTH
+from algorithm.q_table import DenseQTable, decode_state
+from algorithm.path_index import PathIndex
+from module.actions import ACTION_DELTAS
+
+# Up, Right, Down, Left (same order as QLearningAgent.actions)
+ACTION_DELTA_ARRAY = np.array(ACTION_DELTAS)
+
+# Default number of path entries kept per vehicle
+DEFAULT_PATH_CAPACITY = 64
+
+# Steps between A* replans of a vehicle (same interval as Vehicle.move)
+REPLAN_INTERVAL = 10
+
+
+class FleetVehicle:
+    """Read-only view of one vehicle of a VehicleFleet"""
+
+    __slots__ = ('fleet', 'index')
+
+    def __init__(self, fleet, index):
+        self.fleet = fleet
+        self.index = index
+
+    @property
+    def id(self):
+        return self.index + 1
+
+    @property
+    def position(self):
+        x, y = self.fleet.positions[self.index]
+        return (int(x), int(y))
+
+    @property
+    def start_position(self):
+        x, y = self.fleet.start_positions[self.index]
+        return (int(x), int(y))
+
+    @property
+    def destination(self):
+        x, y = self.fleet.destinations[self.index]
+        return (int(x), int(y))
+
+    @property
+    def reached(self):
+        return bool(self.fleet.reached[self.index])
+
+    @property
+    def steps(self):
+        return int(self.fleet.steps[self.index])
+
+    @property
+    def total_reward(self):
+        return float(self.fleet.total_rewards[self.index])
+
+    @property
+    def path(self):
+        """The most recent path entries (at most the fleet's path_capacity)"""
+        return self.fleet.get_path(self.index)
+
+    def get_remaining_optimal_path(self):
+        """A* path from the current position, planned on demand (used for drawing only)"""
+        if self.reached:
+            return []
+        path = self.fleet.optimal_paths[self.index]
+        index = path.index(self.position) if path and self.position in path else None
+        if index is not None:
+            return path[index:]
+        return self.fleet.urban_grid.get_path_planner().plan(self.position, self.destination) or []
+
+
+class VehicleFleet:
+    """A population of vehicles stored as NumPy columns
+
+    The fleet reproduces Vehicle.move for every active vehicle at once: the agent's
+    epsilon-greedy choice, the reward of the configured algorithm (including the A*
+    path guidance terms, with paths replanned every REPLAN_INTERVAL steps), red
+    lights, arrival and loop penalties. The Q-updates of a step are applied together
+    (vehicles updating the same state-action pair are averaged).
+
+    Planning and indexing a path per vehicle is the one part that stays per object,
+    and it dominates the cost of a large fleet. It is therefore off by default: the
+    A* terms are left out of the reward, as in BatchTrainer, unless path_guidance=True.
+    """
+
+    def __init__(self, urban_grid, agent, num_vehicles, positions=None, destinations=None,
+                 reward_config=None, experience_buffer=None, path_capacity=DEFAULT_PATH_CAPACITY,
+                 path_guidance=False):
+        """Create a fleet
+
+        Args:
+            urban_grid: The urban grid the vehicles drive on
+            agent: The QLearningAgent choosing the moves and receiving the updates
+            num_vehicles: Number of vehicles
+            positions: Optional (N, 2) start positions (random if None)
+            destinations: Optional (N, 2) destinations (random and different from the
+                          start positions if None)
+            reward_config: Optional reward configuration object (if None, uses default)
+            experience_buffer: If set, transitions are collected here and the caller
+                               flushes them; otherwise every step updates the agent
+            path_capacity: Number of most recent path entries kept per vehicle
+            path_guidance: Whether to plan A* paths and include the path guidance terms
+                           of the proximity-based reward (slow for large fleets)
+        """
+        if path_capacity < HISTORY_LENGTH:
+            raise ValueError(f"path_capacity must be at least {HISTORY_LENGTH}")
+        self.urban_grid = urban_grid
+        self.agent = agent
+        self.size = urban_grid.size
+        self.num_vehicles = num_vehicles
+        self.reward_config = reward_config if reward_config is not None else RewardConfig()
+        self.reward_engine = RewardEngine(self.reward_config, self.size)
+        self.experience_buffer = experience_buffer
+        self.path_capacity = path_capacity
+        self.path_guidance = path_guidance
+
+        # Random positions are drawn from the grid's random stream, like Vehicle
+        rng = urban_grid.rng
+        if positions is None:
+            positions = rng.integers(0, self.size, size=(num_vehicles, 2))
+        self.positions = np.array(positions, dtype=np.int64).reshape(num_vehicles, 2)
+        if destinations is None:
+            destinations = rng.integers(0, self.size, size=(num_vehicles, 2))
+            same = np.all(destinations == self.positions, axis=1)
+            while same.any():
+                destinations[same] = rng.integers(0, self.size, size=(int(same.sum()), 2))
+                same = np.all(destinations == self.positions, axis=1)
+        self.destinations = np.array(destinations, dtype=np.int64).reshape(num_vehicles, 2)
+        self.start_positions = self.positions.copy()
+
+        self.reached = np.zeros(num_vehicles, dtype=bool)
+        self.steps = np.zeros(num_vehicles, dtype=np.int64)
+        self.total_rewards = np.zeros(num_vehicles)
+
+        # Ring buffer of path entries: entry k of a path lives in slot k % path_capacity
+        self.path_buffer = np.zeros((num_vehicles, path_capacity, 2), dtype=np.int32)
+        self.path_buffer[:, 0] = self.positions
+        self.path_lengths = np.ones(num_vehicles, dtype=np.int64)
+
+        # Planned A* paths and their lookup indices (only used with path_guidance)
+        self.optimal_paths = [None] * num_vehicles
+        self._path_indices = [None] * num_vehicles
+
+        # Sparse loop-detection table, sorted by key = (vehicle * size + x) * size + y
+        self.visit_keys = np.empty(0, dtype=np.int64)
+        self.visit_counts = np.empty(0, dtype=np.int64)
+        self.loop_penalty_applied = np.empty(0, dtype=bool)
+        # The start cell is the first visit, as Vehicle.__init__ seeds position_history with it
+        self._visit(np.arange(num_vehicles), self.positions)
+
+    def __len__(self):
+        return self.num_vehicles
+
+    def __getitem__(self, index):
+        if not -self.num_vehicles <= index < self.num_vehicles:
+            raise IndexError("vehicle index out of range")
+        return FleetVehicle(self, index % self.num_vehicles)
+
+    def __iter__(self):
+        return (FleetVehicle(self, index) for index in range(self.num_vehicles))
+
+    @property
+    def all_reached(self):
+        return bool(self.reached.all())
+
+    def active_positions(self):
+        """(M, 2) positions of the vehicles still driving"""
+        return self.positions[~self.reached]
+
+    def get_path(self, index):
+        """The most recent path entries of one vehicle as a list of (x, y) tuples"""
+        length = int(self.path_lengths[index])
+        count = min(length, self.path_capacity)
+        slots = (length - count + np.arange(count)) % self.path_capacity
+        return [(int(x), int(y)) for x, y in self.path_buffer[index, slots]]
+
+    def recent_history(self, vehicles):
+        """(M, HISTORY_LENGTH, 2) last path entries of some vehicles for the RewardEngine
+
+        Paths shorter than HISTORY_LENGTH are padded with their first entry, like
+        reward_engine.history_from_path.
+        """
+        lengths = self.path_lengths[vehicles]
+        entries = np.maximum(lengths[:, None] - HISTORY_LENGTH + np.arange(HISTORY_LENGTH), 0)
+        return self.path_buffer[vehicles[:, None], entries % self.path_capacity]
+
+    def _visit(self, vehicles, positions):
+        """Count a visit of each vehicle to its position
+
+        Args:
+            vehicles: (M,) distinct vehicle indices
+            positions: (M, 2) positions visited
+
+        Returns:
+            (M,) slots of the (vehicle, cell) pairs in the visit table
+        """
+        keys = (vehicles * self.size + positions[:, 0]) * self.size + positions[:, 1]
+        slots = np.searchsorted(self.visit_keys, keys)
+        known = slots < len(self.visit_keys)
+        known[known] = self.visit_keys[slots[known]] == keys[known]
+        if not known.all():
+            new_keys = np.sort(keys[~known])
+            at = np.searchsorted(self.visit_keys, new_keys)
+            self.visit_keys = np.insert(self.visit_keys, at, new_keys)
+            self.visit_counts = np.insert(self.visit_counts, at, 0)
+            self.loop_penalty_applied = np.insert(self.loop_penalty_applied, at, False)
+            slots = np.searchsorted(self.visit_keys, keys)
+        self.visit_counts[slots] += 1
+        return slots
+
+    def _update_path_indices(self, vehicles, positions, max_distance):
+        """Replan due vehicles and get the PathIndex of every given vehicle (see Vehicle.get_path_index)"""
+        planner = self.urban_grid.get_path_planner()
+        indices = []
+        for vehicle, position in zip(vehicles.tolist(), positions.tolist()):
+            path = self.optimal_paths[vehicle]
+            if self.steps[vehicle] % REPLAN_INTERVAL == 0 or not path:
+                path = self.optimal_paths[vehicle] = planner.plan(position, self.destinations[vehicle])
+            index = self._path_indices[vehicle]
+            if index is None or index.path is not path or (
+                    max_distance is not None and index.max_distance != max_distance):
+                index = self._path_indices[vehicle] = PathIndex(path, self.size, max_distance)
+            indices.append(index)
+        return indices
+
+    def _state_keys(self, states):
+        """Encoded states in the form the agent's Q-table is indexed with"""
+        if isinstance(self.agent.q_table, DenseQTable):
+            return states
+        return [decode_state(state, self.size) for state in states.tolist()]
+
+    def step(self):
+        """Move every active vehicle once (see Vehicle.move)
+
+        The caller updates congestion and traffic lights first, as with Vehicle.
+
+        Returns:
+            (M,) rewards of the active vehicles, in vehicle order
+        """
+        active = np.flatnonzero(~self.reached)
+        if len(active) == 0:
+            return np.zeros(0)
+        grid = self.urban_grid
+        agent = self.agent
+        size = self.size
+        positions = self.positions[active]
+        destinations = self.destinations[active]
+
+        # Current state and action
+        congestion = grid.get_congestion_windows(positions[:, 0], positions[:, 1])
+        states = agent.encode_states(positions, congestion, destinations)
+        valid_masks = grid.valid_action_mask[positions[:, 0], positions[:, 1]]
+        actions = agent.choose_actions(self._state_keys(states), valid_masks=valid_masks, rng=grid.rng)
+        deltas = ACTION_DELTA_ARRAY[actions]
+        new_positions = positions + deltas
+
+        # Moves off the grid keep the vehicle in place with a fixed penalty
+        in_bounds = np.all((new_positions >= 0) & (new_positions < size), axis=1)
+        new_positions = np.where(in_bounds[:, None], new_positions, positions)
+        rewards = np.full(len(active), -10.0)
+        params = self.reward_config.params
+        if self.reward_engine.params is not params:
+            self.reward_engine = RewardEngine(self.reward_config, size)
+        moving = active[in_bounds]
+        path_indices = None
+        if self.path_guidance and params.algorithm != "exponential_distance":
+            path_indices = self._update_path_indices(active, positions, params.path_reward_max_distance)
+            path_indices = [path_indices[row] for row in np.flatnonzero(in_bounds)]
+        rewards[in_bounds] = self.reward_engine.compute(
+            positions[in_bounds], new_positions[in_bounds], destinations[in_bounds],
+            grid.congestion_at(new_positions[in_bounds, 0], new_positions[in_bounds, 1]),
+            self.recent_history(moving), self.path_lengths[moving], path_indices
+        )
+
+        # Red lights stop the vehicle
+        lights = grid.traffic_lights[new_positions[:, 0], new_positions[:, 1]]
+        red_light = ((deltas[:, 1] != 0) & (lights == 2)) | ((deltas[:, 0] != 0) & (lights == 1))
+        rewards += np.where(red_light, params.red_light_wait_penalty, 0)
+
+        moved = ~red_light
+        arrived = moved & np.all(new_positions == destinations, axis=1)
+        rewards += np.where(arrived, params.destination_reached_reward, 0)
+        positions = np.where(moved[:, None], new_positions, positions)
+
+        self.positions[active] = positions
+        self.reached[active] = arrived
+        self.steps[active] += 1
+        self.path_buffer[active, self.path_lengths[active] % self.path_capacity] = positions
+        self.path_lengths[active] += 1
+
+        # Loop detection
+        loop_threshold = params.loop_threshold(size)
+        slots = self._visit(active, positions)
+        counts = self.visit_counts[slots]
+        looping = (counts > loop_threshold) & ~self.loop_penalty_applied[slots]
+        rewards += np.where(looping,
+                            np.maximum(params.loop_penalty_max,
+                                       params.loop_penalty_base * (counts - loop_threshold)),
+                            0)
+        self.loop_penalty_applied[slots[looping]] = True
+        if looping.any():
+            # Reset Q-values of the looping states to encourage exploring other paths
+            if isinstance(agent.q_table, DenseQTable):
+                agent.q_table.q_values[states[looping]] = -0.5
+            else:
+                for state in self._state_keys(states[looping]):
+                    agent.reset_state_q_values(state)
+
+        self.total_rewards[active] += rewards
+
+        # Q-learning update
+        next_congestion = grid.get_congestion_windows(positions[:, 0], positions[:, 1])
+        next_states = agent.encode_states(positions, next_congestion, destinations)
+        if self.experience_buffer is not None:
+            self.experience_buffer.add_batch(states, actions, rewards, next_states)
+        else:
+            agent.update_q_batch(states, actions, rewards, next_states)
+        return rewards
@@ -3,12 +3,23 @@ Main module for Q-Learning Urban Traffic Simulation
 This file serves as the entry point for the simulation.
 """
 import argparse
-import pickle
-from simulation import run_simulation, test_incident_response
-from UI.simulation_controller import SimulationController
+import os
+from simulation import run_simulation, run_parallel_simulation, test_incident_response
+from batch_simulation import run_batch_simulation
+from algorithm.checkpoint import save_agent as save_agent_file, load_agent
+
+AGENT_FILE = "trained_agent.vqt"
+LEGACY_AGENT_FILE = "trained_agent.pkl"
+
+def load_saved_agent():
+    """Load the saved agent, falling back to the legacy pickle file"""
+    path = AGENT_FILE if os.path.exists(AGENT_FILE) else LEGACY_AGENT_FILE
+    return load_agent(path)
 
 def train_mode(episodes=200, visualize_interval=50, show_plots=True, max_steps=2000, 
-              save_agent=True, iterations=1, save_iterations=False, unlimited_steps=False):
+              save_agent=True, iterations=1, save_iterations=False, unlimited_steps=False,
+              q_table_backend="dict", batch_envs=0, workers=0, record=None,
+              num_vehicles=5, fleet=False, path_guidance=False):
     """Training mode: Train a Q-learning agent
     
     Args:
@@ -20,24 +31,72 @@ def train_mode(episodes=200, visualize_interval=50, show_plots=True, max_steps=2
         iterations: Number of training iterations to run
         save_iterations: Whether to save intermediate agents after each iteration
         unlimited_steps: If True, ignore max_steps and run until all vehicles reach destination
+        q_table_backend: Q-table backend for a new agent ("dict" or "dense")
+        batch_envs: If > 0, train with the batched engine on this many environments at once
+                    (always uses the dense Q-table backend)
+        workers: If > 0, train with this many processes sharing one Q-table in shared memory
+                 (always uses the shared Q-table backend)
+        record: Optional PNG directory or video file that the visualized episodes are
+                recorded to with the headless raster renderer instead of a window
+        num_vehicles: Number of vehicles per episode
+        fleet: Whether to simulate the vehicles with the vectorized VehicleFleet
+        path_guidance: With fleet, whether vehicles plan A* paths for the path guidance rewards
+                       (off by default: planning dominates the cost of a large fleet)
     """
     # Adjust max_steps based on unlimited_steps parameter
     if unlimited_steps:
         max_steps = 0  # 0 means no step limit
     print(f"Training Q-Learning agent for {iterations} iterations of {episodes} episodes each...")
+    if record and (batch_envs > 0 or workers > 0):
+        print("Warning: --record is ignored with --batch-envs and --workers (only run_simulation "
+              "training visualizes episodes)")
+    if batch_envs > 0 and fleet:
+        print("Warning: --fleet is ignored with --batch-envs (the batched engine is already vectorized)")
     
     # For the first iteration, create a new agent
     trained_agent = None
     
+    def recorder_factory(iteration):
+        if not record:
+            return None
+        from raster_renderer import FrameRecorder
+        output = record
+        if iterations > 1:
+            # One recording per iteration: frames/ -> frames_iter1/, run.mp4 -> run_iter1.mp4
+            root, ext = os.path.splitext(record.rstrip("/\\"))
+            output = f"{root}_iter{iteration + 1}{ext}"
+        return lambda grid: FrameRecorder(grid, output)
+    
     for iteration in range(iterations):
         print(f"\n--- Iteration {iteration+1}/{iterations} ---")
         
-        if iteration == 0 or not trained_agent:
+        if batch_envs > 0:
+            # Batched training: many environments advance in lockstep
+            trained_agent = run_batch_simulation(episodes=episodes,
+                                                 num_envs=batch_envs,
+                                                 max_steps=max_steps,
+                                                 num_vehicles=num_vehicles,
+                                                 agent=trained_agent)
+        elif workers > 0:
+            # Hogwild training: worker processes update one shared Q-table
+            trained_agent = run_parallel_simulation(episodes=episodes,
+                                                    num_workers=workers,
+                                                    max_steps=max_steps,
+                                                    agent=trained_agent,
+                                                    num_vehicles=num_vehicles,
+                                                    fleet=fleet,
+                                                    path_guidance=path_guidance)
+        elif iteration == 0 or not trained_agent:
             # First iteration: train from scratch
             trained_agent = run_simulation(episodes=episodes, 
                                           visualize_interval=visualize_interval, 
                                           show_plots=show_plots, 
-                                          max_steps=max_steps)
+                                          max_steps=max_steps,
+                                          q_table_backend=q_table_backend,
+                                          visualizer_factory=recorder_factory(iteration),
+                                          num_vehicles=num_vehicles,
+                                          fleet=fleet,
+                                          path_guidance=path_guidance)
         else:
             # Continue training the existing agent
             print(f"Continuing training from previous iteration...")
@@ -45,21 +104,18 @@ def train_mode(episodes=200, visualize_interval=50, show_plots=True, max_steps=2
                                           visualize_interval=visualize_interval, 
                                           show_plots=show_plots, 
                                           max_steps=max_steps,
-                                          agent=trained_agent)
+                                          agent=trained_agent,
+                                          visualizer_factory=recorder_factory(iteration),
+                                          num_vehicles=num_vehicles,
+                                          fleet=fleet,
+                                          path_guidance=path_guidance)
         
         # Save intermediate agent if requested
         if save_iterations and trained_agent:
             try:
-                # Prepare agent for saving
-                visualizer_backup = trained_agent.prepare_for_save()
-                
                 # Save agent with iteration number in filename
-                filename = f"trained_agent_iter{iteration+1}.pkl"
-                with open(filename, "wb") as f:
-                    pickle.dump(trained_agent, f)
-                    
-                # Restore agent after saving
-                trained_agent.restore_after_save(visualizer_backup)
+                filename = f"trained_agent_iter{iteration+1}.vqt"
+                save_agent_file(trained_agent, filename)
                 print(f"Intermediate agent saved to '{filename}'")
             except Exception as e:
                 print(f"Error saving intermediate agent: {e}")
@@ -71,16 +127,8 @@ def train_mode(episodes=200, visualize_interval=50, show_plots=True, max_steps=2
     # Save final agent
     if save_agent and trained_agent:
         try:
-            # Prepare agent for saving
-            visualizer_backup = trained_agent.prepare_for_save()
-            
-            # Save agent to file
-            with open("trained_agent.pkl", "wb") as f:
-                pickle.dump(trained_agent, f)
-                
-            # Restore agent after saving
-            trained_agent.restore_after_save(visualizer_backup)
-            print("Final trained agent saved to 'trained_agent.pkl'")
+            save_agent_file(trained_agent, AGENT_FILE)
+            print(f"Final trained agent saved to '{AGENT_FILE}'")
         except Exception as e:
             print(f"Error saving agent: {e}")
     
@@ -88,6 +136,9 @@ def train_mode(episodes=200, visualize_interval=50, show_plots=True, max_steps=2
 
 def simulate_mode(agent=None):
     """Simulation mode: Launch interactive simulation controller"""
+    # Imported here so training alone runs without tkinter or a display
+    from UI.simulation_controller import SimulationController
+    
     controller = SimulationController(agent)
     print("Starting interactive simulation controller...")
     controller.run()
@@ -108,11 +159,26 @@ if __name__ == "__main__":
     parser.add_argument("--no-save", action="store_true",
                       help="Don't save trained agent to file")
     parser.add_argument("--continue", dest="continue_training", action="store_true",
-                      help="Continue training from existing agent.pkl file")
+                      help="Continue training from the saved agent file")
     parser.add_argument("--unlimited-steps", action="store_true",
                       help="Run until all vehicles reach destination, regardless of step count")
     parser.add_argument("--max-steps", type=int, default=2000,
                       help="Maximum steps per episode (ignored if --unlimited-steps is set)")
+    parser.add_argument("--batch-envs", type=int, default=0,
+                      help="Train with the batched engine on this many environments at once (0 disables)")
+    parser.add_argument("--q-table", choices=["dict", "dense"], default="dict",
+                      help="Q-table backend for new agents: dict of tuples or dense float32 array")
+    parser.add_argument("--workers", type=int, default=0,
+                      help="Train with this many processes sharing one Q-table (0 disables)")
+    parser.add_argument("--record", default=None,
+                      help="Record visualized training episodes to a PNG directory or a video file "
+                           "(headless, no window needed)")
+    parser.add_argument("--vehicles", type=int, default=5,
+                      help="Number of vehicles per training episode")
+    parser.add_argument("--fleet", action="store_true",
+                      help="Simulate the vehicles together as NumPy columns (for large populations)")
+    parser.add_argument("--path-guidance", action="store_true",
+                      help="With --fleet, plan A* paths for the path guidance rewards (slow for large fleets)")
     args = parser.parse_args()
     
     # Set whether to display plots
@@ -126,17 +192,7 @@ if __name__ == "__main__":
         if args.continue_training:
             try:
                 print("Attempting to load existing agent for continued training...")
-                with open("trained_agent.pkl", "rb") as f:
-                    trained_agent = pickle.load(f)
-                    
-                # Make sure urban_grid is properly initialized
-                if not hasattr(trained_agent, 'urban_grid') or trained_agent.urban_grid is None:
-                    from module.urban_grid import UrbanGrid
-                    trained_agent.urban_grid = UrbanGrid(
-                        size=trained_agent.grid_size,
-                        congestion_update_rate=trained_agent.grid_congestion_update_rate,
-                        traffic_light_cycle=trained_agent.grid_traffic_light_cycle
-                    )
+                trained_agent = load_saved_agent()
                 print("Successfully loaded existing agent for continued training")
             except FileNotFoundError:
                 print("No existing agent found. Starting training from scratch.")
@@ -154,24 +210,21 @@ if __name__ == "__main__":
             save_agent=not args.no_save,
             iterations=args.iterations,
             save_iterations=args.save_iterations,
-            unlimited_steps=args.unlimited_steps
+            unlimited_steps=args.unlimited_steps,
+            q_table_backend=args.q_table,
+            batch_envs=args.batch_envs,
+            workers=args.workers,
+            record=args.record,
+            num_vehicles=args.vehicles,
+            fleet=args.fleet,
+            path_guidance=args.path_guidance
         )
     
     if args.mode == "simulate" or args.mode == "both":
         # If mode is simulate only, try to load the trained agent
         if args.mode == "simulate" and not trained_agent:
             try:
-                with open("trained_agent.pkl", "rb") as f:
-                    trained_agent = pickle.load(f)
-                    
-                # Make sure urban_grid is properly initialized
-                if not hasattr(trained_agent, 'urban_grid') or trained_agent.urban_grid is None:
-                    from module.urban_grid import UrbanGrid
-                    trained_agent.urban_grid = UrbanGrid(
-                        size=trained_agent.grid_size,
-                        congestion_update_rate=trained_agent.grid_congestion_update_rate,
-                        traffic_light_cycle=trained_agent.grid_traffic_light_cycle
-                    )
+                trained_agent = load_saved_agent()
                     
                 print("Loaded existing trained agent")
             except FileNotFoundError:
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+逐回合指標串流寫入
+實驗進行中即把每回合的結果追加到 CSV，記憶體用量固定，程式中斷後已寫入的資料仍然完整
+"""
+
+import csv
+import math
+import os
+
+
+class RunningStats:
+    """以固定記憶體累計平均值、標準差與極值 (Welford 演算法)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """加入一個數值"""
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self):
+        """母體標準差 (與 np.std 相同)"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def to_dict(self):
+        """轉換為可 JSON 序列化的字典"""
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        """從 to_dict() 的結果還原"""
+        stats = cls()
+        stats.count = data['count']
+        stats.mean = data['mean']
+        stats.m2 = data['m2']
+        if stats.count:
+            stats.min = data['min']
+            stats.max = data['max']
+        return stats
+
+
+class EpisodeMetricsWriter:
+    """逐回合指標的 CSV 追加寫入器
+
+    資料列先緩衝在記憶體中，每 flush_interval 列寫入一次並 fsync，
+    因此中斷時最多遺失最後一批資料。以 resume=True 重新開啟時會丟棄
+    中斷時寫了一半的最後一行，並從已完整寫入的列數繼續。
+    """
+
+    def __init__(self, path, fieldnames, flush_interval=100, resume=False):
+        """開啟指標檔案
+
+        Args:
+            path: CSV 檔案路徑
+            fieldnames: 欄位名稱列表
+            flush_interval: 每累積多少列寫入磁碟一次
+            resume: 是否接續既有檔案 (否則覆寫)
+        """
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self._buffer = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.rows_written = self._recover()
+            self._file = open(path, 'a', newline='', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._file.write(','.join(self.fieldnames) + '\n')
+            self._sync()
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, lineterminator='\n')
+
+    def _recover(self):
+        """截掉未寫完的最後一行，並回傳完整資料列數"""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            complete = data[:data.rfind(b'\n') + 1]
+            if len(complete) != len(data):
+                f.truncate(len(complete))
+
+        lines = complete.decode('utf-8').splitlines()
+        if not lines or lines[0].split(',') != self.fieldnames:
+            raise ValueError(f"指標檔案 '{self.path}' 的欄位與目前設定不符，無法接續")
+        return len(lines) - 1
+
+    def truncate(self, num_rows):
+        """只保留前 num_rows 列資料 (用於從較早的檢查點接續)"""
+        self.flush()
+        with open(self.path, encoding='utf-8') as f:
+            keep = f.read().splitlines()[:num_rows + 1]
+        self._file.seek(0)
+        self._file.truncate(0)
+        self._file.write('\n'.join(keep) + '\n')
+        self._sync()
+        self.rows_written = len(keep) - 1
+
+    def write(self, row):
+        """加入一列資料 (字典)"""
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把緩衝中的資料寫入磁碟"""
+        if not self._buffer:
+            return
+        self._writer.writerows(self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer.clear()
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """寫入剩餘資料並關閉檔案"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_episode_metrics(path):
+    """讀取指標檔案
+
+    Returns:
+        {欄位名稱: 數值列表} 的字典
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = {name: [] for name in reader.fieldnames}
+        for row in reader:
+            for name, value in row.items():
+                columns[name].append(float(value))
+    return columns
@@ -0,0 +1,48 @@
+"""
+Grid action tables shared by the urban grid, A* and the Q-learning agent
+
+Valid moves from a cell are stored as a 4-bit mask (bit a set when action a stays on
+the grid and does not enter an obstacle). The lookup tables below turn such a mask
+into action indices or neighbor offsets without any per-call bounds checks.
+"""
+import numpy as np
+
+# Up, Right, Down, Left
+ACTION_DELTAS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+# Action indices allowed by each mask value
+ACTIONS_BY_MASK = tuple(
+    tuple(a for a in range(4) if mask >> a & 1) for mask in range(16)
+)
+
+# Same as ACTIONS_BY_MASK, but a cell with no valid move allows every direction
+# (the failsafe used by the agent when it is surrounded by obstacles)
+AGENT_ACTIONS_BY_MASK = tuple(actions or (0, 1, 2, 3) for actions in ACTIONS_BY_MASK)
+
+# Neighbor (dx, dy) offsets allowed by each mask value
+NEIGHBOR_OFFSETS_BY_MASK = tuple(
+    tuple(ACTION_DELTAS[a] for a in actions) for actions in ACTIONS_BY_MASK
+)
+
+# MASK_BITS[mask] is the boolean per-action view of a mask value
+MASK_BITS = np.array([[bool(mask >> a & 1) for a in range(4)] for mask in range(16)])
+
+
+def build_valid_action_mask(obstacles):
+    """Build the valid-action bitmask for an obstacle map
+
+    Args:
+        obstacles: Boolean array of shape (..., size, size); leading dimensions are
+                   treated as independent grids
+
+    Returns:
+        uint8 array of the same shape holding one 4-bit mask per cell
+    """
+    size_x, size_y = obstacles.shape[-2:]
+    padding = [(0, 0)] * (obstacles.ndim - 2) + [(1, 1), (1, 1)]
+    blocked = np.pad(obstacles, padding, constant_values=True)
+    mask = np.zeros(obstacles.shape, dtype=np.uint8)
+    for a, (dx, dy) in enumerate(ACTION_DELTAS):
+        open_cells = ~blocked[..., 1 + dx:size_x + 1 + dx, 1 + dy:size_y + 1 + dy]
+        mask |= open_cells.astype(np.uint8) << a
+    return mask
@@ -0,0 +1,71 @@
+"""
+Color Tables Module
+
+This module holds the color scales shared by the Tkinter visualizer and the headless
+raster renderer, computed once as lookup tables so a whole congestion array can be
+mapped to colors with one indexing operation.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+# Congestion color scale: yellow to orange to red, evenly spaced
+CONGESTION_COLORS = ((1, 1, 0.7), (1, 0.7, 0), (0.8, 0, 0))
+
+# Number of quantized congestion levels
+CONGESTION_LEVELS = 256
+
+# Congestion below this level is drawn as a plain road
+LOW_CONGESTION = 0.1
+
+# Hex color of roads with low congestion, the last entry of the hex lookup table
+LOW_CONGESTION_HEX = '#d9d9d9'
+
+
+@lru_cache(maxsize=None)
+def congestion_rgb_lut():
+    """RGB color (floats in [0, 1]) of every quantized congestion level
+
+    Entry i is the color of levels in [i / 256, (i + 1) / 256), interpolated linearly
+    along CONGESTION_COLORS exactly like a 256-entry matplotlib
+    LinearSegmentedColormap built from the same colors.
+
+    Returns:
+        Read-only (256, 3) array
+    """
+    anchors = np.linspace(0, 1, len(CONGESTION_COLORS))
+    x = np.linspace(0, 1, CONGESTION_LEVELS)
+    colors = np.array(CONGESTION_COLORS, dtype=np.float64)
+    lut = np.stack([np.interp(x, anchors, colors[:, channel]) for channel in range(3)], axis=1)
+    lut.flags.writeable = False
+    return lut
+
+
+def congestion_indices(congestion):
+    """Quantize congestion levels to indices into the congestion lookup tables"""
+    levels = np.asarray(congestion, dtype=np.float64) * CONGESTION_LEVELS
+    return np.clip(levels, 0, CONGESTION_LEVELS - 1).astype(np.intp)
+
+
+@lru_cache(maxsize=None)
+def congestion_hex_lut():
+    """Tk hex color of every quantized congestion level, plus the low-congestion gray
+
+    Entries 0-255 are congestion_rgb_lut() formatted as '#rrggbb'; entry 256 is the
+    light gray used for congestion below LOW_CONGESTION.
+
+    Returns:
+        Read-only (257,) object array of strings
+    """
+    rgb = (congestion_rgb_lut() * 255).astype(int)
+    colors = [f'#{r:02x}{g:02x}{b:02x}' for r, g, b in rgb] + [LOW_CONGESTION_HEX]
+    lut = np.array(colors, dtype=object)
+    lut.flags.writeable = False
+    return lut
+
+
+def congestion_hex_indices(congestion):
+    """Indices into congestion_hex_lut() (256 marks low congestion)"""
+    congestion = np.asarray(congestion, dtype=np.float64)
+    return np.where(congestion < LOW_CONGESTION, CONGESTION_LEVELS, congestion_indices(congestion))
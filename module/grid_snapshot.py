@@ -0,0 +1,51 @@
+"""
+Grid Snapshot Module
+
+This module captures the parts of an UrbanGrid and its vehicles that the visualizers
+draw into plain copies. A snapshot taken while the simulation advances in a worker
+thread can be rendered later without reading the live grid, which the worker keeps
+changing. Snapshots expose the same attributes the visualizers read from a grid
+(size, congestion, obstacles, traffic_lights, current_step, vehicles).
+"""
+
+import numpy as np
+
+
+class VehicleSnapshot:
+    """Copy of the vehicle attributes used for drawing"""
+
+    __slots__ = ('id', 'position', 'destination', 'start_position', 'reached', 'path',
+                 'remaining_optimal_path')
+
+    def __init__(self, vehicle):
+        self.id = vehicle.id
+        self.position = vehicle.position
+        self.destination = vehicle.destination
+        self.start_position = vehicle.start_position
+        self.reached = vehicle.reached
+        self.path = list(vehicle.path)
+        self.remaining_optimal_path = [] if vehicle.reached else list(vehicle.get_remaining_optimal_path())
+
+    def get_remaining_optimal_path(self):
+        """Remaining optimal path at the time of the snapshot"""
+        return self.remaining_optimal_path
+
+
+class GridSnapshot:
+    """Copy of the grid state and vehicles at one simulation step"""
+
+    def __init__(self, grid, vehicles=(), step=0):
+        """Capture a grid
+
+        Args:
+            grid: The UrbanGrid to copy
+            vehicles: Vehicles to include in the snapshot
+            step: Simulation step the snapshot was taken at
+        """
+        self.size = grid.size
+        self.congestion = np.array(grid.congestion, dtype=np.float64)
+        self.obstacles = np.array(grid.obstacles, dtype=bool)
+        self.traffic_lights = np.array(grid.traffic_lights)
+        self.current_step = step
+        self.vehicles = [VehicleSnapshot(vehicle) for vehicle in vehicles]
+        self.completed = sum(1 for vehicle in self.vehicles if vehicle.reached)
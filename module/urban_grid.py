@@ -1,75 +1,434 @@
 import numpy as np
-from visualizer import TkinterVisualizer
+from collections import deque
+from algorithm.path_planner import PathPlanner
+from module.actions import ACTION_DELTAS, build_valid_action_mask
+
+# Number of individual obstacle changes remembered for incremental path validation
+OBSTACLE_LOG_LENGTH = 1024
+# Smallest pending congestion scale in sparse mode before it is applied to the stored map
+MIN_CONGESTION_SCALE = 1e-100
+
+def initial_traffic_lights(size):
+    """Initial traffic light layout for a grid of the given size"""
+    lights = np.zeros((size, size), dtype=int)
+    # Place traffic lights at every second position to create proper intersections
+    i, j = np.meshgrid(np.arange(1, size, 2), np.arange(1, size, 2), indexing='ij')
+    # Alternate initial states for visual pattern
+    lights[1::2, 1::2] = np.where((i + j) % 2 == 0, 1, 2)
+    return lights
+
+
+def build_traffic_light_states(lights):
+    """Stack a light layout with its toggled counterpart, giving the states of both phases"""
+    lights = np.asarray(lights, dtype=int)
+    toggled = np.where(lights > 0, 3 - lights, 0)  # Toggle between 1 and 2
+    return np.stack([lights, toggled])
+
+
+def summed_area_table(values):
+    """Summed-area table of the last two axes, zero-padded on the low edges
+    
+    table[..., i, j] holds the sum of values[..., :i, :j], so the sum of any rectangle
+    can be read with four lookups.
+    """
+    table = np.zeros(values.shape[:-2] + (values.shape[-2] + 1, values.shape[-1] + 1))
+    np.cumsum(values, axis=-2, out=table[..., 1:, 1:])
+    np.cumsum(table[..., 1:, 1:], axis=-1, out=table[..., 1:, 1:])
+    return table
+
+
+def window_means(table, xs, ys, size, window_size=3, batch_index=None):
+    """Average of the window around each (x, y), clipped at the grid edges
+    
+    Args:
+        table: Summed-area table from summed_area_table
+        xs, ys: Arrays of cell coordinates
+        size: Grid size
+        window_size: Width of the square window
+        batch_index: For a table with a leading batch axis, the batch entry of each cell
+    """
+    half_window = window_size // 2
+    x_min = np.maximum(0, xs - half_window)
+    x_max = np.minimum(size - 1, xs + half_window) + 1
+    y_min = np.maximum(0, ys - half_window)
+    y_max = np.minimum(size - 1, ys + half_window) + 1
+    if batch_index is not None:
+        total = (table[batch_index, x_max, y_max] - table[batch_index, x_min, y_max]
+                 - table[batch_index, x_max, y_min] + table[batch_index, x_min, y_min])
+    else:
+        total = table[x_max, y_max] - table[x_min, y_max] - table[x_max, y_min] + table[x_min, y_min]
+    return total / ((x_max - x_min) * (y_max - y_min))
+
 
 class UrbanGrid:
-    def __init__(self, size=20, congestion_update_rate=0.1, traffic_light_cycle=10):
+    def __init__(self, size=20, congestion_update_rate=0.1, traffic_light_cycle=10, sparse_congestion=False,
+                 visualizer_factory=None, seed=None):
+        """Create an urban grid
+        
+        Args:
+            size: Grid size (the grid is size x size)
+            congestion_update_rate: Blend rate of vehicle positions into the congestion map
+            traffic_light_cycle: Number of steps between traffic light switches
+            sparse_congestion: If True, update_congestion only writes the cells with
+                               vehicles: the decay and normalization of the whole map are
+                               kept as one pending scale factor, applied when the full map
+                               is read. Meant for large grids with few vehicles; congestion
+                               levels are the same as in the default mode
+            visualizer_factory: Optional callable taking the grid and returning a visualizer
+                                (an object with update_display() and is_closed); if None,
+                                the Tkinter visualizer is imported on first use
+            seed: Seed (or numpy SeedSequence) for the grid's random number generator
+        """
         self.size = size
+        # Random stream of this environment, shared by its vehicles and the agent acting on it
+        self.rng = np.random.default_rng(seed)
         self.grid = np.zeros((size, size))  # Grid for the map
         self.congestion = np.zeros((size, size))  # Congestion levels
+        self.obstacle_version = 0  # Incremented on every obstacle change
+        self._obstacle_log = deque(maxlen=OBSTACLE_LOG_LENGTH)  # (version, x, y, added)
+        self._obstacle_reset_version = 0  # Version of the last wholesale obstacle replacement
         self.obstacles = np.zeros((size, size), dtype=bool)  # Traffic incidents
+        self._path_planner = None
         self.congestion_update_rate = congestion_update_rate
+        self.sparse_congestion = sparse_congestion
         
-        # Traffic light system
-        self.traffic_lights = np.zeros((size, size), dtype=int)  # 0: no light, 1: NS green, 2: EW green
+        # Visualization is an optional plugin, created on the first visualize() call
+        self.visualizer_factory = visualizer_factory
+        self.visualizer = None
+        
+        # Traffic light system (0: no light, 1: NS green, 2: EW green)
+        # The state of every light is derived from the current phase, so switching is O(1)
         self.traffic_light_cycle = traffic_light_cycle
         self.current_cycle = 0
+        self.light_phase = 0  # Toggles between 0 and 1 every traffic_light_cycle steps
         self.init_traffic_lights()
 
+    @property
+    def congestion(self):
+        """Congestion levels in [0, 1]
+        
+        After changing cells in place, call mark_congestion_changed so window queries
+        see the new values. In sparse mode, reading the map applies the pending scale
+        factor to every cell; use congestion_at to read a few cells.
+        """
+        if self._congestion_scale != 1.0:
+            self._congestion *= self._congestion_scale
+            self._congestion_scale = 1.0
+        return self._congestion
+
+    @congestion.setter
+    def congestion(self, value):
+        self._congestion = value
+        self._congestion_scale = 1.0  # Pending factor of the stored map (sparse mode)
+        self._congestion_max = None  # Maximum of the map, if known (sparse mode)
+        self._congestion_sat = None
+
+    def congestion_at(self, xs, ys):
+        """Get the congestion of individual cells without reading the whole map
+        
+        Args:
+            xs, ys: Cell coordinates (integers or integer arrays)
+            
+        Returns:
+            Congestion level(s) at the given cells
+        """
+        return self._congestion[xs, ys] * self._congestion_scale
+
+    def mark_congestion_changed(self):
+        """Invalidate cached congestion data after in-place edits of the congestion map"""
+        self._congestion_max = None
+        self._congestion_sat = None
+
+    def get_congestion_sat(self):
+        """Get the summed-area table of the congestion map (rebuilt only when stale)"""
+        if self._congestion_sat is None:
+            self._congestion_sat = summed_area_table(self.congestion)
+        return self._congestion_sat
+
+    @property
+    def traffic_lights(self):
+        """Traffic light states for the current phase (0: no light, 1: NS green, 2: EW green)"""
+        return self._traffic_light_states[self.light_phase]
+
+    @traffic_lights.setter
+    def traffic_lights(self, value):
+        # The given layout becomes the current phase; the other phase is its toggle
+        self._traffic_light_states = build_traffic_light_states(value)
+        self.light_phase = 0
+
+    def get_traffic_light(self, x, y):
+        """Get the traffic light state at (x, y) for the current phase"""
+        return self._traffic_light_states.item(self.light_phase, x, y)
+
+    @property
+    def obstacles(self):
+        """Boolean array of traffic incidents
+        
+        Change single cells with add_obstacle/remove_obstacle (or assign a whole new
+        array) so the valid-action mask and cached paths stay in sync.
+        """
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, value):
+        # Replacing the whole array rebuilds the action mask and invalidates every cached path
+        self._obstacles = value
+        self.valid_action_mask = build_valid_action_mask(value)
+        self.obstacle_version += 1
+        self._obstacle_reset_version = self.obstacle_version
+        self._obstacle_log.clear()
+
+    def get_obstacle_changes(self, since_version):
+        """Get the obstacle changes made after a given obstacle version
+        
+        Returns:
+            List of (x, y, added) tuples in order, or None if the changes are unknown
+            because the obstacle map was replaced or the change log has been truncated
+        """
+        if since_version < self._obstacle_reset_version:
+            return None
+        if self._obstacle_log and self._obstacle_log[0][0] > since_version + 1:
+            return None
+        return [(x, y, added) for version, x, y, added in self._obstacle_log if version > since_version]
+
+    def get_path_planner(self):
+        """Get the shared path planner for this grid (created on first use)"""
+        if self._path_planner is None:
+            self._path_planner = PathPlanner(self)
+        return self._path_planner
+
+    def __getstate__(self):
+        """Called when pickling the grid - cached paths are not saved"""
+        state = self.__dict__.copy()
+        state['_path_planner'] = None
+        state['_congestion_sat'] = None
+        state['visualizer_factory'] = None  # Factories are often lambdas and cannot be pickled
+        return state
+
+    def __setstate__(self, state):
+        """Called when unpickling the grid - upgrade grids saved by older versions"""
+        if 'congestion' in state:
+            state['_congestion'] = state.pop('congestion')
+        state['_congestion_sat'] = None
+        if 'obstacles' in state:
+            state['_obstacles'] = state.pop('obstacles')
+        if 'traffic_lights' in state:
+            state['_traffic_light_states'] = build_traffic_light_states(state.pop('traffic_lights'))
+            state['light_phase'] = 0
+        if '_congestion_scale' not in state:
+            # Grids pickled before the lazy sparse mode used sparse_congestion (later named
+            # clip_congestion) for a clipping model; they load with the normalized one
+            state.pop('clip_congestion', None)
+            state['sparse_congestion'] = False
+            state['_congestion_scale'] = 1.0
+            state['_congestion_max'] = None
+        state.setdefault('visualizer_factory', None)
+        state.setdefault('obstacle_version', 0)
+        state.setdefault('_obstacle_log', deque(maxlen=OBSTACLE_LOG_LENGTH))
+        state.setdefault('_obstacle_reset_version', 0)
+        state.setdefault('rng', np.random.default_rng())
+        state['_path_planner'] = None
+        self.__dict__.update(state)
+        if 'valid_action_mask' not in state:
+            self.valid_action_mask = build_valid_action_mask(self._obstacles)
+
+    def get_dynamic_state(self):
+        """Get the arrays and counters that change while a simulation runs
+
+        Returns:
+            Dictionary of numpy arrays (suitable for np.savez) that restore_dynamic_state accepts
+        """
+        return {
+            'congestion': self.congestion.copy(),
+            'obstacles': self.obstacles.copy(),
+            'traffic_lights': self._traffic_light_states[0].copy(),
+            'light_phase': np.array(self.light_phase),
+            'current_cycle': np.array(self.current_cycle),
+        }
+
+    def restore_dynamic_state(self, state):
+        """Restore a state produced by get_dynamic_state (cached paths are dropped)"""
+        self.obstacles = np.array(state['obstacles'], dtype=bool)
+        self.congestion = np.array(state['congestion'], dtype=np.float64)
+        self.traffic_lights = np.array(state['traffic_lights'])
+        self.light_phase = int(state['light_phase'])
+        self.current_cycle = int(state['current_cycle'])
+        if self._path_planner is not None:
+            self._path_planner.invalidate()
+
+    def seed(self, seed=None):
+        """Replace the grid's random number generator with a newly seeded one"""
+        self.rng = np.random.default_rng(seed)
+
+    def random_positions(self, count, free_only=False):
+        """Sample random cell positions from the grid's random stream
+
+        Args:
+            count: Number of positions to sample
+            free_only: If True, only sample cells without an obstacle
+
+        Returns:
+            (count, 2) integer array of (x, y) positions
+        """
+        if not free_only:
+            return self.rng.integers(0, self.size, size=(count, 2))
+        free_cells = np.flatnonzero(~self._obstacles)
+        cells = free_cells[self.rng.integers(0, len(free_cells), size=count)]
+        return np.stack(np.divmod(cells, self.size), axis=1)
+
     def reset_congestion(self):
         """Reset congestion to random initial levels"""
-        self.congestion = np.random.uniform(0, 0.3, size=(self.size, self.size))
+        self.congestion = self.rng.uniform(0, 0.3, size=(self.size, self.size))
 
     def update_congestion(self, positions):
-        """Update congestion based on vehicle positions"""
-        # Create a heatmap of vehicle positions
-        position_heatmap = np.zeros((self.size, self.size))
-        for pos in positions:
-            position_heatmap[pos] += 1
+        """Update congestion based on vehicle positions
+        
+        The congestion map is updated in place: it decays by the update rate and every
+        vehicle adds the update rate to its cell (equivalent to blending in a heatmap of
+        vehicle counts). The map is then normalized by its maximum.
+        """
+        if self._congestion.dtype != np.float64:
+            self.congestion = self._congestion.astype(np.float64)
+        rate = self.congestion_update_rate
+        
+        coords = np.asarray(positions, dtype=np.intp).reshape(-1, 2)
+        xs, ys = coords[:, 0], coords[:, 1]
+        
+        if self.sparse_congestion:
+            self._update_congestion_sparse(xs, ys, rate)
+        else:
+            congestion = self.congestion
+            congestion *= (1 - rate)
+            np.add.at(congestion, (xs, ys), rate)
+            
+            # Normalize congestion to [0, 1] range
+            max_congestion = congestion.max()
+            if max_congestion > 0:
+                congestion /= max_congestion
+        
+        # The summed-area table is rebuilt by the next window query that needs it
+        self._congestion_sat = None
 
-        # Update congestion levels
-        self.congestion = (1 - self.congestion_update_rate) * self.congestion + \
-                          self.congestion_update_rate * position_heatmap
+    def _update_congestion_sparse(self, xs, ys, rate):
+        """update_congestion for sparse mode, writing only the cells with vehicles
+        
+        Decaying and normalizing multiply the whole map by a factor, so both only change
+        the pending scale. Cells without vehicles only decay, so the new maximum is the
+        larger of the decayed old maximum and the new values of the touched cells.
+        """
+        congestion = self._congestion
+        if self._congestion_max is None:
+            self._congestion_max = congestion.max() * self._congestion_scale
+        scale = self._congestion_scale * (1 - rate)
+        if scale < MIN_CONGESTION_SCALE:
+            # The stored values grow as the scale shrinks; apply it before it underflows
+            congestion *= scale
+            scale = 1.0
+        np.add.at(congestion, (xs, ys), rate / scale)
         
-        # Normalize congestion to [0, 1] range
-        if np.max(self.congestion) > 0:
-            self.congestion = self.congestion / np.max(self.congestion)
+        max_congestion = self._congestion_max * (1 - rate)
+        if len(xs):
+            max_congestion = max(max_congestion, congestion[xs, ys].max() * scale)
+        if max_congestion > 0:
+            scale /= max_congestion
+            max_congestion = 1.0
+        self._congestion_scale = scale
+        self._congestion_max = max_congestion
 
     def add_obstacle(self, x, y):
         """Add a traffic incident at position (x, y)"""
-        self.obstacles[x, y] = True
+        self._set_obstacle(x, y, True)
 
     def remove_obstacle(self, x, y):
         """Remove a traffic incident from position (x, y)"""
-        self.obstacles[x, y] = False
+        self._set_obstacle(x, y, False)
+
+    def _set_obstacle(self, x, y, value):
+        """Set one obstacle cell and record the change if it actually changed"""
+        if self._obstacles[x, y] == value:
+            return
+        self._obstacles[x, y] = value
+        
+        # Only the moves of the four neighbors into (x, y) change
+        bit_value = 0 if value else 1
+        for a, (dx, dy) in enumerate(ACTION_DELTAS):
+            nx, ny = x - dx, y - dy
+            if 0 <= nx < self.size and 0 <= ny < self.size:
+                self.valid_action_mask[nx, ny] = (self.valid_action_mask[nx, ny] & (0xF ^ (1 << a))) | (bit_value << a)
+        
+        self.obstacle_version += 1
+        self._obstacle_log.append((self.obstacle_version, int(x), int(y), value))
         
     def init_traffic_lights(self):
         """Initialize traffic lights at all intersections"""
-        # Place traffic lights at every second position to create proper intersections
-        for i in range(1, self.size, 2):  # Start at 1, increment by 2
-            for j in range(1, self.size, 2):  # Start at 1, increment by 2
-                # Alternate initial states for visual pattern
-                state = 1 if (i + j) % 2 == 0 else 2
-                self.traffic_lights[i, j] = state
+        self.traffic_lights = initial_traffic_lights(self.size)
     
     def update_traffic_lights(self):
         """Update traffic light states based on cycle"""
         self.current_cycle += 1
         if self.current_cycle % self.traffic_light_cycle == 0:
-            # Switch traffic light states (1->2, 2->1)
-            for i in range(self.size):
-                for j in range(self.size):
-                    if self.traffic_lights[i, j] > 0:
-                        self.traffic_lights[i, j] = 3 - self.traffic_lights[i, j]  # Toggle between 1 and 2
+            # Switch traffic light states (1->2, 2->1) by moving to the other phase
+            self.light_phase ^= 1
 
     def get_congestion_window(self, x, y, window_size=3):
         """Get average congestion in a window around (x, y)"""
         half_window = window_size // 2
         x_min = max(0, x - half_window)
-        x_max = min(self.size - 1, x + half_window)
+        x_max = min(self.size - 1, x + half_window) + 1
         y_min = max(0, y - half_window)
-        y_max = min(self.size - 1, y + half_window)
+        y_max = min(self.size - 1, y + half_window) + 1
+        
+        if self.sparse_congestion and self._congestion_sat is None:
+            # Averaging one window is cheaper than rebuilding the table after an update
+            window = self._congestion[x_min:x_max, y_min:y_max]
+            return window.mean() * self._congestion_scale
+        
+        # Four lookups in the summed-area table instead of averaging the window
+        table = self.get_congestion_sat()
+        total = (table.item(x_max, y_max) - table.item(x_min, y_max)
+                 - table.item(x_max, y_min) + table.item(x_min, y_min))
+        return total / ((x_max - x_min) * (y_max - y_min))
+
+    def get_congestion_windows(self, xs, ys, window_size=3):
+        """Get average congestion in a window around many positions at once
         
-        return np.mean(self.congestion[x_min:x_max+1, y_min:y_max+1])
+        Args:
+            xs, ys: Arrays of x and y coordinates
+            window_size: Width of the square window
+            
+        Returns:
+            Array of window averages, one per position
+        """
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if (self.sparse_congestion and self._congestion_sat is None
+                and xs.size * window_size ** 2 < self._congestion.size):
+            # Reading the windows is cheaper than rebuilding the table after an update
+            return self._window_means_direct(xs, ys, window_size)
+        return window_means(self.get_congestion_sat(), xs, ys, self.size, window_size)
+
+    def _window_means_direct(self, xs, ys, window_size):
+        """Window averages read cell by cell, for a few positions in sparse mode"""
+        half_window = window_size // 2
+        totals = np.zeros(xs.shape)
+        counts = np.zeros(xs.shape)
+        for dx in range(-half_window, half_window + 1):
+            for dy in range(-half_window, half_window + 1):
+                nx, ny = xs + dx, ys + dy
+                inside = (nx >= 0) & (nx < self.size) & (ny >= 0) & (ny < self.size)
+                totals[inside] += self._congestion[nx[inside], ny[inside]]
+                counts += inside
+        return totals / counts * self._congestion_scale
+
+    def create_visualizer(self):
+        """Create the visualizer plugin for this grid
+        
+        The Tkinter visualizer is imported here rather than at module load, so headless
+        training and experiment workers never import tkinter or matplotlib.
+        """
+        if self.visualizer_factory is not None:
+            return self.visualizer_factory(self)
+        from visualizer import TkinterVisualizer
+        return TkinterVisualizer(grid_size=self.size, cell_size=30)
 
     def visualize(self, vehicles=None, show_plot=True, obstacle_mode=False, congestion_mode=False):
         """Visualize the grid with congestion and vehicles using Tkinter
@@ -83,9 +442,9 @@ class UrbanGrid:
         if not show_plot:
             return
             
-        # Create or update tkinter visualizer
+        # Create or update visualizer
         if not hasattr(self, 'visualizer') or self.visualizer is None or self.visualizer.is_closed:
-            self.visualizer = TkinterVisualizer(grid_size=self.size, cell_size=30)
+            self.visualizer = self.create_visualizer()
             
         # Store vehicles reference for visualization
         self.vehicles = vehicles
@@ -0,0 +1,215 @@
+"""
+Headless raster renderer for Q-Learning Urban Traffic Simulation
+
+Paints the state of an UrbanGrid (or a GridSnapshot) into NumPy RGB arrays with array
+operations only, so recordings can be made on machines without a display:
+  - RasterRenderer turns a grid and its vehicles into a (height, width, 3) uint8 frame,
+  - FrameRecorder is a visualizer plugin (see UrbanGrid.visualizer_factory) that streams
+    the frames of every visualize() call to a PNG sequence or a video file.
+
+Each grid cell becomes a cell_size x cell_size block of pixels, oriented like the
+Tkinter visualizer (x to the right, y upwards).
+"""
+import os
+import numpy as np
+from module.colors import congestion_rgb_lut, congestion_hex_indices
+
+# Colors (RGB) of the map elements, matching the Tkinter visualizer
+ROAD_COLOR = (0xd9, 0xd9, 0xd9)
+OBSTACLE_COLOR = (0xff, 0x00, 0x00)
+GREEN_LIGHT_COLOR = (0x00, 0xff, 0x00)
+RED_LIGHT_COLOR = (0xff, 0x00, 0x00)
+OPTIMAL_PATH_COLOR = (0x87, 0xce, 0xeb)
+ACTUAL_PATH_COLOR = (0x4c, 0xaf, 0x50)
+START_COLOR = (0xff, 0xa5, 0x00)
+DESTINATION_COLOR = (0x32, 0xcd, 0x32)
+REACHED_DESTINATION_COLOR = (0xff, 0xff, 0x00)
+VEHICLE_COLOR = (0x00, 0x66, 0xcc)
+
+# Video formats written through imageio; anything else is a directory of PNG frames
+VIDEO_EXTENSIONS = ('.mp4', '.gif', '.avi', '.mov', '.mkv', '.webm')
+
+
+class RasterRenderer:
+    """Render grid states to RGB arrays"""
+
+    def __init__(self, grid_size, cell_size=8):
+        """Create a renderer
+
+        Args:
+            grid_size: Size of the urban grids to render
+            cell_size: Width and height of one cell in pixels (at least 4)
+        """
+        if cell_size < 4:
+            raise ValueError("cell_size must be at least 4 pixels")
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        # Same 257 entries as the visualizer's hex table: 256 congestion levels, then road gray
+        self.congestion_lut = np.vstack([(congestion_rgb_lut() * 255).astype(np.uint8),
+                                         np.array([ROAD_COLOR], dtype=np.uint8)])
+        self.patterns = self._build_patterns(cell_size)
+
+    @staticmethod
+    def _build_patterns(cell_size):
+        """Pixel masks drawn inside a cell for each kind of map element"""
+        c = cell_size
+        m = c // 2  # Center pixel
+        w = max(1, c // 8)  # Half width of lines
+        rows, cols = np.mgrid[0:c, 0:c]
+        horizontal_band = np.abs(rows - m) < w
+        vertical_band = np.abs(cols - m) < w
+
+        def square(half):
+            return (np.abs(rows - m) <= half) & (np.abs(cols - m) <= half)
+
+        return {
+            # Path segments from the cell center towards each neighbor
+            'right': horizontal_band & (cols >= m),
+            'left': horizontal_band & (cols <= m),
+            'up': vertical_band & (rows <= m),
+            'down': vertical_band & (rows >= m),
+            'obstacle': ((np.abs(rows - cols) < w) | (np.abs(rows + cols - (c - 1)) < w)),
+            # A traffic light shows which direction has green
+            'ns_light': vertical_band & square(c // 3),
+            'ew_light': horizontal_band & square(c // 3),
+            'light_box': square(c // 3),
+            'start': square(max(1, c // 5)),
+            'destination': square(max(1, c // 4)) & ~square(max(0, c // 4 - w)),
+            'vehicle': square(max(1, c // 4)),
+        }
+
+    def _to_image(self, cells):
+        """Reorient a [x, y] cell array to image [row, column] order (y upwards)"""
+        return np.swapaxes(cells, 0, 1)[::-1]
+
+    def _expand(self, cell_mask, pattern):
+        """Pixel mask of a pattern drawn in every cell of an image-oriented cell mask"""
+        s, c = cell_mask.shape[0], self.cell_size
+        return (cell_mask[:, None, :, None] & pattern[None, :, None, :]).reshape(s * c, s * c)
+
+    def _paint(self, frame, cells, pattern, color):
+        """Draw a pattern in the given [x, y] cells"""
+        if cells.any():
+            frame[self._expand(self._to_image(cells), self.patterns[pattern])] = color
+
+    def _cell_mask(self, positions):
+        mask = np.zeros((self.grid_size, self.grid_size), dtype=bool)
+        if len(positions):
+            positions = np.asarray(positions)
+            mask[positions[:, 0], positions[:, 1]] = True
+        return mask
+
+    def _paint_paths(self, frame, paths, color):
+        """Draw paths as connected segments between the centers of consecutive cells"""
+        segments = [np.asarray(path) for path in paths if len(path) > 1]
+        if not segments:
+            return
+        starts = np.concatenate([path[:-1] for path in segments])
+        ends = np.concatenate([path[1:] for path in segments])
+        delta = ends - starts
+        for pattern, back, (dx, dy) in (('right', 'left', (1, 0)), ('up', 'down', (0, 1))):
+            forward = (delta[:, 0] == dx) & (delta[:, 1] == dy)
+            backward = (delta[:, 0] == -dx) & (delta[:, 1] == -dy)
+            # A step from a to b leaves a towards b and enters b from a
+            self._paint(frame, self._cell_mask(np.concatenate([starts[forward], ends[backward]])), pattern, color)
+            self._paint(frame, self._cell_mask(np.concatenate([ends[forward], starts[backward]])), back, color)
+
+    def render(self, grid, vehicles=None):
+        """Render a grid state
+
+        Args:
+            grid: UrbanGrid or GridSnapshot to render
+            vehicles: Optional list of vehicles (if None, uses grid.vehicles when present)
+
+        Returns:
+            (grid_size * cell_size, grid_size * cell_size, 3) uint8 RGB array
+        """
+        if vehicles is None:
+            vehicles = getattr(grid, 'vehicles', None) or []
+        c = self.cell_size
+
+        # Congestion heatmap, with plain road color for low congestion
+        cells = self.congestion_lut[congestion_hex_indices(grid.congestion)]
+        frame = np.repeat(np.repeat(self._to_image(cells), c, axis=0), c, axis=1)
+
+        self._paint(frame, np.asarray(grid.obstacles, dtype=bool), 'obstacle', OBSTACLE_COLOR)
+
+        lights = np.asarray(grid.traffic_lights)
+        self._paint(frame, lights > 0, 'light_box', RED_LIGHT_COLOR)
+        self._paint(frame, lights == 1, 'ns_light', GREEN_LIGHT_COLOR)
+        self._paint(frame, lights == 2, 'ew_light', GREEN_LIGHT_COLOR)
+
+        active = [v for v in vehicles if not v.reached]
+        self._paint_paths(frame, [v.get_remaining_optimal_path() for v in active], OPTIMAL_PATH_COLOR)
+        self._paint_paths(frame, [v.path for v in vehicles], ACTUAL_PATH_COLOR)
+
+        self._paint(frame, self._cell_mask([v.start_position for v in vehicles]), 'start', START_COLOR)
+        self._paint(frame, self._cell_mask([v.destination for v in vehicles if not v.reached]),
+                    'destination', DESTINATION_COLOR)
+        self._paint(frame, self._cell_mask([v.destination for v in vehicles if v.reached]),
+                    'destination', REACHED_DESTINATION_COLOR)
+        self._paint(frame, self._cell_mask([v.position for v in active]), 'vehicle', VEHICLE_COLOR)
+        return frame
+
+
+class FrameRecorder:
+    """Visualizer plugin that records every displayed frame instead of opening a window
+
+    Use it as the visualizer factory of a grid, for example
+    UrbanGrid(visualizer_factory=lambda grid: FrameRecorder(grid, "frames")).
+    """
+
+    def __init__(self, grid, output, cell_size=8, fps=10, every=1):
+        """Create a recorder
+
+        Args:
+            grid: The urban grid being recorded
+            output: Directory for a PNG sequence, or a video file path (.mp4, .gif, ...)
+                    which requires the optional imageio package
+            cell_size: Width and height of one cell in pixels
+            fps: Frame rate of video files
+            every: Record one frame out of this many update_display calls
+        """
+        self.renderer = RasterRenderer(grid.size, cell_size)
+        self.output = output
+        self.every = max(1, every)
+        self.frame_count = 0  # Number of frames written
+        self.update_count = 0  # Number of update_display calls
+        self.is_closed = False
+        self._writer = None
+
+        if output.lower().endswith(VIDEO_EXTENSIONS):
+            try:
+                import imageio
+            except ImportError as e:
+                raise ImportError("Recording video files requires imageio "
+                                  "(pip install imageio imageio-ffmpeg); "
+                                  "use a directory to record PNG frames instead") from e
+            self._writer = imageio.get_writer(output, fps=fps)
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    def update_display(self, grid, vehicles=None, obstacle_mode=False, congestion_mode=False):
+        """Render and record the current state (same signature as TkinterVisualizer)"""
+        if self.is_closed:
+            return
+        self.update_count += 1
+        if (self.update_count - 1) % self.every:
+            return
+        self.write_frame(self.renderer.render(grid, vehicles))
+
+    def write_frame(self, frame):
+        """Append one RGB frame to the recording"""
+        if self._writer is not None:
+            self._writer.append_data(frame)
+        else:
+            from matplotlib.image import imsave
+            imsave(os.path.join(self.output, f"frame_{self.frame_count:06d}.png"), frame)
+        self.frame_count += 1
+
+    def close(self):
+        """Finish the recording"""
+        if not self.is_closed:
+            if self._writer is not None:
+                self._writer.close()
+            self.is_closed = True
@@ -1,11 +1,17 @@
+import os
 import numpy as np
-import random
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from module.urban_grid import UrbanGrid
 from algorithm.agent import QLearningAgent
+from algorithm.q_table import DenseQTable, SharedDenseQTable
+from algorithm.experience_buffer import ExperienceBuffer
+from algorithm.reward_config import RewardConfig
 from vehicle import Vehicle
+from fleet import VehicleFleet
 
-def run_simulation(episodes=1000, visualize_interval=100, max_steps=200, show_plots=True, agent=None, reward_config=None):
+def run_simulation(episodes=1000, visualize_interval=100, max_steps=200, show_plots=True, agent=None, reward_config=None,
+                   q_table_backend="dict", seed=None, batch_updates=False, visualizer_factory=None,
+                   num_vehicles=5, fleet=False, path_guidance=False):
     """Run the full simulation
     
     Args:
@@ -15,82 +21,144 @@ def run_simulation(episodes=1000, visualize_interval=100, max_steps=200, show_pl
         show_plots: Whether to show plots (can be set to False to suppress all visualization)
         agent: Optional pre-existing agent to continue training (if None, creates a new agent)
         reward_config: Optional reward configuration object (if None, uses default)
+        q_table_backend: Q-table backend for a newly created agent ("dict", "dense" or
+                         "shared"; run_parallel_simulation passes agents with a shared
+                         table here)
+        seed: Optional seed (or numpy SeedSequence) for the grid's random stream, which
+              drives obstacles, vehicle positions and the agent's exploration
+        batch_updates: If True, the vehicles' transitions of each step are collected in an
+                       ExperienceBuffer and applied together after all vehicles moved
+        visualizer_factory: Optional visualizer plugin factory for the grid (e.g. a
+                            raster_renderer.FrameRecorder); its frames are produced at
+                            visualize_interval even when show_plots is False, and it is
+                            closed at the end of the run
+        num_vehicles: Number of vehicles in every episode
+        fleet: If True, the vehicles are simulated together by a VehicleFleet (NumPy
+               columns and one vectorized step) instead of one Vehicle object each;
+               meant for large populations
+        path_guidance: With fleet=True, whether vehicles plan A* paths for the path
+                       guidance reward terms; off by default because planning dominates
+                       the cost of a large fleet, so fleets train on a reward without
+                       those terms unless it is enabled
     """
     if agent is None:
         # Create new agent
         urban_grid = UrbanGrid(size=20)  # Changed map size from 10 to 20
-        agent = QLearningAgent(urban_grid)
+        agent = QLearningAgent(urban_grid, q_table_backend=q_table_backend)
     else:
         # Use existing agent's urban_grid
         urban_grid = agent.urban_grid
+    if seed is not None:
+        urban_grid.seed(seed)
+    if visualizer_factory is not None:
+        # The plugin replaces the grid's visualizer for this run only
+        previous_factory = urban_grid.visualizer_factory
+        previous_visualizer = urban_grid.visualizer
+        urban_grid.visualizer_factory = visualizer_factory
+        urban_grid.visualizer = None
+    experience_buffer = ExperienceBuffer() if batch_updates else None
+    if fleet and not path_guidance:
+        params = (reward_config if reward_config is not None else RewardConfig()).params
+        if params.algorithm != "exponential_distance" and any(
+                (params.astar_follow_reward, params.astar_on_path_reward, params.path_distance_base_reward)):
+            print("Warning: fleet path guidance is off, so the A* follow, on-path and path distance "
+                  "rewards of the configuration are not applied (use path_guidance=True or "
+                  "--path-guidance to include them)")
     
     # Statistics tracking
     episode_rewards = []
     episode_steps = []
     success_rate = []
     
-    for episode in range(episodes):
-        # Reset vehicle ID counter
-        Vehicle.next_id = 1
+    try:
+        for episode in range(episodes):
+            # Reset vehicle ID counter
+            Vehicle.next_id = 1
         
-        # Reset environment
-        urban_grid.reset_congestion()
+            # Reset environment
+            urban_grid.reset_congestion()
         
-        # Clear obstacles and add random ones (5% of grid)
-        urban_grid.obstacles = np.zeros((urban_grid.size, urban_grid.size), dtype=bool)
-        num_obstacles = int(0.05 * urban_grid.size * urban_grid.size)
-        for _ in range(num_obstacles):
-            x, y = random.randint(0, urban_grid.size-1), random.randint(0, urban_grid.size-1)
-            urban_grid.add_obstacle(x, y)
-        
-        # Create vehicles with random start/end positions
-        num_vehicles = 5
-        vehicles = []
-        for _ in range(num_vehicles):
-            vehicle = Vehicle(urban_grid, agent, reward_config=reward_config)
-            vehicles.append(vehicle)
-        
-        # Simulation loop
-        step = 0
-        all_reached = False
+            # Clear obstacles and add random ones (5% of grid)
+            urban_grid.obstacles = np.zeros((urban_grid.size, urban_grid.size), dtype=bool)
+            num_obstacles = int(0.05 * urban_grid.size * urban_grid.size)
+            for x, y in urban_grid.random_positions(num_obstacles):
+                urban_grid.add_obstacle(x, y)
         
-        # Determine if unlimited steps mode is used (max_steps=0 means unlimited steps)
-        unlimited_steps = (max_steps == 0)
+            # Create vehicles with random start/end positions
+            if fleet:
+                vehicles = VehicleFleet(urban_grid, agent, num_vehicles, reward_config=reward_config,
+                                        experience_buffer=experience_buffer, path_guidance=path_guidance)
+            else:
+                vehicles = []
+                for _ in range(num_vehicles):
+                    vehicle = Vehicle(urban_grid, agent, reward_config=reward_config,
+                                      experience_buffer=experience_buffer)
+                    vehicles.append(vehicle)
         
-        while not all_reached and (unlimited_steps or step < max_steps):
-            # Update environment
-            positions = [v.position for v in vehicles if not v.reached]
-            urban_grid.update_congestion(positions)
-            urban_grid.update_traffic_lights()
+            # Simulation loop
+            step = 0
+            all_reached = False
+        
+            # Determine if unlimited steps mode is used (max_steps=0 means unlimited steps)
+            unlimited_steps = (max_steps == 0)
+        
+            while not all_reached and (unlimited_steps or step < max_steps):
+                # Update environment
+                if fleet:
+                    positions = vehicles.active_positions()
+                else:
+                    positions = [v.position for v in vehicles if not v.reached]
+                urban_grid.update_congestion(positions)
+                urban_grid.update_traffic_lights()
             
-            # Move vehicles
-            for vehicle in vehicles:
-                if not vehicle.reached:
-                    vehicle.move()
+                # Move vehicles
+                if fleet:
+                    vehicles.step()
+                else:
+                    for vehicle in vehicles:
+                        if not vehicle.reached:
+                            vehicle.move()
+                if experience_buffer is not None:
+                    experience_buffer.flush(agent)
             
-            # Check if all vehicles reached destination
-            all_reached = all(v.reached for v in vehicles)
-            step += 1
+                # Check if all vehicles reached destination
+                all_reached = vehicles.all_reached if fleet else all(v.reached for v in vehicles)
+                step += 1
             
-            # Visualize if needed
-            if visualize_interval > 0 and (episode % visualize_interval == 0) and (step % 5 == 0):
-                urban_grid.visualize(vehicles, show_plot=show_plots)
-        
-        # Record episode statistics
-        episode_total_reward = sum(v.total_reward for v in vehicles)
-        episode_avg_steps = np.mean([v.steps for v in vehicles])
-        episode_success = sum(1 for v in vehicles if v.reached) / len(vehicles)
-        
-        episode_rewards.append(episode_total_reward)
-        episode_steps.append(episode_avg_steps)
-        success_rate.append(episode_success)
-        
-        if episode % 10 == 0:
-            print(f"Episode {episode}: Reward: {episode_total_reward:.2f}, "
-                  f"Steps: {episode_avg_steps:.2f}, Success Rate: {episode_success:.2f}")
+                # Visualize if needed
+                if visualize_interval > 0 and (episode % visualize_interval == 0) and (step % 5 == 0):
+                    urban_grid.visualize(vehicles, show_plot=show_plots or visualizer_factory is not None)
+        
+            # Record episode statistics
+            if fleet:
+                episode_total_reward = vehicles.total_rewards.sum()
+                episode_avg_steps = vehicles.steps.mean()
+                episode_success = vehicles.reached.mean()
+            else:
+                episode_total_reward = sum(v.total_reward for v in vehicles)
+                episode_avg_steps = np.mean([v.steps for v in vehicles])
+                episode_success = sum(1 for v in vehicles if v.reached) / len(vehicles)
+        
+            episode_rewards.append(episode_total_reward)
+            episode_steps.append(episode_avg_steps)
+            success_rate.append(episode_success)
+        
+            if episode % 10 == 0:
+                print(f"Episode {episode}: Reward: {episode_total_reward:.2f}, "
+                      f"Steps: {episode_avg_steps:.2f}, Success Rate: {episode_success:.2f}")
+    finally:
+        # Finish a recording and give the grid back its own visualizer and factory,
+        # also when the run is interrupted
+        if visualizer_factory is not None:
+            if urban_grid.visualizer is not None:
+                urban_grid.visualizer.close()
+            urban_grid.visualizer = previous_visualizer
+            urban_grid.visualizer_factory = previous_factory
     
     # Plot learning curves
     if show_plots:
+        import matplotlib.pyplot as plt
+        
         plt.figure(figsize=(15, 5))
         
         plt.subplot(131)
@@ -117,6 +185,66 @@ def run_simulation(episodes=1000, visualize_interval=100, max_steps=200, show_pl
     return agent
 
 
+def _run_simulation_worker(agent, episodes, max_steps, reward_config, seed, num_vehicles, fleet, path_guidance):
+    """Worker process entry point for run_parallel_simulation
+
+    The agent arrives with its shared Q-table attached by name and a private copy of
+    the urban grid, so every worker trains the same Q-values in its own environment.
+    """
+    run_simulation(episodes=episodes, visualize_interval=0, max_steps=max_steps, show_plots=False,
+                   agent=agent, reward_config=reward_config, seed=seed, num_vehicles=num_vehicles,
+                   fleet=fleet, path_guidance=path_guidance)
+    return episodes
+
+
+def run_parallel_simulation(episodes=1000, num_workers=None, max_steps=200, agent=None, reward_config=None,
+                            seed=None, num_vehicles=5, fleet=False, path_guidance=False):
+    """Train one agent with several processes running run_simulation concurrently
+
+    Workers update a shared-memory Q-table without locks (Hogwild-style), so the
+    episodes are split across all cores instead of running one after another.
+
+    Args:
+        episodes: Total number of episodes, split evenly across workers
+        num_workers: Number of worker processes (None uses all CPU cores)
+        max_steps: Maximum steps per episode (if 0, run until all vehicles reach destination)
+        agent: Optional agent to continue training (its Q-table must be "dense" or "shared";
+               a dense table is moved into shared memory)
+        reward_config: Optional reward configuration object (if None, uses default)
+        seed: Seed for the workers' random streams; each worker gets an independent child
+              stream spawned from it (None draws fresh entropy)
+        num_vehicles: Number of vehicles in every episode
+        fleet: Whether workers simulate their vehicles with a VehicleFleet
+        path_guidance: With fleet=True, whether the A* path guidance terms are used (off by default)
+
+    Returns:
+        The agent, whose shared Q-table holds the combined training of all workers
+    """
+    if agent is None:
+        agent = QLearningAgent(UrbanGrid(size=20), q_table_backend="shared")
+    elif not isinstance(agent.q_table, SharedDenseQTable):
+        if not isinstance(agent.q_table, DenseQTable):
+            raise ValueError("run_parallel_simulation requires an agent with q_table_backend='dense' or 'shared'")
+        agent.q_table = SharedDenseQTable.from_table(agent.q_table)
+        agent.q_table_backend = "shared"
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    worker_seeds = np.random.SeedSequence(seed).spawn(num_workers)
+    base, extra = divmod(episodes, num_workers)
+    worker_episodes = [base + (1 if i < extra else 0) for i in range(num_workers)]
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_run_simulation_worker, agent, count, max_steps, reward_config, worker_seeds[i],
+                                   num_vehicles, fleet, path_guidance)
+                   for i, count in enumerate(worker_episodes) if count > 0]
+        completed = sum(future.result() for future in futures)
+
+    print(f"Parallel training finished: {completed} episodes on {len(futures)} workers, "
+          f"{len(agent.q_table)} states visited")
+    return agent
+
+
 def test_incident_response(agent, num_tests=5, visualize=True, show_plot=True, max_steps=50, unlimited_steps=False):
     """Test how well agents avoid incidents after learning
     
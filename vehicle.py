@@ -1,14 +1,19 @@
-import random
-from algorithm.astar import astar, manhattan_distance
+import math
+from algorithm.astar import manhattan_distance
 from algorithm.reward_config import RewardConfig
+from algorithm.q_table import encode_state
+from algorithm.path_index import PathIndex
 
 class Vehicle:
     # Class variable to track vehicle IDs
     next_id = 1
     
-    def __init__(self, urban_grid, agent, position=None, destination=None, reward_config=None):
+    def __init__(self, urban_grid, agent, position=None, destination=None, reward_config=None,
+                 experience_buffer=None):
         self.urban_grid = urban_grid
         self.agent = agent
+        # If set, transitions are collected here and applied in batches instead of per move
+        self.experience_buffer = experience_buffer
         
         # Initialize reward configuration
         self.reward_config = reward_config if reward_config is not None else RewardConfig()
@@ -17,10 +22,11 @@ class Vehicle:
         self.id = Vehicle.next_id
         Vehicle.next_id += 1
         
-        # Random positions if not specified
+        # Random positions if not specified (drawn from the grid's random stream)
+        rng = urban_grid.rng
         if position is None:
-            self.position = (random.randint(0, urban_grid.size-1), 
-                           random.randint(0, urban_grid.size-1))
+            x, y = rng.integers(0, urban_grid.size, 2)
+            self.position = (int(x), int(y))
         else:
             self.position = position
             
@@ -28,26 +34,22 @@ class Vehicle:
         self.start_position = self.position
             
         if destination is None:
-            self.destination = (random.randint(0, urban_grid.size-1), 
-                             random.randint(0, urban_grid.size-1))
+            x, y = rng.integers(0, urban_grid.size, 2)
+            self.destination = (int(x), int(y))
             # Make sure destination is different from position
             while self.destination == self.position:
-                self.destination = (random.randint(0, urban_grid.size-1), 
-                                 random.randint(0, urban_grid.size-1))
+                x, y = rng.integers(0, urban_grid.size, 2)
+                self.destination = (int(x), int(y))
         else:
             self.destination = destination
             
-        # Share destination with agent for better state representation
+        # Share destination with agent for callers that build states without a vehicle
+        # (the vehicle itself passes its own destination to get_state_key)
         self.agent.current_destination = self.destination
             
-        # Calculate optimal path using A*
-        self.optimal_path = astar(
-            self.position,
-            self.destination,
-            self.urban_grid.size,
-            self.urban_grid.obstacles,
-            self.urban_grid.congestion
-        )
+        # Calculate optimal path using A* (cached by the grid's path planner)
+        self.optimal_path = self.urban_grid.get_path_planner().plan(self.position, self.destination)
+        self._path_index = None  # Built lazily for the current optimal path
         
         self.path = [self.position]
         self.reached = False
@@ -60,20 +62,19 @@ class Vehicle:
         self.loop_penalty_applied = {}  # {position: bool} Track whether loop penalty has been applied to a specific position
     
     def update_optimal_path(self):
-        """Update A* path based on current traffic conditions"""
+        """Update A* path based on current traffic conditions
+        
+        The grid's path planner reuses the previous path when obstacle and congestion
+        changes since it was planned cannot affect it.
+        """
         if not self.reached:
-            self.optimal_path = astar(
-                self.position,
-                self.destination,
-                self.urban_grid.size,
-                self.urban_grid.obstacles,
-                self.urban_grid.congestion
-            )
+            self.optimal_path = self.urban_grid.get_path_planner().plan(self.position, self.destination)
     
     def move(self):
         """Move the vehicle using hybrid A* and Q-learning approach"""
         if self.reached:
             return 0  # Already reached destination
+        params = self.reward_config.params
             
         # Update optimal path every 10 steps or when no path exists
         if self.steps % 10 == 0 or not self.optimal_path:
@@ -81,10 +82,10 @@ class Vehicle:
         
         # Get current state
         congestion_level = self.urban_grid.get_congestion_window(self.position[0], self.position[1])
-        state = self.agent.get_state_key(self.position, congestion_level)
+        state = self.agent.get_state_key(self.position, congestion_level, self.destination)
         
         # Choose action with A* guidance
-        action_idx = self.agent.choose_action(state, self.position)
+        action_idx = self.agent.choose_action(state, self.position, rng=self.urban_grid.rng)
         dx, dy = self.agent.actions[action_idx]
         new_position = (self.position[0] + dx, self.position[1] + dy)
         
@@ -103,21 +104,21 @@ class Vehicle:
         # Handle traffic lights (only if within bounds)
         x, y = new_position
         can_move = True
-        if (0 <= x < self.urban_grid.size and 0 <= y < self.urban_grid.size and 
-            self.urban_grid.traffic_lights[x, y] > 0):
+        light = self.urban_grid.get_traffic_light(x, y) if (0 <= x < self.urban_grid.size and 
+                                                            0 <= y < self.urban_grid.size) else 0
+        if light > 0:
             # Check if moving against red light
             # If moving North-South (dy != 0) and EW is green (state = 2)
             # Or if moving East-West (dx != 0) and NS is green (state = 1)
-            if (dy != 0 and self.urban_grid.traffic_lights[x, y] == 2) or \
-               (dx != 0 and self.urban_grid.traffic_lights[x, y] == 1):
+            if (dy != 0 and light == 2) or (dx != 0 and light == 1):
                 # Stop and wait for the light to change
                 can_move = False
-                reward += self.reward_config.get_traffic_light_penalty()  # Waiting penalty
+                reward += params.red_light_wait_penalty  # Waiting penalty
                 
         if can_move:
             # Check if destination reached
             if new_position == self.destination:
-                reward += self.reward_config.get_destination_reward()  # Destination reward
+                reward += params.destination_reached_reward  # Destination reward
                 self.reached = True
             
             # Update position and path
@@ -129,19 +130,17 @@ class Vehicle:
         self.steps += 1
         
         # Detect loops
-        loop_config = self.reward_config.get_loop_config()
         if self.position in self.position_history:
             self.position_history[self.position] += 1
             
             # Calculate threshold: adjust loop threshold based on map size, smaller maps use smaller threshold
-            loop_threshold = max(loop_config['threshold_base'], 
-                               min(loop_config['threshold_max'], self.urban_grid.size // 5))
+            loop_threshold = params.loop_threshold(self.urban_grid.size)
             
             # If we've visited the same position more than threshold times and haven't applied a loop penalty
             if self.position_history[self.position] > loop_threshold and not self.position in self.loop_penalty_applied:
                 # Apply loop penalty
-                loop_penalty = loop_config['penalty_base'] * (self.position_history[self.position] - loop_threshold)
-                loop_penalty = max(loop_config['penalty_max'], loop_penalty)  # Limit maximum penalty
+                loop_penalty = params.loop_penalty_base * (self.position_history[self.position] - loop_threshold)
+                loop_penalty = max(params.loop_penalty_max, loop_penalty)  # Limit maximum penalty
                 reward += loop_penalty
                 self.loop_penalty_applied[self.position] = True
                 
@@ -154,31 +153,44 @@ class Vehicle:
         
         # Get new state
         new_congestion_level = self.urban_grid.get_congestion_window(self.position[0], self.position[1])
-        new_state = self.agent.get_state_key(self.position, new_congestion_level)
+        new_state = self.agent.get_state_key(self.position, new_congestion_level, self.destination)
         
         # Update Q-table
-        self.agent.update_q_table(state, action_idx, reward, new_state)
+        if self.experience_buffer is not None:
+            size = self.urban_grid.size
+            self.experience_buffer.add(encode_state(state, size), action_idx, reward, encode_state(new_state, size))
+        else:
+            self.agent.update_q_table(state, action_idx, reward, new_state)
         
         return reward
     
+    def get_path_index(self):
+        """Get the lookup index of the current optimal path, rebuilding it after a replan"""
+        # The distance field stops where the path distance reward drops to zero
+        max_distance = self.reward_config.params.path_reward_max_distance
+        
+        index = self._path_index
+        if index is None or index.path is not self.optimal_path or (
+                max_distance is not None and index.max_distance != max_distance):
+            index = PathIndex(self.optimal_path, self.urban_grid.size, max_distance)
+            self._path_index = index
+        return index
+    
     def get_remaining_optimal_path(self):
         """Get the remaining optimal path from current position"""
         if not self.optimal_path:
             return []
-        try:
-            current_index = self.optimal_path.index(self.position)
+        current_index = self.get_path_index().first_index.get(self.position)
+        if current_index is not None:
             return self.optimal_path[current_index:]
-        except ValueError:
-            # If current position is not in optimal path, recalculate
-            self.update_optimal_path()
-            return self.optimal_path if self.optimal_path else []
+        # If current position is not in optimal path, recalculate
+        self.update_optimal_path()
+        return self.optimal_path if self.optimal_path else []
     
     def calculate_reward(self, new_position, dx, dy):
         """Calculate reward using the selected algorithm"""
         # Calculate base reward using selected algorithm
-        algorithm_type = self.reward_config.get_algorithm_type()
-        
-        if algorithm_type == "exponential_distance":
+        if self.reward_config.params.algorithm == "exponential_distance":
             reward = self.calculate_reward_exponential_distance(new_position, dx, dy)
         else:  # proximity_based algorithm (default)
             reward = self.calculate_reward_proximity_based(new_position, dx, dy)
@@ -190,22 +202,23 @@ class Vehicle:
     
     def calculate_reward_proximity_based(self, new_position, dx, dy):
         """Calculate reward using the proximity-based algorithm (original algorithm)"""
-        reward = self.reward_config.get_step_penalty()  # Step penalty
+        params = self.reward_config.params
+        reward = params.step_penalty  # Step penalty
         
         # A* path following reward
-        astar_rewards = self.reward_config.get_astar_rewards()
+        path_index = self.get_path_index()
         if self.optimal_path and len(self.optimal_path) > 1:
             next_optimal = self.optimal_path[1]  # Next position in optimal path
             if new_position == next_optimal:
-                reward += astar_rewards['follow']  # Strong reward for following A* path
-            elif new_position in self.optimal_path:
-                reward += astar_rewards['on_path']  # Moderate reward for being on optimal path
+                reward += params.astar_follow_reward  # Strong reward for following A* path
+            elif new_position in path_index:
+                reward += params.astar_on_path_reward  # Moderate reward for being on optimal path
         
         # Distance-based reward component
         current_dist = manhattan_distance(self.position, self.destination)
         new_dist = manhattan_distance(new_position, self.destination)
         if new_dist < current_dist:
-            reward += self.reward_config.get_distance_reward()  # Reward for getting closer to destination
+            reward += params.closer_to_destination_reward  # Reward for getting closer to destination
         
         # --- Proximity reward: the closer to the destination, the higher the reward ---
         def manhattan_dist(a, b):
@@ -217,27 +230,22 @@ class Vehicle:
         
         # Scale proximity reward based on distance to destination
         # The closer to destination, the higher the reward multiplier
-        proximity_config = self.reward_config.get_proximity_config()
         max_possible_dist = self.urban_grid.size * 2  # Maximum possible Manhattan distance
         progress = 1 - (new_dist / max_possible_dist)  # 0 when furthest, 1 when at destination
-        proximity_multiplier = proximity_config['base_multiplier'] + (proximity_config['max_multiplier'] * progress)
+        proximity_multiplier = params.proximity_base_multiplier + (params.proximity_max_multiplier * progress)
         reward += proximity_reward * proximity_multiplier
         # --- End proximity reward ---
         
         # --- A* path following reward ---
-        path_config = self.reward_config.get_path_distance_config()
-        if self.optimal_path:
-            # Find the nearest point on optimal path
-            min_dist_to_path = float('inf')
-            path_progress = 0
-            for i, path_point in enumerate(self.optimal_path):
-                dist_to_point = manhattan_dist(new_position, path_point)
-                if dist_to_point < min_dist_to_path:
-                    min_dist_to_path = dist_to_point
-                    path_progress = i / len(self.optimal_path)
+        # Nearest point on optimal path from the precomputed distance field
+        # (None beyond the distance at which the reward drops to zero)
+        nearest = path_index.nearest(new_position) if self.optimal_path else None
+        if nearest is not None:
+            min_dist_to_path, nearest_index = nearest
+            path_progress = nearest_index / path_index.length
             
             # Reward for being close to optimal path
-            path_reward = max(0, path_config['base_reward'] - min_dist_to_path * path_config['penalty_multiplier'])
+            path_reward = max(0, params.path_distance_base_reward - min_dist_to_path * params.path_distance_penalty_multiplier)
             # Scale reward based on progress along path
             path_reward *= (1 + path_progress)  # Higher reward for later parts of path
             reward += path_reward
@@ -249,20 +257,18 @@ class Vehicle:
         """Calculate reward using the exponential distance algorithm
         Formula: r = base_reward + multiplier × exp(-(|xi-xd|/x_scale + |yi-yd|/y_scale))
         """
-        import math
-        
-        exp_config = self.reward_config.get_exponential_distance_config()
+        params = self.reward_config.params
         
         # Calculate distance components
         x_dist = abs(new_position[0] - self.destination[0])
         y_dist = abs(new_position[1] - self.destination[1])
         
         # Calculate normalized distance
-        normalized_dist = x_dist / exp_config['x_scale'] + y_dist / exp_config['y_scale']
+        normalized_dist = x_dist / params.exp_x_scale + y_dist / params.exp_y_scale
         
         # Calculate exponential reward
-        exp_reward = 40 * math.exp(-normalized_dist) # exp_config['multiplier'] * math.exp(-normalized_dist)
-        reward = -1 + exp_reward # exp_config['base_reward'] + exp_reward
+        exp_reward = 40 * math.exp(-normalized_dist) # params.exp_amplitude * math.exp(-normalized_dist)
+        reward = -1 + exp_reward # params.exp_base_reward + exp_reward
         
         return reward
     
@@ -277,23 +283,22 @@ class Vehicle:
             return -50
         
         # Congestion penalties
-        congestion_config = self.reward_config.get_congestion_config()
-        congestion_at_new_pos = self.urban_grid.congestion[new_position]
-        if congestion_at_new_pos > congestion_config['threshold']:  # High congestion threshold
-            total_modifier -= congestion_config['penalty_multiplier'] * congestion_at_new_pos
+        params = self.reward_config.params
+        congestion_at_new_pos = self.urban_grid.congestion_at(*new_position)
+        if congestion_at_new_pos > params.high_congestion_threshold:  # High congestion threshold
+            total_modifier -= params.congestion_penalty_multiplier * congestion_at_new_pos
         
         # Enhanced backward movement prevention
-        backward_penalties = self.reward_config.get_backward_movement_penalties()
         if len(self.path) > 1:
             # Check for immediate backtracking
             if new_position == self.path[-2]:
-                total_modifier += backward_penalties['immediate_backtrack']  # Penalty for immediate backtracking
+                total_modifier += params.immediate_backtrack_penalty  # Penalty for immediate backtracking
                 
             # Check for oscillating behavior (moving back and forth)
             if len(self.path) > 3:
                 if new_position == self.path[-3]:  # Moving back to position from 2 steps ago
-                    total_modifier += backward_penalties['oscillation']  # Penalty for oscillation
+                    total_modifier += params.oscillation_penalty  # Penalty for oscillation
                 if len(self.path) > 5 and new_position == self.path[-5]:  # Check longer oscillation patterns
-                    total_modifier += backward_penalties['long_oscillation']  # Penalty for longer oscillillation patterns
+                    total_modifier += params.long_oscillation_penalty  # Penalty for longer oscillillation patterns
         
         return total_modifier
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import Canvas, Frame, Label, ttk
-import random
-from matplotlib.colors import LinearSegmentedColormap
+import numpy as np
+from module.colors import congestion_hex_lut, congestion_hex_indices, CONGESTION_LEVELS
 
 class TkinterVisualizer:
     def __init__(self, grid_size=20, cell_size=30):  # Optimized cell size for better fit
@@ -47,34 +47,379 @@ class TkinterVisualizer:
         self.status_label = Label(self.info_frame, text="Status: Ready", font=("Arial", 10))
         self.status_label.pack(side=tk.LEFT, padx=10)
         
-        # Create colormap for congestion visualization
-        self.congestion_colors = self._create_congestion_colormap()
+        # Quantized congestion colors, shared with the raster renderer
+        self.congestion_lut = congestion_hex_lut()
+        
+        # Grid size the retained canvas layers were built for (built on the first frame)
+        self._layout_size = None
+        self._mode = None
         
         # Flag to track if window is closed
         self.is_closed = False
         
-    def _create_congestion_colormap(self):
-        """Create a colormap for congestion levels (yellow to orange to red)"""
-        colors = [(1, 1, 0.7), (1, 0.7, 0), (0.8, 0, 0)]  # Yellow to orange to red
-        return LinearSegmentedColormap.from_list('congestion_cmap', colors)
-    
     def _get_congestion_color(self, level):
-        """Convert congestion level to a color"""
-        if level < 0.1:
-            return '#d9d9d9'  # Light gray for very low congestion
-        
-        rgba = self.congestion_colors(level)
-        r, g, b = int(rgba[0]*255), int(rgba[1]*255), int(rgba[2]*255)
-        return f'#{r:02x}{g:02x}{b:02x}'
+        """Convert congestion level to a color (light gray for very low congestion)"""
+        return self.congestion_lut[congestion_hex_indices(level)]
     
-    def _get_building_color(self):
-        """Generate a random building color"""
-        shade = int(100 + random.random() * 100)  # Shade of gray (100-200)
+    def _get_building_color(self, i, j):
+        """Get the gray shade of the building block at a cell (fixed for the visualizer's lifetime)"""
+        shade = int(self._building_shades[i, j])  # Shade of gray (100-200)
         return f'#{shade:02x}{shade:02x}{shade:02x}'
     
+    def _cell_center(self, i, j, size):
+        """Canvas coordinates of the center of a grid cell"""
+        x = i * self.cell_size + self.margin
+        y = (size - 1 - j) * self.cell_size + self.margin  # Invert y for proper orientation
+        return x, y
+    
+    def _place_in_layer(self, items, layer):
+        """Move newly created items to the top of a layer, below every later layer"""
+        for item in items:
+            self.canvas.tag_lower(item, self._layer_markers[layer])
+    
+    def _build_static_layers(self, grid):
+        """Create the canvas items that persist between frames
+        
+        Buildings and roads never change. Congestion overlays, congestion labels and grid
+        indicators get one (initially hidden) item per cell that later frames reconfigure.
+        Obstacles and traffic lights are created per cell when they first appear, inside
+        their own layer, so the stacking order does not depend on when items are created.
+        """
+        self.canvas.delete("all")
+        size = grid.size
+        cs = self.cell_size
+        road_width = cs / 6  # Increased road width for better visibility
+        self._layout_size = size
+        self._mode = None
+        self._building_shades = np.random.default_rng(size).integers(100, 201, size=(size, size))
+        self._layer_markers = {}
+        
+        def marker(layer):
+            self._layer_markers[layer] = self.canvas.create_line(0, 0, 0, 0, state='hidden')
+        
+        # Grid indicators shown in obstacle mode and congestion mode
+        self._indicator_items = np.empty((size, size), dtype=object)
+        for i in range(size):
+            for j in range(size):
+                x, y = self._cell_center(i, j, size)
+                self._indicator_items[i, j] = self.canvas.create_rectangle(
+                    x - cs/2, y - cs/2, x + cs/2, y + cs/2,
+                    outline='gray70', dash=(4, 4), width=1, fill='', state='hidden', tags="indicator"
+                )
+        
+        # Building blocks (in each grid corner), with a slight offset to create a depth effect
+        for i in range(1, size):
+            for j in range(1, size):
+                x, y = self._cell_center(i, j, size)
+                self.canvas.create_rectangle(
+                    x - cs + 8, y + 8, x - 8, y + cs - 8,
+                    fill=self._get_building_color(i, j), outline='gray20', width=1, tags="building"
+                )
+        
+        # Roads: base and surface layers of the horizontal and vertical segment
+        for i in range(size):
+            for j in range(size):
+                x, y = self._cell_center(i, j, size)
+                self.canvas.create_rectangle(x - cs/2, y - road_width, x + cs/2, y + road_width,
+                                             fill='#222222', outline='', tags="road")
+                self.canvas.create_rectangle(x - cs/2 + 2, y - road_width + 2, x + cs/2 - 2, y + road_width - 2,
+                                             fill='#444444', outline='', tags="road")
+                self.canvas.create_rectangle(x - road_width, y - cs/2, x + road_width, y + cs/2,
+                                             fill='#222222', outline='', tags="road")
+                self.canvas.create_rectangle(x - road_width + 2, y - cs/2 + 2, x + road_width - 2, y + cs/2 - 2,
+                                             fill='#444444', outline='', tags="road")
+        
+        # Congestion overlays for both road segments of every cell
+        self._congestion_items = np.empty((size, size, 2), dtype=object)
+        for i in range(size):
+            for j in range(size):
+                x, y = self._cell_center(i, j, size)
+                self._congestion_items[i, j, 0] = self.canvas.create_rectangle(
+                    x - cs/2 + 2, y - road_width + 2, x + cs/2 - 2, y + road_width - 2,
+                    outline='', stipple='gray50', state='hidden', tags="congestion"
+                )
+                self._congestion_items[i, j, 1] = self.canvas.create_rectangle(
+                    x - road_width + 2, y - cs/2 + 2, x + road_width - 2, y + cs/2 - 2,
+                    outline='', stipple='gray50', state='hidden', tags="congestion"
+                )
+        
+        marker("obstacles")
+        marker("lights")
+        
+        # Congestion values shown in congestion mode
+        self._congestion_text_items = np.empty((size, size), dtype=object)
+        for i in range(size):
+            for j in range(size):
+                x, y = self._cell_center(i, j, size)
+                self._congestion_text_items[i, j] = self.canvas.create_text(
+                    x, y - road_width - 8, text="", font=("Arial", 8), fill='red',
+                    state='hidden', tags="congestion_text"
+                )
+        
+        # What the canvas currently shows, compared against the grid on every frame
+        self._drawn_congestion = np.full((size, size), np.nan)  # Values shown by the labels
+        self._drawn_congestion_index = np.full((size, size), -1)  # Color table index of the overlays
+        self._drawn_obstacles = np.zeros((size, size), dtype=bool)
+        self._drawn_lights = np.zeros((size, size), dtype=int)
+        self._obstacle_items = {}  # {(i, j): [item ids]}
+        self._light_items = {}  # {(i, j): (ns_glow, ns_light, ew_glow, ew_light)}
+    
+    def _set_mode(self, mode):
+        """Switch between the normal, obstacle and congestion display modes"""
+        self._mode = mode
+        if mode == 'normal':
+            self.canvas.itemconfigure("indicator", state='hidden')
+        else:
+            grid_color = 'gray70' if mode == 'obstacle' else 'lightblue'
+            self.canvas.itemconfigure("indicator", state='normal', outline=grid_color)
+        
+        # Obstacles look different in obstacle mode and labels only show in congestion mode,
+        # so redraw both from scratch
+        self.canvas.delete("obstacle")
+        self._obstacle_items = {}
+        self._drawn_obstacles[:] = False
+        self.canvas.itemconfigure("congestion_text", state='hidden')
+        self._drawn_congestion[:] = np.nan
+    
+    def _update_congestion(self, grid):
+        """Reconfigure the overlays of cells whose congestion color changed
+        
+        The whole congestion array is mapped to color table indices at once; only
+        cells whose index changed are reconfigured. Labels are updated in congestion
+        mode only.
+        """
+        congestion = grid.congestion
+        indices = congestion_hex_indices(congestion)
+        for i, j in zip(*np.nonzero(indices != self._drawn_congestion_index)):
+            horizontal, vertical = self._congestion_items[i, j]
+            index = indices[i, j]
+            if index == CONGESTION_LEVELS:  # Low congestion: plain road
+                self.canvas.itemconfigure(horizontal, state='hidden')
+                self.canvas.itemconfigure(vertical, state='hidden')
+            else:
+                fill = self.congestion_lut[index]
+                self.canvas.itemconfigure(horizontal, state='normal', fill=fill)
+                self.canvas.itemconfigure(vertical, state='normal', fill=fill)
+        self._drawn_congestion_index = indices
+        
+        if self._mode == 'congestion':
+            for i, j in zip(*np.nonzero(congestion != self._drawn_congestion)):
+                level = congestion[i, j]
+                text_item = self._congestion_text_items[i, j]
+                if level > 0.1:
+                    self.canvas.itemconfigure(text_item, state='normal', text=f"{level:.2f}")
+                else:
+                    self.canvas.itemconfigure(text_item, state='hidden')
+            self._drawn_congestion = congestion.copy()
+    
+    def _create_obstacle(self, i, j, size):
+        """Create the items of one obstacle in the current mode"""
+        x, y = self._cell_center(i, j, size)
+        cs = self.cell_size
+        tags = "obstacle"
+        if self._mode == 'obstacle':
+            # Enhanced appearance in obstacle mode: red circle with X mark
+            return [
+                self.canvas.create_oval(x - cs/3, y - cs/3, x + cs/3, y + cs/3,
+                                        fill='#ff6666', outline='red', width=2, tags=tags),
+                self.canvas.create_line(x - cs/4, y - cs/4, x + cs/4, y + cs/4,
+                                        fill='black', width=2, tags=tags),
+                self.canvas.create_line(x - cs/4, y + cs/4, x + cs/4, y - cs/4,
+                                        fill='black', width=2, tags=tags),
+            ]
+        # Normal X mark with a caution circle
+        return [
+            self.canvas.create_line(x - cs/5, y - cs/5, x + cs/5, y + cs/5, fill='red', width=3, tags=tags),
+            self.canvas.create_line(x - cs/5, y + cs/5, x + cs/5, y - cs/5, fill='red', width=3, tags=tags),
+            self.canvas.create_oval(x - cs/3, y - cs/3, x + cs/3, y + cs/3, outline='orange', width=2, tags=tags),
+        ]
+    
+    def _update_obstacles(self, grid):
+        """Create or delete the items of cells whose obstacle state changed"""
+        obstacles = grid.obstacles
+        for i, j in zip(*np.nonzero(obstacles != self._drawn_obstacles)):
+            cell = (int(i), int(j))
+            if obstacles[i, j]:
+                items = self._create_obstacle(i, j, grid.size)
+                self._place_in_layer(items, "obstacles")
+                self._obstacle_items[cell] = items
+            else:
+                for item in self._obstacle_items.pop(cell, []):
+                    self.canvas.delete(item)
+        self._drawn_obstacles = obstacles.copy()
+    
+    def _create_traffic_light(self, i, j, size):
+        """Create the box and lights of one traffic light, returning the light items"""
+        x, y = self._cell_center(i, j, size)
+        cs = self.cell_size
+        tags = ("traffic_light", f"traffic_light_{i}_{j}")
+        
+        # Traffic light box shadow and box with metallic effect
+        box = [
+            self.canvas.create_rectangle(x - cs/6 + 2, y - cs/6 + 2, x + cs/6 + 2, y + cs/6 + 2,
+                                         fill='#404040', outline='', tags=tags),
+            self.canvas.create_rectangle(x - cs/6, y - cs/6, x + cs/6, y + cs/6,
+                                         fill='#808080', outline='#606060', width=2, tags=tags),
+        ]
+        
+        # Light size and spacing
+        light_radius = max(4, min(8, cs/10))
+        light_spacing = light_radius * 2.5
+        lights = (
+            # North-South glow and light
+            self.canvas.create_oval(x - light_radius - 1, y - light_spacing - 1,
+                                    x + light_radius + 1, y - light_spacing + 2*light_radius + 1,
+                                    fill='#004400', outline='', tags=tags),
+            self.canvas.create_oval(x - light_radius, y - light_spacing,
+                                    x + light_radius, y - light_spacing + 2*light_radius, tags=tags),
+            # East-West glow and light
+            self.canvas.create_oval(x + light_spacing - light_radius - 1, y - light_radius - 1,
+                                    x + light_spacing + light_radius + 1, y + light_radius + 1,
+                                    fill='#004400', outline='', tags=tags),
+            self.canvas.create_oval(x + light_spacing - light_radius, y - light_radius,
+                                    x + light_spacing + light_radius, y + light_radius, tags=tags),
+        )
+        self._place_in_layer(box + list(lights), "lights")
+        return lights
+    
+    def _update_traffic_lights(self, grid):
+        """Recolor the traffic lights whose state changed"""
+        states = grid.traffic_lights
+        for i, j in zip(*np.nonzero(states != self._drawn_lights)):
+            cell = (int(i), int(j))
+            state = states[i, j]
+            if state == 0:
+                self.canvas.delete(f"traffic_light_{i}_{j}")
+                self._light_items.pop(cell, None)
+                continue
+            if cell not in self._light_items:
+                self._light_items[cell] = self._create_traffic_light(i, j, grid.size)
+            ns_glow, ns_light, ew_glow, ew_light = self._light_items[cell]
+            ns_green = state == 1  # North-South green (East-West red), otherwise the reverse
+            self.canvas.itemconfigure(ns_glow, state='normal' if ns_green else 'hidden')
+            self.canvas.itemconfigure(ew_glow, state='hidden' if ns_green else 'normal')
+            green, red = dict(fill='#00ff00', outline='#008800'), dict(fill='#ff0000', outline='#800000')
+            self.canvas.itemconfigure(ns_light, **(green if ns_green else red))
+            self.canvas.itemconfigure(ew_light, **(red if ns_green else green))
+        self._drawn_lights = states.copy()
+    
+    def _draw_vehicles(self, grid):
+        """Redraw the vehicle layer (paths, vehicles, destinations and start markers)"""
+        self.canvas.delete("vehicles")
+        if not getattr(grid, 'vehicles', None):
+            return
+        size = grid.size
+        tags = "vehicles"
+        
+        # Optimal paths (light blue dotted line offset to the right)
+        for vehicle in grid.vehicles:
+            if not vehicle.reached:
+                optimal_path = vehicle.get_remaining_optimal_path()
+                if optimal_path and len(optimal_path) > 1:
+                    # Offset the optimal path significantly to the right to avoid overlap
+                    path_coords = []
+                    for px, py in optimal_path:
+                        cx, cy = self._cell_center(px, py, size)
+                        path_coords.extend([cx + 8, cy])
+                    self.canvas.create_line(
+                        path_coords,
+                        fill='#87CEEB',  # Sky blue color for better distinction
+                        width=2,
+                        dash=(3, 6),  # Different dash pattern for distinction
+                        tags=tags
+                    )
+        
+        for v in grid.vehicles:
+            if not hasattr(v, 'position') or not hasattr(v, 'destination'):
+                continue
+            
+            vx, vy = self._cell_center(v.position[0], v.position[1], size)
+            
+            # Draw actual path taken (green dotted line with larger offset to the left)
+            if hasattr(v, 'path') and len(v.path) > 1:
+                for p1, p2 in zip(v.path[:-1], v.path[1:]):
+                    x1, y1 = self._cell_center(p1[0], p1[1], size)
+                    x2, y2 = self._cell_center(p2[0], p2[1], size)
+                    self.canvas.create_line(
+                        x1 - 8, y1, x2 - 8, y2,
+                        fill='#4CAF50',  # Medium green color
+                        width=2,
+                        dash=(6, 3),  # Different dash pattern from optimal path
+                        tags=tags
+                    )
+            
+            # Car shadow (for depth effect)
+            self.canvas.create_rectangle(
+                vx - self.cell_size/6 + 2, vy - self.cell_size/10 + 2,
+                vx + self.cell_size/6 + 2, vy + self.cell_size/10 + 2,
+                fill='#000033', outline='', tags=tags
+            )
+            
+            # Car body with outline
+            self.canvas.create_rectangle(
+                vx - self.cell_size/6, vy - self.cell_size/10,
+                vx + self.cell_size/6, vy + self.cell_size/10,
+                fill='#0066cc', outline='#003366', width=1, tags=tags
+            )
+            
+            # Car windows with slight depth effect
+            self.canvas.create_rectangle(
+                vx - self.cell_size/12, vy - self.cell_size/15,
+                vx + self.cell_size/12, vy + self.cell_size/15,
+                fill='#99ccff', outline='#6699cc', width=1, tags=tags
+            )
+            
+            # Display vehicle ID with better visibility
+            self.canvas.create_text(
+                vx, vy,
+                text=str(v.id),
+                font=("Arial", max(10, int(self.cell_size/4))),
+                fill='white', tags=tags
+            )
+            
+            # Star shape for destination - yellow if reached, green otherwise
+            dx, dy = self._cell_center(v.destination[0], v.destination[1], size)
+            star_color = 'yellow' if v.reached else 'limegreen'
+            self.canvas.create_text(
+                dx, dy,
+                text="★",
+                font=("Arial", int(self.cell_size/2)),
+                fill=star_color, tags=tags)
+            
+            # Display destination ID
+            self.canvas.create_text(
+                dx, dy + self.cell_size/4,
+                text=str(v.id),
+                font=("Arial", int(self.cell_size/4)),
+                fill='black', tags=tags
+            )
+            
+            # Display start position
+            sx = v.start_position[0] * self.cell_size
+            sy = (size - 1 - v.start_position[1]) * self.cell_size
+            
+            # Draw start position marker (circle)
+            self.canvas.create_oval(
+                sx - self.cell_size/6, sy - self.cell_size/6,
+                sx + self.cell_size/6, sy + self.cell_size/6,
+                fill='orange', outline='black', tags=tags
+            )
+            
+            # Display start position ID
+            self.canvas.create_text(
+                sx, sy,
+                text=str(v.id),
+                font=("Arial", int(self.cell_size/4)),
+                fill='black', tags=tags
+            )
+    
     def update_display(self, grid, vehicles=None, obstacle_mode=False, congestion_mode=False):
         """Update the display with current grid state
         
+        The canvas is retained between frames: static layers are created once per grid
+        size, and only the cells whose congestion, obstacle or traffic light state changed
+        since the last frame are reconfigured. Vehicles are redrawn every frame.
+        
         Args:
             grid: The urban grid to display
             vehicles: Optional list of vehicles to display (if None, uses grid.vehicles)
@@ -83,318 +428,21 @@ class TkinterVisualizer:
         """
         if self.is_closed:
             return
-            
-        # Clear canvas
-        self.canvas.delete("all")
         
         # Use vehicles from parameter if provided, otherwise use grid.vehicles
         if vehicles is not None:
             grid.vehicles = vehicles
         
-        # Draw the city grid
-        for i in range(grid.size):
-            for j in range(grid.size):
-                x = i * self.cell_size + self.margin
-                y = (grid.size - 1 - j) * self.cell_size + self.margin  # Invert y for proper orientation
-                
-                # Draw grid indicators when in obstacle mode or congestion mode
-                if obstacle_mode or congestion_mode:
-                    # Draw light grid borders
-                    grid_color = 'gray70' if obstacle_mode else 'lightblue'
-                    self.canvas.create_rectangle(
-                        x - self.cell_size/2, y - self.cell_size/2,
-                        x + self.cell_size/2, y + self.cell_size/2,
-                        outline=grid_color, dash=(4, 4), width=1, fill=''
-                    )
-                
-                # Draw building block (in each grid corner)
-                if i > 0 and j > 0:
-                    building_color = self._get_building_color()
-                    # Add slight offset to buildings to create depth effect
-                    self.canvas.create_rectangle(
-                        x - self.cell_size + 8, y + 8, 
-                        x - 8, y + self.cell_size - 8,
-                        fill=building_color,
-                        outline='gray20',
-                        width=1
-                    )
-                
-                # Draw roads with better visibility
-                # Base road layers (slightly wider)
-                road_width = self.cell_size/6  # Increased road width for better visibility
-                congestion_color = self._get_congestion_color(grid.congestion[i, j])
-                
-                # Draw optimal paths for vehicles if available (light blue dotted line offset to the right)
-                if i == 0 and j == 0:  # Only draw paths once per frame, not for each grid cell
-                    for vehicle in grid.vehicles:
-                        if not vehicle.reached:
-                            optimal_path = vehicle.get_remaining_optimal_path()
-                            if optimal_path and len(optimal_path) > 1:
-                                # Convert path coordinates to canvas coordinates with offset
-                                path_coords = []
-                                for px, py in optimal_path:
-                                    # Offset the optimal path significantly to the right to avoid overlap
-                                    cx = px * self.cell_size + self.margin + 8
-                                    cy = (grid.size - 1 - py) * self.cell_size + self.margin
-                                    path_coords.extend([cx, cy])
-                                
-                                # Draw dotted line for optimal path (light blue, thinner)
-                                if len(path_coords) >= 4:  # Need at least 2 points
-                                    self.canvas.create_line(
-                                        path_coords,
-                                        fill='#87CEEB',  # Sky blue color for better distinction
-                                        width=2,
-                                        dash=(3, 6)  # Different dash pattern for distinction
-                                    )
-                
-                # Horizontal road
-                # Base layer
-                self.canvas.create_rectangle(
-                    x - self.cell_size/2, y - road_width,
-                    x + self.cell_size/2, y + road_width,
-                    fill='#222222', outline=''
-                )
-                # Surface layer
-                self.canvas.create_rectangle(
-                    x - self.cell_size/2 + 2, y - road_width + 2,
-                    x + self.cell_size/2 - 2, y + road_width - 2,
-                    fill='#444444', outline=''
-                )
-                # Congestion overlay for horizontal road
-                if grid.congestion[i, j] > 0.1:
-                    self.canvas.create_rectangle(
-                        x - self.cell_size/2 + 2, y - road_width + 2,
-                        x + self.cell_size/2 - 2, y + road_width - 2,
-                        fill=congestion_color, outline='', stipple='gray50'
-                    )
-                    
-                    # Show congestion values in congestion mode
-                    if congestion_mode and grid.congestion[i, j] > 0.05:
-                        self.canvas.create_text(
-                            x, y - road_width - 8,
-                            text=f"{grid.congestion[i, j]:.2f}",
-                            font=("Arial", 8),
-                            fill='red'
-                        )
-                
-                # Vertical road
-                # Base layer
-                self.canvas.create_rectangle(
-                    x - road_width, y - self.cell_size/2,
-                    x + road_width, y + self.cell_size/2,
-                    fill='#222222', outline=''
-                )
-                # Surface layer
-                self.canvas.create_rectangle(
-                    x - road_width + 2, y - self.cell_size/2 + 2,
-                    x + road_width - 2, y + self.cell_size/2 - 2,
-                    fill='#444444', outline=''
-                )
-                # Congestion overlay for vertical road
-                if grid.congestion[i, j] > 0.1:
-                    self.canvas.create_rectangle(
-                        x - road_width + 2, y - self.cell_size/2 + 2,
-                        x + road_width - 2, y + self.cell_size/2 - 2,
-                        fill=congestion_color, outline='', stipple='gray50'
-                    )
-                
-
-                
-                # Draw obstacles
-                if grid.obstacles[i, j]:
-                    if obstacle_mode:
-                        # Enhanced appearance in obstacle mode
-                        # Red circle with X mark
-                        self.canvas.create_oval(
-                            x - self.cell_size/3, y - self.cell_size/3,
-                            x + self.cell_size/3, y + self.cell_size/3,
-                            fill='#ff6666', outline='red', width=2)
-                        # X mark
-                        self.canvas.create_line(
-                            x - self.cell_size/4, y - self.cell_size/4,
-                            x + self.cell_size/4, y + self.cell_size/4,
-                            fill='black', width=2)
-                        self.canvas.create_line(
-                            x - self.cell_size/4, y + self.cell_size/4,
-                            x + self.cell_size/4, y - self.cell_size/4,
-                            fill='black', width=2)
-                    else:
-                        # Normal X mark
-                        self.canvas.create_line(
-                            x - self.cell_size/5, y - self.cell_size/5,
-                            x + self.cell_size/5, y + self.cell_size/5,
-                            fill='red', width=3)
-                        self.canvas.create_line(
-                            x - self.cell_size/5, y + self.cell_size/5,
-                            x + self.cell_size/5, y - self.cell_size/5,
-                            fill='red', width=3)
-                    
-                    # Caution circle (only in non-obstacle mode)
-                    if not obstacle_mode:
-                        self.canvas.create_oval(
-                            x - self.cell_size/3, y - self.cell_size/3,
-                            x + self.cell_size/3, y + self.cell_size/3,
-                            outline='orange', width=2)
-                
-                # Draw traffic lights with improved visibility
-                if grid.traffic_lights[i, j] > 0:
-                    # Traffic light box shadow
-                    self.canvas.create_rectangle(
-                        x - self.cell_size/6 + 2, y - self.cell_size/6 + 2,
-                        x + self.cell_size/6 + 2, y + self.cell_size/6 + 2,
-                        fill='#404040', outline=''
-                    )
-                    
-                    # Traffic light box with metallic effect
-                    self.canvas.create_rectangle(
-                        x - self.cell_size/6, y - self.cell_size/6,
-                        x + self.cell_size/6, y + self.cell_size/6,
-                        fill='#808080',
-                        outline='#606060',
-                        width=2
-                    )
-                    
-                    # Light size and spacing
-                    light_radius = max(4, min(8, self.cell_size/10))
-                    light_spacing = light_radius * 2.5
-                    
-                    # North-South green (East-West red)
-                    if grid.traffic_lights[i, j] == 1:
-                        # NS Green light with glow effect
-                        self.canvas.create_oval(
-                            x - light_radius - 1, y - light_spacing - 1,
-                            x + light_radius + 1, y - light_spacing + 2*light_radius + 1,
-                            fill='#004400', outline=''
-                        )
-                        self.canvas.create_oval(
-                            x - light_radius, y - light_spacing,
-                            x + light_radius, y - light_spacing + 2*light_radius,
-                            fill='#00ff00', outline='#008800'
-                        )
-                        
-                        # EW Red light
-                        self.canvas.create_oval(
-                            x + light_spacing - light_radius, y - light_radius,
-                            x + light_spacing + light_radius, y + light_radius,
-                            fill='#ff0000', outline='#800000'
-                        )
-                    # East-West green (North-South red)
-                    else:
-                        # NS Red light
-                        self.canvas.create_oval(
-                            x - light_radius, y - light_spacing,
-                            x + light_radius, y - light_spacing + 2*light_radius,
-                            fill='#ff0000', outline='#800000'
-                        )
-                        
-                        # EW Green light with glow effect
-                        self.canvas.create_oval(
-                            x + light_spacing - light_radius - 1, y - light_radius - 1,
-                            x + light_spacing + light_radius + 1, y + light_radius + 1,
-                            fill='#004400', outline=''
-                        )
-                        self.canvas.create_oval(
-                            x + light_spacing - light_radius, y - light_radius,
-                            x + light_spacing + light_radius, y + light_radius,
-                            fill='#00ff00', outline='#008800'
-                        )
-
+        if self._layout_size != grid.size:
+            self._build_static_layers(grid)
+        mode = 'obstacle' if obstacle_mode else 'congestion' if congestion_mode else 'normal'
+        if mode != self._mode:
+            self._set_mode(mode)
         
-        # Draw vehicles and destinations
-        if hasattr(grid, 'vehicles') and grid.vehicles:
-            for v in grid.vehicles:
-                if not hasattr(v, 'position') or not hasattr(v, 'destination'):
-                    continue
-                    
-                # Draw vehicle
-                vx = v.position[0] * self.cell_size + self.margin
-                vy = (grid.size - 1 - v.position[1]) * self.cell_size + self.margin
-                
-                # Draw actual path taken (green dotted line with larger offset to the left)
-                if hasattr(v, 'path') and len(v.path) > 1:
-                    for i in range(len(v.path) - 1):
-                        p1 = v.path[i]
-                        p2 = v.path[i + 1]
-                        # Offset the actual path significantly to the left to avoid overlap
-                        x1 = p1[0] * self.cell_size + self.margin - 8
-                        y1 = (grid.size - 1 - p1[1]) * self.cell_size + self.margin
-                        x2 = p2[0] * self.cell_size + self.margin - 8
-                        y2 = (grid.size - 1 - p2[1]) * self.cell_size + self.margin
-                        # Draw path segments with dotted line (green, different dash pattern)
-                        self.canvas.create_line(
-                            x1, y1, x2, y2,
-                            fill='#4CAF50',  # Medium green color
-                            width=2,
-                            dash=(6, 3)  # Different dash pattern from optimal path
-                        )
-                
-                # Car shadow (for depth effect)
-                self.canvas.create_rectangle(
-                    vx - self.cell_size/6 + 2, vy - self.cell_size/10 + 2,
-                    vx + self.cell_size/6 + 2, vy + self.cell_size/10 + 2,
-                    fill='#000033', outline=''
-                )
-                
-                # Car body with outline
-                self.canvas.create_rectangle(
-                    vx - self.cell_size/6, vy - self.cell_size/10,
-                    vx + self.cell_size/6, vy + self.cell_size/10,
-                    fill='#0066cc', outline='#003366', width=1
-                )
-                
-                # Car windows with slight depth effect
-                self.canvas.create_rectangle(
-                    vx - self.cell_size/12, vy - self.cell_size/15,
-                    vx + self.cell_size/12, vy + self.cell_size/15,
-                    fill='#99ccff', outline='#6699cc', width=1
-                )
-                
-                # Display vehicle ID with better visibility
-                self.canvas.create_text(
-                    vx, vy,
-                    text=str(v.id),
-                    font=("Arial", max(10, int(self.cell_size/4))),
-                    fill='white'
-                )
-                
-                # Draw destination
-                dx = v.destination[0] * self.cell_size + self.margin
-                dy = (grid.size - 1 - v.destination[1]) * self.cell_size + self.margin
-                
-                # Star shape for destination - yellow if reached, green otherwise
-                star_color = 'yellow' if v.reached else 'limegreen'
-                self.canvas.create_text(
-                    dx, dy, 
-                    text="★", 
-                    font=("Arial", int(self.cell_size/2)), 
-                    fill=star_color)
-                
-                # Display destination ID
-                self.canvas.create_text(
-                    dx, dy + self.cell_size/4,
-                    text=str(v.id),
-                    font=("Arial", int(self.cell_size/4)),
-                    fill='black'
-                )
-                
-                # Display start position
-                sx = v.start_position[0] * self.cell_size
-                sy = (grid.size - 1 - v.start_position[1]) * self.cell_size
-                
-                # Draw start position marker (circle)
-                self.canvas.create_oval(
-                    sx - self.cell_size/6, sy - self.cell_size/6,
-                    sx + self.cell_size/6, sy + self.cell_size/6,
-                    fill='orange', outline='black'
-                )
-                
-                # Display start position ID
-                self.canvas.create_text(
-                    sx, sy,
-                    text=str(v.id),
-                    font=("Arial", int(self.cell_size/4)),
-                    fill='black'
-                )
+        self._update_congestion(grid)
+        self._update_obstacles(grid)
+        self._update_traffic_lights(grid)
+        self._draw_vehicles(grid)
         
         # Update info
         status_text = f"Step: {getattr(grid, 'current_step', 0)}"
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+測試批次訓練引擎 (BatchTrainer)
+"""
+
+import numpy as np
+import pytest
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from batch_simulation import BatchTrainer
+
+def test_batch_simulation():
+    """Run a few lockstep episodes and check the recorded statistics"""
+    print("=== 測試批次訓練引擎 ===\n")
+
+    grid = UrbanGrid(size=10)
+    agent = QLearningAgent(grid, q_table_backend="dense")
+    trainer = BatchTrainer(agent, num_envs=8, num_vehicles=3, seed=0)
+
+    trainer.train(episodes=20, max_steps=50)
+
+    # 20 episodes round up to 3 rounds of 8 environments
+    assert len(trainer.episode_rewards) == 24
+    assert all(0 <= s <= 1 for s in trainer.success_rate)
+    assert np.all(trainer.steps <= 50)
+    assert len(agent.q_table) > 0
+    print(f"1. 回合數: {len(trainer.episode_rewards)}, 已訪問狀態: {len(agent.q_table)}")
+
+    # Vehicles never end up on cells outside the grid
+    assert np.all((trainer.positions >= 0) & (trainer.positions < grid.size))
+    print("2. 車輛位置皆在網格內")
+
+    # The dict backend is rejected
+    with pytest.raises(ValueError):
+        BatchTrainer(QLearningAgent(grid))
+    print("3. 字典後端被正確拒絕")
+
+    print("\n✅ 批次訓練引擎測試通過！")
+
+if __name__ == "__main__":
+    test_batch_simulation()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+測試 Q 表二進位檢查點 (binary Q-table checkpoint)
+"""
+
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.checkpoint import save_checkpoint, load_checkpoint, CheckpointWriter, load_agent, save_agent
+
+def _train(agent, steps, seed):
+    rng = np.random.default_rng(seed)
+    size = agent.urban_grid.size
+    for _ in range(steps):
+        state = (int(rng.integers(size)), int(rng.integers(size)), int(rng.integers(5)), int(rng.integers(8)))
+        next_state = (int(rng.integers(size)), int(rng.integers(size)), int(rng.integers(5)), int(rng.integers(8)))
+        agent.update_q_table(state, int(rng.integers(4)), float(rng.normal()), next_state)
+
+def _assert_same_table(loaded, agent):
+    assert len(loaded.q_table) == len(agent.q_table)
+    for state, q_values in agent.q_table.items():
+        assert np.allclose(loaded.q_table[state], q_values, atol=1e-5)
+
+def _load_damaged(path):
+    """Load a checkpoint whose last segment is damaged, checking that a warning is printed"""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        loaded = load_checkpoint(path)
+    assert "Warning" in output.getvalue()
+    return loaded
+
+def test_checkpoint():
+    """Checkpoints should round-trip both backends, append increments and load via mmap"""
+    print("=== 測試 Q 表檢查點 ===\n")
+    tmp_dir = tempfile.mkdtemp()
+
+    # 1. Round trip for both backends, with and without compression
+    for backend in ("dict", "dense"):
+        agent = QLearningAgent(UrbanGrid(size=10), epsilon=0.05, q_table_backend=backend)
+        _train(agent, 300, seed=0)
+        for compress in (False, True):
+            path = os.path.join(tmp_dir, f"{backend}_{compress}.vqt")
+            save_checkpoint(agent, path, compress=compress)
+            loaded = load_checkpoint(path)
+            assert loaded.q_table_backend == backend
+            assert loaded.epsilon == 0.05 and loaded.urban_grid.size == 10
+            _assert_same_table(loaded, agent)
+            print(f"1. {backend} (compress={compress}): {os.path.getsize(path)} bytes")
+
+    # 2. Incremental saves only append the changed rows
+    agent = QLearningAgent(UrbanGrid(size=10), q_table_backend="dense")
+    _train(agent, 300, seed=1)
+    path = os.path.join(tmp_dir, "incremental.vqt")
+    writer = CheckpointWriter(agent, path)
+    writer.write()
+    _train(agent, 20, seed=2)
+    written = writer.write()
+    assert 0 < written <= 40
+    _assert_same_table(load_checkpoint(path), agent)
+    print(f"2. 增量保存寫入 {written} 列")
+
+    # 2b. A crash while appending loses only the increment, never the full base
+    agent = QLearningAgent(UrbanGrid(size=10), q_table_backend="dense")
+    _train(agent, 300, seed=3)
+    path = os.path.join(tmp_dir, "torn.vqt")
+    writer = CheckpointWriter(agent, path)
+    writer.write()
+    base = load_checkpoint(path)
+    base_size = os.path.getsize(path)
+    _train(agent, 20, seed=4)
+    writer.write()
+    with open(path, "rb") as f:
+        data = f.read()
+    torn_path = os.path.join(tmp_dir, "torn_copy.vqt")
+    for cut in list(range(1, len(data) - base_size, 7)) + [40, 70, 100]:
+        with open(torn_path, "wb") as f:
+            f.write(data[:len(data) - cut])
+        _assert_same_table(_load_damaged(torn_path), base)
+    flipped = bytearray(data)
+    flipped[-70] ^= 0xFF  # Inside the appended payload
+    with open(torn_path, "wb") as f:
+        f.write(flipped)
+    _assert_same_table(_load_damaged(torn_path), base)
+    with open(torn_path, "wb") as f:
+        f.write(data[:base_size - 100])
+    try:
+        load_checkpoint(torn_path)
+        raise AssertionError("a checkpoint without a complete base should not load")
+    except ValueError:
+        pass
+    print("2b. 截斷或損壞的增量段落被略過，保留完整的基礎段落")
+
+    # 3. Memory-mapped loads are copy-on-write
+    path = os.path.join(tmp_dir, "mmap.vqt")
+    save_checkpoint(agent, path)
+    loaded = load_checkpoint(path, mmap=True)
+    assert isinstance(loaded.q_table.q_values, np.memmap)
+    loaded.q_table[(0, 0, 0, 0)] = 123.0
+    assert not np.allclose(load_checkpoint(path).q_table.q_values[0], 123.0)
+    print("3. 記憶體映射載入正常")
+
+    # 3b. Saving over the checkpoint an agent was loaded from (the --continue flow)
+    path = os.path.join(tmp_dir, "resave.vqt")
+    save_agent(agent, path)
+    for mmap in (False, True):
+        reloaded = load_agent(path, mmap=mmap)
+        assert isinstance(reloaded.q_table.q_values, np.memmap) == mmap
+        reloaded.q_table[(1, 1, 0, 0)] = 7.0
+        save_agent(reloaded, path)
+        _assert_same_table(load_agent(path), reloaded)
+    assert [name for name in os.listdir(tmp_dir) if name.startswith(".tmp-")] == []
+    print("3b. 載入後存回同一路徑正常")
+
+    # 4. Legacy pickles are still readable
+    path = os.path.join(tmp_dir, "legacy.pkl")
+    save_agent(agent, path)
+    _assert_same_table(load_agent(path), agent)
+    print("4. 舊版 pickle 仍可載入")
+
+    print("\n✅ 檢查點測試通過！")
+
+if __name__ == "__main__":
+    test_checkpoint()
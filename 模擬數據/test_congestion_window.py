@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+測試以積分圖查詢擁堵視窗 (summed-area table congestion windows)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+
+def window_mean(congestion, x, y, window_size=3):
+    """np.mean over the window clipped at the grid edges, as get_congestion_window used to do"""
+    size = congestion.shape[0]
+    half = window_size // 2
+    return np.mean(congestion[max(0, x - half):min(size - 1, x + half) + 1,
+                              max(0, y - half):min(size - 1, y + half) + 1])
+
+def check_all_cells(grid, window_size=3):
+    xs, ys = np.meshgrid(np.arange(grid.size), np.arange(grid.size), indexing='ij')
+    expected = np.array([[window_mean(grid.congestion, x, y, window_size) for y in range(grid.size)]
+                         for x in range(grid.size)])
+    assert np.allclose(grid.get_congestion_windows(xs.ravel(), ys.ravel(), window_size),
+                       expected.ravel())
+    for x, y in ((0, 0), (grid.size - 1, 0), (grid.size // 2, grid.size - 1)):
+        assert np.isclose(grid.get_congestion_window(x, y, window_size), expected[x, y])
+
+def test_congestion_window():
+    """Window queries should equal np.mean over the clipped window"""
+    print("=== 測試擁堵視窗查詢 ===\n")
+    grid = UrbanGrid(size=13, seed=0)
+    grid.reset_congestion()
+
+    # 1. Every cell, for several window sizes
+    for window_size in (1, 3, 5):
+        check_all_cells(grid, window_size)
+    print("1. 所有格子的視窗平均與 np.mean 一致")
+
+    # 2. After update_congestion and after assigning a new map
+    grid.update_congestion([(2, 3), (2, 3), (12, 12)])
+    check_all_cells(grid)
+    grid.congestion = np.random.default_rng(1).random((13, 13))
+    check_all_cells(grid)
+    print("2. 更新或更換擁堵地圖後結果正確")
+
+    # 3. In-place edits are seen after mark_congestion_changed()
+    grid.get_congestion_window(6, 6)  # Build the table before the edit
+    grid.congestion[5:8, 5:8] = 1.0
+    grid.mark_congestion_changed()
+    assert np.isclose(grid.get_congestion_window(6, 6), 1.0)
+    check_all_cells(grid)
+    print("3. mark_congestion_changed() 後反映原地修改")
+
+    print("\n✅ 擁堵視窗測試通過！")
+
+if __name__ == "__main__":
+    test_congestion_window()
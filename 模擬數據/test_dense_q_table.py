@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+測試稠密 Q 表後端 (dense Q-table backend)
+"""
+
+import pickle
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.q_table import DenseQTable
+
+def test_dense_q_table():
+    """Dense and dict backends should produce identical Q-values"""
+    print("=== 測試稠密 Q 表 ===\n")
+
+    grid = UrbanGrid(size=10)
+    dict_agent = QLearningAgent(grid)
+    dense_agent = QLearningAgent(grid, q_table_backend="dense")
+
+    # State encoding round trip
+    table = dense_agent.q_table
+    for state in [(0, 0, 0, 0), (3, 7, 2, 5), (9, 9, 4, 7)]:
+        assert table.decode(table.encode(state)) == state
+    print(f"1. 狀態數: {table.num_states}, 記憶體: {table.get_memory_usage()} bytes")
+
+    # Same update sequence on both backends
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        state = (int(rng.integers(10)), int(rng.integers(10)), int(rng.integers(5)), int(rng.integers(8)))
+        next_state = (int(rng.integers(10)), int(rng.integers(10)), int(rng.integers(5)), int(rng.integers(8)))
+        action = int(rng.integers(4))
+        reward = float(rng.normal())
+        dict_agent.update_q_table(state, action, reward, next_state)
+        dense_agent.update_q_table(state, action, reward, next_state)
+
+    for state, q_values in dict_agent.q_table.items():
+        assert np.allclose(dense_agent.q_table[state], q_values, atol=1e-4)
+    print(f"2. 兩種後端結果一致，共 {len(dict_agent.q_table)} 個狀態")
+
+    # Loop reset and pickling
+    dense_agent.reset_state_q_values((1, 1, 1, 1))
+    assert np.allclose(dense_agent.q_table[(1, 1, 1, 1)], -0.5)
+    restored = pickle.loads(pickle.dumps(dense_agent))
+    assert isinstance(restored.q_table, DenseQTable)
+    assert np.array_equal(restored.q_table.q_values, dense_agent.q_table.q_values)
+    print("3. 迴圈重置與序列化正常")
+
+    print("\n✅ 稠密 Q 表測試通過！")
+
+if __name__ == "__main__":
+    test_dense_q_table()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+測試方向查找表與每車目的地的狀態編碼 (direction lookup table)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.q_table import direction_table
+from vehicle import Vehicle
+
+def test_direction_table():
+    """The lookup table should reproduce the arctan2 rule, and vehicles keep their own destination"""
+    print("=== 測試方向查找表 ===\n")
+
+    # 1. Same directions as the former per-step arctan2 computation
+    size = 12
+    table = direction_table(size)
+    for dx in range(-(size - 1), size):
+        for dy in range(-(size - 1), size):
+            expected = int(((np.arctan2(dy, dx) + np.pi) * 4 / np.pi + 0.5) % 8)
+            assert table[dx + size - 1, dy + size - 1] == expected
+    assert direction_table(size) is table
+    print(f"1. 查找表大小 {table.shape}，與 arctan2 結果一致")
+
+    # 2. Vehicles sharing an agent encode states with their own destination
+    grid = UrbanGrid(size=size, seed=0)
+    agent = QLearningAgent(grid)
+    west = Vehicle(grid, agent, position=(5, 5), destination=(0, 5))
+    east = Vehicle(grid, agent, position=(5, 5), destination=(11, 5))
+    west_state = agent.get_state_key(west.position, 0.0, west.destination)
+    east_state = agent.get_state_key(east.position, 0.0, east.destination)
+    assert west_state[3] != east_state[3]
+    assert agent.get_state_key((5, 5), 0.0) == east_state  # Falls back to current_destination
+    print(f"2. 向西方向 {west_state[3]}，向東方向 {east_state[3]}")
+
+    print("\n✅ 方向查找表測試通過！")
+
+if __name__ == "__main__":
+    test_direction_table()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+測試實驗檢查點與中斷接續 (resumable experiment runs)
+"""
+
+import os
+import tempfile
+from comprehensive_experiment import ComprehensiveExperiment
+from metrics_writer import read_episode_metrics
+
+class CrashingExperiment(ComprehensiveExperiment):
+    """Raises partway through a run to simulate a preempted machine"""
+
+    def __init__(self, crash_after, **kwargs):
+        super().__init__(**kwargs)
+        self.crash_after = crash_after
+        self.episodes_run = 0
+
+    def _run_single_episode(self, *args):
+        if self.episodes_run == self.crash_after:
+            raise RuntimeError("simulated crash")
+        self.episodes_run += 1
+        return super()._run_single_episode(*args)
+
+def test_experiment_resume():
+    """A killed run should resume from its last checkpoint and match an uninterrupted run"""
+    print("=== 測試實驗中斷接續 ===\n")
+    config = ('proximity_based', 0.1, 'high')
+    kwargs = dict(num_episodes=30, max_steps=40, seed=7)
+
+    # 1. Uninterrupted run (with the same checkpoint interval)
+    reference_dir = tempfile.mkdtemp()
+    reference = ComprehensiveExperiment(grid_size=8, checkpoint_dir=reference_dir, checkpoint_interval=10)
+    expected = reference.run_single_experiment(*config, metrics_path=os.path.join(reference_dir, "m.csv"), **kwargs)
+    assert os.listdir(reference_dir) == ["m.csv"]  # Checkpoints are removed after completion
+    print(f"1. 未中斷: 成功 {expected['successful_episodes']}, 總步數 {expected['total_steps']}")
+
+    # 2. Crash at episode 25, after the checkpoint at episode 20
+    run_dir = tempfile.mkdtemp()
+    metrics_path = os.path.join(run_dir, "m.csv")
+    crashing = CrashingExperiment(25, grid_size=8, checkpoint_dir=run_dir, checkpoint_interval=10)
+    try:
+        crashing.run_single_experiment(*config, metrics_path=metrics_path, **kwargs)
+        assert False, "the run should have crashed"
+    except RuntimeError:
+        pass
+    assert any(name.endswith("_ep20.vqt") for name in os.listdir(run_dir))
+    # The metrics file is closed on the crash, so every finished episode reached disk
+    assert read_episode_metrics(metrics_path)['episode'] == [float(i) for i in range(25)]
+    print("2. 中斷於第 25 回合，保留第 20 回合的檢查點")
+
+    # 3. Resume and compare
+    resumed = ComprehensiveExperiment(grid_size=8, checkpoint_dir=run_dir, checkpoint_interval=10)
+    result = resumed.run_single_experiment(*config, metrics_path=metrics_path, **kwargs)
+    for key in ('successful_episodes', 'total_steps', 'total_rewards'):
+        assert result[key] == expected[key], key
+    metrics = read_episode_metrics(metrics_path)
+    assert metrics['episode'] == [float(i) for i in range(30)]
+    assert metrics['reward'] == read_episode_metrics(os.path.join(reference_dir, "m.csv"))['reward']
+    print("3. 接續後的結果與未中斷的運行完全相同")
+
+    print("\n✅ 實驗接續測試通過！")
+
+if __name__ == "__main__":
+    test_experiment_resume()
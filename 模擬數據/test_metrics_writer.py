@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+測試逐回合指標串流寫入 (streaming episode metrics)
+"""
+
+import os
+import tempfile
+import numpy as np
+from metrics_writer import EpisodeMetricsWriter, RunningStats, read_episode_metrics
+from comprehensive_experiment import ComprehensiveExperiment
+
+def test_metrics_writer():
+    """Running stats should match numpy, and a crashed file should resume cleanly"""
+    print("=== 測試逐回合指標寫入 ===\n")
+
+    # 1. Running statistics
+    values = np.random.default_rng(0).normal(size=1000)
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    assert np.isclose(stats.mean, values.mean()) and np.isclose(stats.std, values.std())
+    restored = RunningStats.from_dict(stats.to_dict())
+    assert restored.count == 1000 and restored.max == values.max()
+    print(f"1. 累計統計: 平均 {stats.mean:.4f}, 標準差 {stats.std:.4f}")
+
+    # 2. Resume after a crash that left a half-written line
+    path = os.path.join(tempfile.mkdtemp(), "metrics.csv")
+    with EpisodeMetricsWriter(path, ['episode', 'steps'], flush_interval=4) as writer:
+        for episode in range(10):
+            writer.write({'episode': episode, 'steps': episode * 2})
+    with open(path, 'a') as f:
+        f.write("10,2")  # Interrupted mid-row
+    writer = EpisodeMetricsWriter(path, ['episode', 'steps'], resume=True)
+    assert writer.rows_written == 10
+    writer.write({'episode': 10, 'steps': 20})
+    writer.close()
+    assert read_episode_metrics(path)['steps'][-2:] == [18.0, 20.0]
+    print("2. 中斷後可接續寫入")
+
+    # 3. Truncating to an earlier checkpoint
+    writer = EpisodeMetricsWriter(path, ['episode', 'steps'], resume=True)
+    writer.truncate(5)
+    writer.close()
+    assert read_episode_metrics(path)['episode'] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    print("3. 可截斷至檢查點")
+
+    # 4. Experiments stream one row per episode
+    path = os.path.join(tempfile.mkdtemp(), "experiment.csv")
+    result = ComprehensiveExperiment(grid_size=8).run_single_experiment(
+        'proximity_based', 0.1, 'low', num_episodes=12, max_steps=30, metrics_path=path)
+    metrics = read_episode_metrics(path)
+    assert len(metrics['episode']) == 12
+    assert sum(metrics['success']) == result['successful_episodes']
+    print("4. 實驗逐回合寫入指標")
+
+    print("\n✅ 指標寫入測試通過！")
+
+if __name__ == "__main__":
+    test_metrics_writer()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+測試以進程池平行運行實驗配置 (pooled experiment sweeps)
+"""
+
+import os
+import tempfile
+from comprehensive_experiment import ComprehensiveExperiment
+from metrics_writer import read_episode_metrics
+
+# Keys that depend only on the seeded run, not on wall-clock timing
+DETERMINISTIC_KEYS = ('success_rate', 'avg_steps', 'avg_reward', 'path_efficiency',
+                      'successful_episodes', 'total_steps', 'total_rewards')
+
+def result_key(result):
+    return (result['algorithm_type'], result['obstacle_density'], result['congestion_level'], result['seed'])
+
+def test_parallel_experiments():
+    """The pooled sweep should return the same results as running each config serially"""
+    print("=== 測試平行實驗配置 ===\n")
+    configs = [('proximity_based', 0.1, 'low'), ('exponential_distance', 0.25, 'high')]
+    seeds = (3, 11)
+    kwargs = dict(num_episodes=15, max_steps=30)
+
+    # 1. Serial reference runs
+    serial = ComprehensiveExperiment(grid_size=8)
+    expected = {}
+    for config in configs:
+        for seed in seeds:
+            result = serial.run_single_experiment(*config, seed=seed, **kwargs)
+            expected[result_key(result)] = result
+    print(f"1. 依序運行 {len(expected)} 個配置")
+
+    # 2. Pooled sweep; results arrive in completion order
+    metrics_dir = tempfile.mkdtemp()
+    pooled = ComprehensiveExperiment(grid_size=8)
+    progress = []
+    results = pooled.run_parallel_experiments(configs, seeds=seeds, max_workers=2, metrics_dir=metrics_dir,
+                                              on_result=lambda result, done, total: progress.append((done, total)),
+                                              **kwargs)
+    assert len(results) == len(expected) and pooled.results == results
+    assert progress == [(i + 1, len(expected)) for i in range(len(expected))]
+    assert sorted(map(result_key, results)) == sorted(expected)
+    for result in results:
+        reference = expected[result_key(result)]
+        for key in DETERMINISTIC_KEYS:
+            assert result[key] == reference[key], (result_key(result), key)
+        assert read_episode_metrics(result['metrics_path'])['episode'] == [float(i) for i in range(15)]
+    assert len(os.listdir(metrics_dir)) == len(expected)
+    print("2. 進程池結果與依序運行一致")
+
+    print("\n✅ 平行實驗測試通過！")
+
+if __name__ == "__main__":
+    test_parallel_experiments()
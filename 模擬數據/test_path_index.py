@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+測試路徑索引 (path membership / distance index)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.path_index import PathIndex
+from vehicle import Vehicle
+
+def _scan_nearest(path, position):
+    """The former linear scan: first path point with the smallest Manhattan distance"""
+    best_dist, best_index = float('inf'), 0
+    for i, point in enumerate(path):
+        dist = abs(position[0] - point[0]) + abs(position[1] - point[1])
+        if dist < best_dist:
+            best_dist, best_index = dist, i
+    return best_dist, best_index
+
+def test_path_index():
+    """The distance field should agree with a linear scan of the path"""
+    print("=== 測試路徑索引 ===\n")
+    size = 15
+    rng = np.random.default_rng(0)
+
+    # 1. Distance field and tie-breaking match the linear scan (path revisits cells)
+    path = [(2, 2), (2, 3), (3, 3), (4, 3), (4, 4), (3, 4), (3, 3), (3, 2), (9, 9), (10, 9)]
+    index = PathIndex(path, size)
+    for x in range(size):
+        for y in range(size):
+            assert index.nearest((x, y)) == _scan_nearest(path, (x, y))
+    assert (3, 3) in index and (0, 0) not in index
+    assert index.first_index[(3, 3)] == 2
+    print("1. 距離場與線性掃描一致")
+
+    # 2. A capped field only answers within max_distance
+    capped = PathIndex(path, size, max_distance=2)
+    assert capped.nearest((2, 0)) == _scan_nearest(path, (2, 0))
+    assert capped.nearest((14, 0)) is None
+    print("2. 限制距離的距離場正常")
+
+    # 3. Vehicle rewards match the scan-based reward on planned paths
+    grid = UrbanGrid(size=size, seed=1)
+    for x, y in grid.random_positions(20):
+        grid.add_obstacle(x, y)
+    agent = QLearningAgent(grid)
+    path_config = None
+    for _ in range(20):
+        vehicle = Vehicle(grid, agent)
+        if not vehicle.optimal_path:
+            continue
+        path_config = vehicle.reward_config.get_path_distance_config()
+        for x, y in grid.random_positions(10):
+            position = (int(x), int(y))
+            dist, i = _scan_nearest(vehicle.optimal_path, position)
+            expected = max(0, path_config['base_reward'] - dist * path_config['penalty_multiplier'])
+            expected *= 1 + i / len(vehicle.optimal_path)
+            nearest = vehicle.get_path_index().nearest(position)
+            actual = 0 if nearest is None else max(
+                0, path_config['base_reward'] - nearest[0] * path_config['penalty_multiplier']
+            ) * (1 + nearest[1] / len(vehicle.optimal_path))
+            assert actual == expected
+    print("3. 車輛的路徑距離獎勵與原本的計算一致")
+
+    # 4. The index is rebuilt only after a replan
+    index = vehicle.get_path_index()
+    assert vehicle.get_path_index() is index
+    vehicle.optimal_path = list(vehicle.optimal_path)
+    assert vehicle.get_path_index() is not index
+    print("4. 只在重新規劃後重建索引")
+
+    print("\n✅ 路徑索引測試通過！")
+
+if __name__ == "__main__":
+    test_path_index()
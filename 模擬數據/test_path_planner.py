@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+測試路徑規劃快取 (PathPlanner)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.astar import astar
+from algorithm.path_planner import PathPlanner
+
+def test_path_planner():
+    """Cached paths are reused until a relevant obstacle change"""
+    print("=== 測試路徑規劃快取 ===\n")
+
+    grid = UrbanGrid(size=15)
+    planner = PathPlanner(grid)
+    start, goal = (0, 0), (14, 14)
+
+    path = planner.plan(start, goal)
+    assert path == astar(start, goal, grid.size, grid.obstacles, grid.congestion)
+
+    # Following the path hits the cache
+    suffix = planner.plan(path[3], goal)
+    assert suffix == path[3:]
+    assert planner.hits == 1 and planner.misses == 1
+    print(f"1. 快取命中: {planner.hits}, 未命中: {planner.misses}")
+
+    # An obstacle far away from the path does not trigger a replan
+    off_path = next((x, y) for x in range(15) for y in range(15) if (x, y) not in path)
+    grid.add_obstacle(*off_path)
+    assert planner.plan(path[3], goal) == path[3:]
+    print("2. 路徑外的障礙物不觸發重新規劃")
+
+    # An obstacle on the remaining path forces a new A* search
+    blocked = path[len(path) // 2]
+    grid.add_obstacle(*blocked)
+    new_path = planner.plan(path[3], goal)
+    assert blocked not in new_path
+    assert planner.misses == 2
+    print("3. 路徑上的障礙物觸發重新規劃")
+
+    # Replacing the obstacle map invalidates everything
+    grid.obstacles = np.zeros((grid.size, grid.size), dtype=bool)
+    assert grid.get_obstacle_changes(0) is None
+    planner.plan(new_path[1], goal)
+    assert planner.misses == 3
+    print("4. 整體更換障礙物地圖後重新規劃")
+
+    # A check from a later start does not clear obstacles before it for earlier starts
+    grid = UrbanGrid(size=15)
+    planner = PathPlanner(grid)
+    path = planner.plan(start, goal)
+    grid.add_obstacle(*path[3])
+    assert planner.plan(path[5], goal) == path[5:]
+    earlier = planner.plan(path[1], goal)
+    assert path[3] not in earlier and earlier[0] == path[1]
+    print("5. 較早的起點重新檢查障礙物")
+
+    print("\n✅ 路徑規劃快取測試通過！")
+
+if __name__ == "__main__":
+    test_path_planner()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+測試無視窗的點陣渲染器與畫面錄製 (headless raster renderer / frame recorder)
+"""
+
+import os
+import tempfile
+import numpy as np
+from matplotlib.colors import LinearSegmentedColormap
+from module.urban_grid import UrbanGrid
+from module.colors import (CONGESTION_COLORS, CONGESTION_LEVELS, congestion_rgb_lut, congestion_indices,
+                           congestion_hex_lut, congestion_hex_indices)
+from module.grid_snapshot import GridSnapshot
+from algorithm.agent import QLearningAgent
+from vehicle import Vehicle
+from raster_renderer import RasterRenderer, FrameRecorder, VEHICLE_COLOR, OBSTACLE_COLOR
+from simulation import run_simulation
+
+def test_raster_renderer():
+    """Frames should show the grid state in the right cells and be recorded to PNG files"""
+    print("=== 測試點陣渲染器 ===\n")
+
+    # 1. The congestion lookup table matches the matplotlib colormap it replaces
+    cmap = LinearSegmentedColormap.from_list('congestion_cmap', CONGESTION_COLORS)
+    levels = np.linspace(0, 1, 1001)
+    assert np.allclose(congestion_rgb_lut()[congestion_indices(levels)], cmap(levels)[:, :3])
+
+    # Hex table matches the former per-cell conversion int(channel * 255), up to
+    # rounding of the last bit of the interpolated floats
+    hex_colors = congestion_hex_lut()[congestion_hex_indices(levels)]
+    assert len(congestion_hex_lut()) == 257
+    low = levels < 0.1
+    assert all(color == '#d9d9d9' for color in hex_colors[low])
+    decoded = np.array([[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in hex_colors[~low]])
+    expected = (cmap(levels[~low])[:, :3] * 255).astype(int)
+    assert np.abs(decoded - expected).max() <= 1
+    # Scalar levels (as used for single cells) map to single colors
+    assert congestion_hex_lut()[congestion_hex_indices(0.05)] == '#d9d9d9'
+    assert congestion_hex_lut()[congestion_hex_indices(1.0)] == congestion_hex_lut()[CONGESTION_LEVELS - 1]
+    print("1. 擁堵色表與 matplotlib 色圖一致")
+
+    # 2. Elements land in their cells (x to the right, y upwards)
+    size, cell = 10, 8
+    grid = UrbanGrid(size=size, seed=0)
+    grid.add_obstacle(0, 9)
+    agent = QLearningAgent(grid)
+    vehicle = Vehicle(grid, agent, position=(2, 1), destination=(8, 8))
+    renderer = RasterRenderer(size, cell_size=cell)
+    frame = renderer.render(grid, [vehicle])
+    assert frame.shape == (size * cell, size * cell, 3) and frame.dtype == np.uint8
+
+    def pixel(x, y):
+        return tuple(frame[(size - 1 - y) * cell + cell // 2, x * cell + cell // 2])
+    assert pixel(2, 1) == VEHICLE_COLOR
+    assert tuple(frame[0, 0]) == OBSTACLE_COLOR  # Corner of the X mark in the top-left cell
+    assert np.array_equal(renderer.render(GridSnapshot(grid, [vehicle])), frame)
+    print(f"2. 畫面大小 {frame.shape}，元素位置正確")
+
+    # 3. Recording training episodes to a PNG sequence
+    with tempfile.TemporaryDirectory() as output:
+        own_factory = lambda grid: FrameRecorder(grid, os.path.join(output, "own"))
+        agent = QLearningAgent(UrbanGrid(size=20, visualizer_factory=own_factory))
+        run_simulation(episodes=2, visualize_interval=1, max_steps=20, show_plots=False, seed=0, agent=agent,
+                       visualizer_factory=lambda grid: FrameRecorder(grid, output))
+        frames = sorted(name for name in os.listdir(output) if name.endswith(".png"))
+        assert len(frames) == 8 and frames[0] == "frame_000000.png"
+        # The grid's own factory is back once the recording is finished
+        assert agent.urban_grid.visualizer_factory is own_factory and agent.urban_grid.visualizer is None
+    print(f"3. 錄製 {len(frames)} 個 PNG 畫面")
+
+    # 3b. A run interrupted partway through still closes the recording
+    class InterruptedRecorder(FrameRecorder):
+        def update_display(self, *args, **kwargs):
+            if self.update_count == 3:
+                raise RuntimeError("interrupted")
+            super().update_display(*args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as output:
+        recorders = []
+
+        def interrupted_factory(grid):
+            recorders.append(InterruptedRecorder(grid, output))
+            return recorders[-1]
+
+        agent = QLearningAgent(UrbanGrid(size=20, visualizer_factory=own_factory))
+        try:
+            run_simulation(episodes=2, visualize_interval=1, max_steps=20, show_plots=False, seed=0, agent=agent,
+                           visualizer_factory=interrupted_factory)
+            raise AssertionError("the run should have been interrupted")
+        except RuntimeError:
+            pass
+        assert recorders[0].is_closed and recorders[0].frame_count == 3
+        assert agent.urban_grid.visualizer_factory is own_factory and agent.urban_grid.visualizer is None
+    print("3b. 中斷的執行仍會關閉錄製並還原視覺化")
+
+    print("\n✅ 點陣渲染器測試通過！")
+
+if __name__ == "__main__":
+    test_raster_renderer()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+測試向量化獎勵引擎 (vectorized reward engine)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.reward_config import RewardConfig
+from algorithm.reward_engine import RewardEngine, history_from_path
+from vehicle import Vehicle
+
+def _random_walk(vehicle, grid, rng, steps):
+    """Give a vehicle a path history that revisits cells"""
+    for _ in range(steps):
+        dx, dy = ((0, 1), (1, 0), (0, -1), (-1, 0))[rng.integers(4)]
+        x, y = vehicle.position[0] + dx, vehicle.position[1] + dy
+        if 0 <= x < grid.size and 0 <= y < grid.size:
+            vehicle.position = (x, y)
+            vehicle.path.append(vehicle.position)
+
+def test_reward_engine():
+    """The engine should give the same rewards as Vehicle.calculate_reward"""
+    print("=== 測試向量化獎勵引擎 ===\n")
+    size = 12
+    rng = np.random.default_rng(0)
+    grid = UrbanGrid(size=size, seed=0)
+    for x, y in grid.random_positions(10):
+        grid.add_obstacle(x, y)
+    grid.congestion = rng.uniform(0, 1, size=(size, size))
+    agent = QLearningAgent(grid)
+
+    for algorithm in ("proximity_based", "exponential_distance"):
+        config = RewardConfig()
+        config.set_algorithm_type(algorithm)
+        engine = RewardEngine(config, size)
+
+        rows, expected, indices = [], [], []
+        for _ in range(40):
+            vehicle = Vehicle(grid, agent, reward_config=config)
+            _random_walk(vehicle, grid, rng, int(rng.integers(0, 8)))
+            vehicle.update_optimal_path()
+            for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                new_position = (vehicle.position[0] + dx, vehicle.position[1] + dy)
+                if not (0 <= new_position[0] < size and 0 <= new_position[1] < size):
+                    continue
+                expected.append(vehicle.calculate_reward(new_position, dx, dy))
+                rows.append((vehicle.position, new_position, vehicle.destination,
+                             grid.congestion[new_position], history_from_path(vehicle.path),
+                             len(vehicle.path)))
+                indices.append(vehicle.get_path_index() if vehicle.optimal_path else None)
+
+        positions, new_positions, destinations, congestion, history, path_lengths = zip(*rows)
+        rewards = engine.compute(np.array(positions), np.array(new_positions), np.array(destinations),
+                                 np.array(congestion), np.stack(history), np.array(path_lengths),
+                                 path_indices=indices)
+        assert np.allclose(rewards, expected)
+        print(f"1. {algorithm}: {len(expected)} 個移動的獎勵與 Vehicle 一致")
+
+    # 2. The engine keeps the values it was built with
+    config = RewardConfig()
+    engine = RewardEngine(config, size)
+    config.update_config(step_penalty=-3)
+    assert engine.step_penalty == -1 and RewardEngine(config, size).step_penalty == -3
+    print("2. 引擎使用建立時的設定快照")
+
+    print("\n✅ 獎勵引擎測試通過！")
+
+if __name__ == "__main__":
+    test_reward_engine()
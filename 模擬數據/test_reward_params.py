@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+測試凍結的獎勵參數快照與變更通知 (frozen reward parameters / change listeners)
+"""
+
+import pickle
+from algorithm.reward_config import RewardConfig, RewardParams
+
+def test_reward_params():
+    """params should be a frozen snapshot that follows every configuration change"""
+    print("=== 測試獎勵參數快照 ===\n")
+    config = RewardConfig()
+
+    # 1. Frozen, slotted and cached until something changes
+    params = config.params
+    assert isinstance(params, RewardParams) and config.params is params
+    assert params.step_penalty == config.get_step_penalty()
+    assert params.path_reward_max_distance == 4  # ceil(10 / 2) - 1
+    try:
+        params.step_penalty = 5
+        assert False, "RewardParams should be read-only"
+    except AttributeError:
+        pass
+    assert not hasattr(params, '__dict__')
+    config.step_penalty = -2
+    assert config.params is not params and config.params.step_penalty == -2
+    print("1. 參數快照唯讀，並在設定變更後重建")
+
+    # 2. update_config validates values and notifies listeners once
+    changes = []
+    listener = lambda changed: changes.append(changed.params.oscillation_penalty)
+    config.add_listener(listener)
+    config.update_config(oscillation_penalty=-60, exp_x_scale=0, loop_threshold_base=2.5,
+                         algorithm="unknown", step_penalty="fast", unknown_key=1)
+    assert changes == [-60]
+    assert config.exp_x_scale == 1.5 and config.loop_threshold_base == 3
+    assert config.algorithm == "proximity_based" and config.step_penalty == -2
+    print("2. 無效的值被忽略，監聽器收到一次通知")
+
+    # 3. Resets keep listeners; pickled copies drop them
+    config.reset_to_defaults()
+    assert changes == [-60, -40] and config.params.step_penalty == -1
+    copy = pickle.loads(pickle.dumps(config))
+    assert copy.params == config.params
+    config.remove_listener(listener)
+    config.set_algorithm_type("exponential_distance")
+    assert len(changes) == 2 and config.params.algorithm == "exponential_distance"
+    print("3. 重設保留監聽器，序列化複本不帶監聽器")
+
+    print("\n✅ 獎勵參數測試通過！")
+
+if __name__ == "__main__":
+    test_reward_params()
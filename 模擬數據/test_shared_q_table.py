@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+測試共享記憶體 Q 表 (shared-memory Q-table) 與多進程訓練
+"""
+
+import pickle
+import numpy as np
+from algorithm.q_table import DenseQTable, SharedDenseQTable
+from simulation import run_parallel_simulation
+
+def test_shared_q_table():
+    """Attached copies should see each other's writes, and workers should train one table"""
+    print("=== 測試共享 Q 表 ===\n")
+
+    # 1. A pickled table attaches to the same memory instead of copying it
+    table = SharedDenseQTable(10)
+    attached = pickle.loads(pickle.dumps(table))
+    attached[(2, 3, 1, 4)] = [1.0, 2.0, 3.0, 4.0]
+    assert (2, 3, 1, 4) in table
+    assert np.allclose(table[(2, 3, 1, 4)], [1.0, 2.0, 3.0, 4.0])
+    attached.close()
+    print(f"1. 共享區塊 {table.name} 可由其他副本寫入")
+
+    # 2. Conversions to and from private tables
+    dense = table.to_dense()
+    assert type(dense) is DenseQTable and np.array_equal(dense.q_values, table.q_values)
+    copy = SharedDenseQTable.from_table(dense)
+    assert len(copy) == 1
+    copy.unlink()
+    table.unlink()
+    print("2. 與私有稠密表互相轉換正常")
+
+    # 3. Hogwild training across worker processes
+    agent = run_parallel_simulation(episodes=4, num_workers=2, max_steps=30, seed=0)
+    assert isinstance(agent.q_table, SharedDenseQTable)
+    assert len(agent.q_table) > 0
+    print(f"3. 多進程訓練共訪問 {len(agent.q_table)} 個狀態")
+    agent.q_table.unlink()
+
+    print("\n✅ 共享 Q 表測試通過！")
+
+if __name__ == "__main__":
+    test_shared_q_table()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+測試背景模擬執行緒與網格快照 (background simulation worker / grid snapshots)
+"""
+
+import threading
+import time
+from module.urban_grid import UrbanGrid
+from module.grid_snapshot import GridSnapshot
+from algorithm.agent import QLearningAgent
+from vehicle import Vehicle
+from UI.simulation_worker import SimulationWorker
+
+def test_simulation_worker():
+    """The worker should step on its own and publish a bounded stream of snapshots"""
+    print("=== 測試背景模擬執行緒 ===\n")
+    grid = UrbanGrid(size=15, seed=0)
+    agent = QLearningAgent(grid)
+    vehicles = [Vehicle(grid, agent) for _ in range(20)]
+    state = {'step': 0}
+
+    def step():
+        grid.update_congestion([v.position for v in vehicles if not v.reached])
+        grid.update_traffic_lights()
+        for vehicle in vehicles:
+            if not vehicle.reached:
+                vehicle.move()
+        state['step'] += 1
+        return state['step'] >= 300 or all(v.reached for v in vehicles)
+
+    # 1. Snapshots are copies of the live state
+    snapshot = GridSnapshot(grid, vehicles, step=0)
+    grid.congestion[0, 0] = 0.75
+    assert snapshot.congestion[0, 0] != 0.75 and len(snapshot.vehicles) == 20
+    assert snapshot.vehicles[0].path == vehicles[0].path and snapshot.vehicles[0].path is not vehicles[0].path
+    print("1. 快照與即時狀態分離")
+
+    # 2. Pausing stops stepping and leaves the newest state in the queue
+    worker = SimulationWorker(step, lambda: GridSnapshot(grid, vehicles, state['step']), max_fps=1000)
+    worker.start()
+    time.sleep(0.05)
+    worker.pause()
+    steps = worker.steps
+    time.sleep(0.05)
+    assert worker.steps == steps and worker.frames.qsize() <= 2
+    assert worker.latest_frame().current_step == state['step']
+    print(f"2. 暫停於第 {steps} 步，佇列中保留最新快照")
+
+    # 3. Resume and run to the end; frames beyond the queue capacity are dropped
+    worker.resume()
+    deadline = time.time() + 10
+    while not worker.finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert worker.finished and worker.error is None
+    assert worker.latest_frame().current_step == state['step']
+    worker.stop()
+    assert not worker.is_alive()
+    print(f"3. 完成 {worker.steps} 步，丟棄 {worker.dropped_frames} 個中間畫面")
+
+    # 4. Stopping waits for a slow step, however long it takes
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_step():
+        entered.set()
+        release.wait()
+        return False
+
+    worker = SimulationWorker(slow_step, lambda: None)
+    worker.start()
+    entered.wait()
+    stopper = threading.Thread(target=worker.stop)
+    stopper.start()
+    stopper.join(1.5)
+    assert stopper.is_alive() and worker.is_alive()  # Still inside the step
+    release.set()
+    stopper.join()
+    assert not worker.is_alive() and worker.steps == 1
+    print("4. 停止時等待進行中的步驟結束")
+
+    print("\n✅ 背景模擬執行緒測試通過！")
+
+if __name__ == "__main__":
+    test_simulation_worker()
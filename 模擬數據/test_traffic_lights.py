@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+測試以相位推導的紅綠燈狀態 (phase-derived traffic lights)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+
+def baseline_lights(size):
+    """Initial layout built cell by cell, as UrbanGrid.init_traffic_lights used to"""
+    lights = np.zeros((size, size), dtype=int)
+    for i in range(1, size, 2):
+        for j in range(1, size, 2):
+            lights[i, j] = 1 if (i + j) % 2 == 0 else 2
+    return lights
+
+def baseline_toggle(lights):
+    """Toggle every light cell by cell (1 <-> 2), as update_traffic_lights used to"""
+    lights = lights.copy()
+    for i in range(lights.shape[0]):
+        for j in range(lights.shape[1]):
+            if lights[i, j] > 0:
+                lights[i, j] = 3 - lights[i, j]
+    return lights
+
+def test_traffic_lights():
+    """Light states derived from the phase should follow the old toggling exactly"""
+    print("=== 測試紅綠燈相位 ===\n")
+    for size, cycle in ((10, 10), (15, 3)):
+        grid = UrbanGrid(size=size, traffic_light_cycle=cycle)
+        expected = baseline_lights(size)
+        assert np.array_equal(grid.traffic_lights, expected)
+
+        current_cycle = 0
+        for _ in range(cycle * 5 + 2):
+            grid.update_traffic_lights()
+            current_cycle += 1
+            if current_cycle % cycle == 0:
+                expected = baseline_toggle(expected)
+            assert np.array_equal(grid.traffic_lights, expected)
+            x, y = 1, 3
+            assert grid.get_traffic_light(x, y) == expected[x, y]
+        print(f"1. {size}x{size} 網格、週期 {cycle}：{current_cycle} 步後燈號一致")
+
+    # 2. Assigning a layout makes it the current phase
+    grid = UrbanGrid(size=10, traffic_light_cycle=1)
+    layout = np.zeros((10, 10), dtype=int)
+    layout[2, 2], layout[4, 4] = 1, 2
+    grid.traffic_lights = layout
+    assert np.array_equal(grid.traffic_lights, layout)
+    grid.update_traffic_lights()
+    assert np.array_equal(grid.traffic_lights, baseline_toggle(layout))
+    print("2. 指定燈號配置後相位正確")
+
+    print("\n✅ 紅綠燈測試通過！")
+
+if __name__ == "__main__":
+    test_traffic_lights()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+測試原地更新擁堵地圖 (in-place congestion update)
+"""
+
+import pickle
+import numpy as np
+from module.urban_grid import UrbanGrid
+
+def baseline_update(congestion, positions, size, rate):
+    """Heatmap blend and max-normalization, as UrbanGrid.update_congestion used to do"""
+    heatmap = np.zeros((size, size))
+    for position in positions:
+        heatmap[position] += 1
+    congestion = (1 - rate) * congestion + rate * heatmap
+    if np.max(congestion) > 0:
+        congestion = congestion / np.max(congestion)
+    return congestion
+
+def test_update_congestion():
+    """The in-place update should match the former blend-and-normalize on a seeded sequence"""
+    print("=== 測試擁堵地圖更新 ===\n")
+    size, rate = 15, 0.1
+    grid = UrbanGrid(size=size, congestion_update_rate=rate, seed=0)
+    grid.reset_congestion()
+    expected = grid.congestion.copy()
+    rng = np.random.default_rng(1)
+
+    for step in range(50):
+        # Several vehicles can share a cell; the last steps have no vehicles at all
+        count = 0 if step >= 45 else int(rng.integers(1, 20))
+        positions = [tuple(int(v) for v in rng.integers(0, size, 2)) for _ in range(count)]
+        grid.update_congestion(positions)
+        expected = baseline_update(expected, positions, size, rate)
+        assert np.allclose(grid.congestion, expected, rtol=0, atol=1e-12)
+        # Window queries see the updated map
+        assert np.isclose(grid.get_congestion_window(7, 7), np.mean(expected[6:9, 6:9]))
+    print("1. 50 步更新結果與原本的混合與正規化一致")
+
+    # 2. Integer congestion maps (e.g. assigned by callers) are upgraded to floats
+    grid.congestion = np.zeros((size, size), dtype=int)
+    grid.update_congestion([(3, 4), (3, 4)])
+    assert grid.congestion.dtype == np.float64 and grid.congestion[3, 4] == 1.0
+    print("2. 整數擁堵地圖轉為浮點數")
+
+    # 3. Sparse mode gives the same levels but writes only the cells with vehicles
+    grid = UrbanGrid(size=size, congestion_update_rate=rate, sparse_congestion=True, seed=0)
+    grid.reset_congestion()
+    stored = grid.congestion
+    expected = stored.copy()
+    all_xs, all_ys = np.indices((size, size)).reshape(2, -1)
+    for step in range(50):
+        count = 0 if step >= 45 else int(rng.integers(1, 5))
+        positions = [tuple(int(v) for v in rng.integers(0, size, 2)) for _ in range(count)]
+        before = stored.copy()
+        grid.update_congestion(positions)
+        expected = baseline_update(expected, positions, size, rate)
+        untouched = np.ones((size, size), dtype=bool)
+        for position in positions:
+            untouched[position] = False
+        assert np.array_equal(stored[untouched], before[untouched])
+        assert np.allclose(grid.congestion_at(all_xs, all_ys), expected.ravel(), rtol=0, atol=1e-12)
+        assert np.isclose(grid.get_congestion_window(0, 7), np.mean(expected[0:2, 6:9]))
+        assert np.allclose(grid.get_congestion_windows([3, 14], [4, 14]),
+                           [np.mean(expected[2:5, 3:6]), np.mean(expected[13:15, 13:15])])
+        if step % 10 == 9:
+            # Reading the full map applies the pending scale
+            assert np.allclose(grid.congestion, expected, rtol=0, atol=1e-12)
+    print("3. 稀疏模式只寫入有車的格子，結果一致")
+
+    # 4. Sparse mode survives scale underflow, a full update rate and pickling
+    for rate, steps in ((0.5, 400), (1.0, 3)):
+        grid = UrbanGrid(size=size, congestion_update_rate=rate, sparse_congestion=True, seed=0)
+        grid.reset_congestion()
+        expected = grid.congestion.copy()
+        for _ in range(steps):
+            # A vehicle that stays on one cell shrinks the pending scale every step
+            positions = [(3, 3)]
+            grid.update_congestion(positions)
+            expected = baseline_update(expected, positions, size, rate)
+        assert np.allclose(grid.congestion_at(all_xs, all_ys), expected.ravel(), rtol=0, atol=1e-12)
+    restored = pickle.loads(pickle.dumps(grid))
+    assert restored.sparse_congestion and np.allclose(restored.congestion, expected, rtol=0, atol=1e-12)
+    state = grid.__getstate__()
+    for name in ('_congestion_scale', '_congestion_max', 'sparse_congestion'):
+        state.pop(name)
+    state['clip_congestion'] = True  # A grid pickled with the former clipping mode
+    restored = UrbanGrid.__new__(UrbanGrid)
+    restored.__setstate__(state)
+    assert not restored.sparse_congestion and not hasattr(restored, 'clip_congestion')
+    print("4. 稀疏模式處理比例下溢、更新率 1 與序列化")
+
+    print("\n✅ 擁堵更新測試通過！")
+
+if __name__ == "__main__":
+    test_update_congestion()
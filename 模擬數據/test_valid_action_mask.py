@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+測試有效動作位元遮罩 (valid-action bitmask)
+"""
+
+import numpy as np
+from module.urban_grid import UrbanGrid
+from module.actions import ACTION_DELTAS
+
+def brute_force_mask(grid):
+    """Recompute every cell's mask with the bounds and obstacle checks of get_valid_actions"""
+    mask = np.zeros((grid.size, grid.size), dtype=np.uint8)
+    for x in range(grid.size):
+        for y in range(grid.size):
+            for a, (dx, dy) in enumerate(ACTION_DELTAS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < grid.size and 0 <= ny < grid.size and not grid.obstacles[nx, ny]:
+                    mask[x, y] |= 1 << a
+    return mask
+
+def test_valid_action_mask():
+    """The incrementally maintained mask should equal a full recompute"""
+    print("=== 測試有效動作位元遮罩 ===\n")
+    grid = UrbanGrid(size=12, seed=0)
+    rng = np.random.default_rng(0)
+
+    # 1. Fresh grid and a wholesale obstacle replacement
+    assert np.array_equal(grid.valid_action_mask, brute_force_mask(grid))
+    grid.obstacles = rng.random((12, 12)) < 0.1
+    assert np.array_equal(grid.valid_action_mask, brute_force_mask(grid))
+    print("1. 初始與整體更換障礙物後遮罩正確")
+
+    # 2. Single-cell additions and removals, including edges and corners
+    for step in range(300):
+        x, y = (int(v) for v in rng.integers(0, 12, 2))
+        if rng.random() < 0.5:
+            grid.add_obstacle(x, y)
+        else:
+            grid.remove_obstacle(x, y)
+        if step % 10 == 0:
+            assert np.array_equal(grid.valid_action_mask, brute_force_mask(grid))
+    for x, y in ((0, 0), (11, 11), (0, 11), (11, 0)):
+        grid.add_obstacle(x, y)
+        assert np.array_equal(grid.valid_action_mask, brute_force_mask(grid))
+        grid.remove_obstacle(x, y)
+    assert np.array_equal(grid.valid_action_mask, brute_force_mask(grid))
+    print("2. 逐格新增/移除障礙物後遮罩與重新計算一致")
+
+    print("\n✅ 有效動作遮罩測試通過！")
+
+if __name__ == "__main__":
+    test_valid_action_mask()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+測試車隊欄位式儲存 (VehicleFleet / FleetVehicle views)
+"""
+
+import time
+import numpy as np
+from module.urban_grid import UrbanGrid
+from algorithm.agent import QLearningAgent
+from algorithm.reward_config import RewardConfig
+from algorithm.reward_engine import history_from_path, HISTORY_LENGTH
+from fleet import VehicleFleet
+from vehicle import Vehicle
+from simulation import run_simulation
+
+def drive(grid, fleet, steps):
+    for _ in range(steps):
+        grid.update_congestion(fleet.active_positions())
+        grid.update_traffic_lights()
+        fleet.step()
+
+def test_vehicle_fleet():
+    """The fleet should keep per-vehicle state in columns and expose Vehicle-like views"""
+    print("=== 測試車隊欄位式儲存 ===\n")
+
+    # 1. Views read the columns
+    grid = UrbanGrid(size=12, seed=0)
+    agent = QLearningAgent(grid, q_table_backend="dense")
+    fleet = VehicleFleet(grid, agent, 30, path_capacity=8)
+    assert len(fleet) == 30 and [v.id for v in fleet][:3] == [1, 2, 3]
+    assert not np.any(np.all(fleet.positions == fleet.destinations, axis=1))
+    assert fleet[-1].position == tuple(fleet.positions[29]) and fleet[0].path == [fleet[0].start_position]
+    print("1. 車輛視圖讀取欄位資料")
+
+    # 2. The ring buffer keeps the most recent path entries and the reward history
+    full_paths = [[v.position] for v in fleet]
+    for _ in range(20):
+        grid.update_congestion(fleet.active_positions())
+        grid.update_traffic_lights()
+        active = np.flatnonzero(~fleet.reached)
+        fleet.step()
+        for index in active:
+            full_paths[index].append(fleet[index].position)
+    for vehicle, path in zip(fleet, full_paths):
+        assert vehicle.path == path[-8:] and vehicle.steps == len(path) - 1
+        assert np.array_equal(fleet.recent_history(np.array([vehicle.index]))[0],
+                              history_from_path(path, HISTORY_LENGTH))
+    print("2. 環形緩衝區保留最近路徑")
+
+    # 3. The sparse visit table counts every (vehicle, cell) visit
+    for index, path in enumerate(full_paths):
+        cells, counts = np.unique(np.array(path), axis=0, return_counts=True)
+        keys = (index * grid.size + cells[:, 0]) * grid.size + cells[:, 1]
+        slots = np.searchsorted(fleet.visit_keys, keys)
+        assert np.array_equal(fleet.visit_counts[slots], counts)
+    assert len(fleet.visit_keys) == sum(len(set(path)) for path in full_paths)
+    # Like Vehicle, whose position_history starts with its start cell counted once
+    vehicle = Vehicle(grid, agent, position=fleet[0].start_position, destination=fleet[0].destination)
+    fresh = VehicleFleet(grid, agent, 1, positions=[vehicle.position], destinations=[vehicle.destination])
+    assert vehicle.position_history == {vehicle.position: 1} and fresh.visit_counts.tolist() == [1]
+    print("3. 稀疏造訪表計數正確")
+
+    # 3b. Rewards include the A* guidance terms, as in Vehicle.calculate_reward
+    guided_grid = UrbanGrid(size=12, seed=3)
+    guided_grid.congestion = np.zeros((12, 12))
+    guided = VehicleFleet(guided_grid, agent, 1, positions=[(0, 0)], destinations=[(0, 10)],
+                          path_guidance=True)
+    reference = Vehicle(guided_grid, agent, position=(0, 0), destination=(0, 10))
+    agent.epsilon = 0
+    state = agent.encode_states(guided.positions, [0.0], guided.destinations)[0]
+    agent.q_table.q_values[state] = [1, 0, 0, 0]  # Up, the first step of the A* path
+    reward = guided.step()[0]
+    assert guided[0].position == (0, 1) and reference.optimal_path[1] == (0, 1)
+    assert np.isclose(reward, reference.calculate_reward((0, 1), 0, 1))
+    unguided = VehicleFleet(guided_grid, agent, 1, positions=[(0, 0)], destinations=[(0, 10)])
+    agent.q_table.q_values[state] = [1, 0, 0, 0]
+    assert unguided[0].position == (0, 0) and unguided.step()[0] < reward
+    agent.epsilon = 0.2
+    print("3b. 獎勵包含 A* 路徑引導項")
+
+    # 4. Dict Q-tables and the exponential distance algorithm work too
+    config = RewardConfig()
+    config.set_algorithm_type("exponential_distance")
+    dict_agent = QLearningAgent(grid)
+    dict_fleet = VehicleFleet(grid, dict_agent, 10, reward_config=config)
+    drive(grid, dict_fleet, 10)
+    assert len(dict_agent.q_table) > 0 and dict_fleet.steps.max() > 0
+    print("4. 字典 Q 表與指數距離演算法可用")
+
+    # 5. Ten thousand vehicles on a city-sized grid
+    city = UrbanGrid(size=200, seed=1)
+    city_agent = QLearningAgent(city, q_table_backend="dense")
+    start = time.perf_counter()
+    city_fleet = VehicleFleet(city, city_agent, 10000)
+    drive(city, city_fleet, 20)
+    elapsed = time.perf_counter() - start
+    assert city_fleet.steps.sum() > 0 and city_fleet.path_buffer.nbytes < 10 * 2 ** 20
+    print(f"5. 一萬輛車 20 步耗時 {elapsed:.2f} 秒")
+
+    # 6. run_simulation simulates a fleet of the requested size
+    trained = run_simulation(episodes=2, visualize_interval=0, max_steps=30, show_plots=False,
+                             q_table_backend="dense", seed=2, num_vehicles=40, fleet=True)
+    assert trained.q_table.visited.any()
+    print("6. run_simulation 支援車隊模式")
+
+    print("\n✅ 車隊測試通過！")
+
+if __name__ == "__main__":
+    test_vehicle_fleet()